@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     name = 'backpocket.api'
     label = 'bp_api'
+
+    def ready(self):
+        from backpocket.api.changes import connect_signals
+        connect_signals()
@@ -0,0 +1,219 @@
+# Change feed for incremental sync
+#
+# Saves and deletes of synced models append a row to the change log in
+# the same transaction. Clients fetch rows after their last-seen
+# sequence number, so sync cost follows the number of changes rather
+# than the size of the library.
+
+import collections, datetime
+from django.apps import apps
+from django.db.models import Max
+from django.db.models.signals import post_save, post_delete
+from django.utils.module_loading import import_string
+from obj_perms.filters import filter_queryset
+from backpocket.api.models import Change, ChangeHorizon
+from backpocket.links.signals import links_updated, tags_changed
+from backpocket.users.signals import users_updated
+from backpocket.utils import utcnow
+
+
+SyncKind = collections.namedtuple(
+    'SyncKind', ('model', 'serializer', 'prefetch')
+)
+
+# kind: (model label, serializer path, prefetch_related lookups)
+SYNC_KINDS = collections.OrderedDict((
+    ('user', (
+        'bp_users.User', 'backpocket.users.serializers.UserSerializer', (),
+    )),
+    ('link', (
+        'bp_links.Link', 'backpocket.links.serializers.LinkSerializer',
+        ('tags',),
+    )),
+    ('list', (
+        'bp_lists.List', 'backpocket.lists.serializers.ListSerializer',
+        ('items',),
+    )),
+    ('page', (
+        'bp_pages.Page', 'backpocket.pages.serializers.PageSerializer', (),
+    )),
+))
+
+def get_sync_kinds():
+    return collections.OrderedDict(
+        (kind, SyncKind(
+            apps.get_model(model), import_string(serializer), prefetch
+        ))
+        for kind, (model, serializer, prefetch) in SYNC_KINDS.items()
+    )
+
+
+def _kind_for_model(model):
+    label = model._meta.label
+    for kind, (model_label, _, _) in SYNC_KINDS.items():
+        if model_label == label:
+            return kind
+    return None
+
+
+def _owner_id(obj):
+    # Users own their own record
+    if obj._meta.label == SYNC_KINDS['user'][0]:
+        return obj.pk
+    return obj.owner_id
+
+
+def record_change(obj, deleted=False, using=None):
+    kind = _kind_for_model(type(obj))
+    return Change.objects.using(using).create(
+        kind=kind,
+        object_id=obj.pk,
+        owner_id=_owner_id(obj),
+        deleted=deleted,
+    )
+
+
+def _handle_save(sender, instance, raw=False, using=None, **kwargs):
+    if not raw:
+        record_change(instance, using=using)
+
+
+def _handle_delete(sender, instance, using=None, **kwargs):
+    record_change(instance, deleted=True, using=using)
+
+
+def _handle_tags_changed(sender, link, **kwargs):
+    record_change(link)
+
+
+def _handle_links_updated(sender, links, using=None, **kwargs):
+    Change.objects.using(using).bulk_create([
+        Change(kind='link', object_id=pk, owner_id=owner_id, deleted=False)
+        for pk, owner_id in links
+    ])
+
+
+def _handle_users_updated(sender, user_ids, using=None, **kwargs):
+    Change.objects.using(using).bulk_create([
+        Change(kind='user', object_id=pk, owner_id=pk, deleted=False)
+        for pk in user_ids
+    ])
+
+
+def connect_signals():
+    for kind, (label, _, _) in SYNC_KINDS.items():
+        model = apps.get_model(label)
+        post_save.connect(
+            _handle_save, sender=model, dispatch_uid='bp_api_change_save'
+        )
+        post_delete.connect(
+            _handle_delete, sender=model,
+            dispatch_uid='bp_api_change_delete'
+        )
+    tags_changed.connect(
+        _handle_tags_changed, dispatch_uid='bp_api_change_tags'
+    )
+    links_updated.connect(
+        _handle_links_updated, dispatch_uid='bp_api_change_links'
+    )
+    users_updated.connect(
+        _handle_users_updated, dispatch_uid='bp_api_change_users'
+    )
+
+
+class ResyncRequired(Exception):
+    """
+    Raised when a client's sequence number predates discarded
+    tombstones, so deletions since then can no longer be reported.
+    """
+    pass
+
+
+def get_changes(user, since=0, limit=500):
+    '''Returns dict with objects changed and deleted after sequence
+    number 'since', visible to user. At most 'limit' change rows are
+    read; 'more' is True if further calls are needed, continuing from
+    the returned 'seq'. Raises ResyncRequired if since is too old.
+    '''
+    if since and since < ChangeHorizon.get_seq():
+        raise ResyncRequired
+
+    rows = list(
+        Change.objects
+        .filter(owner_id=user.id, seq__gt=since)
+        .order_by('seq')
+        .values_list('seq', 'kind', 'object_id', 'deleted')[:limit + 1]
+    )
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    # Later entries supersede earlier ones for the same object
+    latest = collections.OrderedDict()
+    for seq, kind, object_id, deleted in rows:
+        latest.pop((kind, object_id), None)
+        latest[(kind, object_id)] = deleted
+
+    changed = collections.defaultdict(list)
+    deleted = collections.defaultdict(list)
+    for (kind, object_id), is_deleted in latest.items():
+        (deleted if is_deleted else changed)[kind].append(object_id)
+
+    objects = {}
+    for kind, sync in get_sync_kinds().items():
+        ids = changed.get(kind)
+        if not ids:
+            continue
+        meta = sync.model._meta
+        perm = '{0}.view_{1}'.format(meta.app_label, meta.model_name)
+        queryset = filter_queryset(
+            user, perm, sync.model._default_manager.filter(pk__in=ids)
+        ).prefetch_related(*sync.prefetch)
+        found = {obj.pk: obj for obj in queryset}
+        objects[kind] = [found[pk] for pk in ids if pk in found]
+        # No longer visible, so as far as the client is concerned,
+        # no longer there either
+        deleted[kind].extend(pk for pk in ids if pk not in found)
+
+    return {
+        'seq': rows[-1][0] if rows else since,
+        'more': more,
+        'changed': objects,
+        'deleted': {kind: ids for kind, ids in deleted.items() if ids},
+    }
+
+
+def compact_changes(tombstone_age=datetime.timedelta(days=30)):
+    '''Compacts the change log. Removes entries superseded by a later
+    entry for the same object, entries of deleted owners, and
+    tombstones older than tombstone_age (advancing the resync horizon).
+    Returns dict of deleted row counts.
+    '''
+    User = apps.get_model(SYNC_KINDS['user'][0])
+    counts = {}
+
+    latest = (
+        Change.objects.order_by().values('kind', 'object_id')
+        .annotate(latest=Max('seq')).values('latest')
+    )
+    counts['superseded'], _ = (
+        Change.objects.exclude(seq__in=latest).delete()
+    )
+
+    counts['orphaned'], _ = (
+        Change.objects.exclude(owner_id__in=User.objects.values('pk'))
+        .delete()
+    )
+
+    expired = Change.objects.filter(
+        deleted=True, timestamp__lt=utcnow() - tombstone_age
+    )
+    horizon = expired.aggregate(seq=Max('seq'))['seq']
+    if horizon is not None:
+        ChangeHorizon.advance(horizon)
+        counts['tombstones'], _ = (
+            Change.objects.filter(deleted=True, seq__lte=horizon).delete()
+        )
+    else:
+        counts['tombstones'] = 0
+
+    return counts
@@ -0,0 +1,350 @@
+"""
+Streaming library export.
+
+A user's library (links with their tags, lists, tags and archived
+pages, plus each page's stored HTML) is written as an uncompressed tar
+archive, generated as it is sent:
+
+- Rows are read in windows of the owner's primary keys, each through
+  .iterator() and the exporting user's ObjectPermissionFilters, so no
+  query stays open across the download (which on SQLite would hold a
+  read lock for its duration) and memory stays constant whatever the
+  library's size.
+- Page HTML is copied from the blob store a chunk at a time.
+- Tar rather than ZIP, as ZIP ends with a directory of every entry
+  (memory growing with the library) and its CRCs would force re-reading
+  everything before a resumed range.
+
+The archive's length is computed up front by a sizing pass over the
+same rows, so responses carry a Content-Length, and the bytes are
+deterministic for a given library state (identified by the owner's
+latest change sequence, which is the ETag). A dropped download can
+resume with a Range request; entries wholly before the range are
+skipped without being generated or read. If the library changes
+mid-download, the stream is cut short rather than sending a corrupt
+archive, and the changed ETag tells the client to start over.
+"""
+import datetime, io, json, os, re, tarfile
+from django.core.serializers.json import DjangoJSONEncoder
+from obj_perms.filters import filter_queryset
+from backpocket.api.models import Change
+from backpocket.links.models import Link, LinkTag, Tag
+from backpocket.lists.models import List, ListItem
+from backpocket.pages.blobs import get_blob_store
+from backpocket.pages.models import Page
+
+
+EXPORT_FORMAT = 1
+BATCH_SIZE = 500
+CHUNK_SIZE = 1 << 16
+ROOT = 'backpocket'
+
+_EPOCH = datetime.datetime(1980, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class ExportChanged(Exception):
+    """
+    Raised mid-stream when the library no longer matches the sizes
+    planned for it.
+    """
+    pass
+
+
+def _batches(owned, permitted, fields, batch_size=BATCH_SIZE):
+    # Each batch takes the next batch_size of owned's primary keys, then
+    # reads the rows in that window permitted() lets through, so every
+    # query is short and bounded however the permission filter is built
+    owned = owned.order_by('pk')
+    last_pk = None
+    while True:
+        window = owned
+        if last_pk is not None:
+            window = window.filter(pk__gt=last_pk)
+        pks = list(window.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return
+        last_pk = pks[-1]
+        rows = list(
+            permitted(owned.filter(pk__gte=pks[0], pk__lte=last_pk))
+            .values(*fields).order_by('pk').iterator()
+        )
+        if rows:
+            yield rows
+
+
+def _line(record):
+    return json.dumps(
+        record, cls=DjangoJSONEncoder, ensure_ascii=False, sort_keys=True
+    ).encode('utf-8') + b'\n'
+
+
+def _header(name, size, mtime):
+    info = tarfile.TarInfo('{0}/{1}'.format(ROOT, name))
+    info.size = size
+    info.mtime = int(mtime.timestamp())
+    info.mode = 0o644
+    return info.tobuf(tarfile.PAX_FORMAT, 'utf-8', 'surrogateescape')
+
+
+def _padding(size):
+    return -size % tarfile.BLOCKSIZE
+
+
+class LibraryExport:
+    """
+    Export of owner's library as the given user may view it.
+    """
+
+    def __init__(self, user, owner, store=None):
+        self.user = user
+        self.owner = owner
+        self.store = store or get_blob_store()
+        last = (
+            Change.objects.filter(owner_id=owner.pk).order_by('-seq')
+            .values_list('seq', 'timestamp').first()
+        )
+        self.seq, self.mtime = last or (0, _EPOCH)
+        self._sizes = None
+
+    @property
+    def etag(self):
+        return '"{0}-{1}-{2}"'.format(
+            self.owner.pk.hex, self.seq, self.user.pk.hex
+        )
+
+    @property
+    def filename(self):
+        return 'backpocket-{0}-{1}.tar'.format(
+            self.owner.get_username(), self.seq
+        )
+
+    def _rows(self, model, perm, *fields):
+        # Batches of values() rows of owner's objects the user may view
+        return _batches(
+            model.objects.filter(owner_id=self.owner.pk),
+            lambda queryset: filter_queryset(self.user, perm, queryset),
+            fields,
+        )
+
+    def _manifest(self):
+        yield _line({
+            'format': EXPORT_FORMAT,
+            'owner': self.owner.get_username(),
+            'seq': self.seq,
+        })
+
+    def _links(self):
+        for batch in self._rows(
+                Link, 'bp_links.view_link', 'pk', 'url', 'title', 'notes',
+                'date_added', 'date_modified', 'visit_count',
+                'last_visited', 'read_progress'):
+            tags = {}
+            for link_id, name in (
+                    LinkTag.objects
+                    .filter(link_id__in=[link['pk'] for link in batch])
+                    .order_by('tag__name')
+                    .values_list('link_id', 'tag__name').iterator()):
+                tags.setdefault(link_id, []).append(name)
+            for link in batch:
+                link['id'] = link.pop('pk')
+                link['tags'] = tags.get(link['id'], [])
+                yield _line(link)
+
+    def _lists(self):
+        for batch in self._rows(
+                List, 'bp_lists.view_list', 'pk', 'name', 'description',
+                'date_created', 'date_modified'):
+            items = {}
+            for list_id, link_id in (
+                    ListItem.objects
+                    .filter(list_id__in=[item['pk'] for item in batch])
+                    .order_by('position', 'pk')
+                    .values_list('list_id', 'link_id').iterator()):
+                items.setdefault(list_id, []).append(link_id)
+            for item in batch:
+                item['id'] = item.pop('pk')
+                item['links'] = items.get(item['id'], [])
+                yield _line(item)
+
+    def _tags(self):
+        for batch in self._rows(Tag, 'bp_links.view_tag', 'pk', 'name'):
+            for tag in batch:
+                tag['id'] = tag.pop('pk')
+                yield _line(tag)
+
+    def _page_rows(self, *fields):
+        for batch in self._rows(
+                Page, 'bp_pages.view_page', 'pk', 'html_hash',
+                'date_archived', *fields):
+            yield from batch
+
+    def _html_name(self, page):
+        return 'pages/{0}.html'.format(page['pk'])
+
+    def _pages(self):
+        for page in self._page_rows('link_id', 'url', 'title', 'text'):
+            html = None
+            if page['html_hash'] and self.store.exists(page['html_hash']):
+                html = self._html_name(page)
+            yield _line({
+                'id': page['pk'],
+                'link': page['link_id'],
+                'url': page['url'],
+                'title': page['title'],
+                'text': page['text'],
+                'date_archived': page['date_archived'],
+                'html': html,
+            })
+
+    def _documents(self):
+        return [
+            ('library.json', self._manifest),
+            ('links.jsonl', self._links),
+            ('lists.jsonl', self._lists),
+            ('tags.jsonl', self._tags),
+            ('pages.jsonl', self._pages),
+        ]
+
+    def _blobs(self):
+        # (name, path, size, mtime) of each page's stored HTML
+        for page in self._page_rows():
+            content_hash = page['html_hash']
+            if not content_hash:
+                continue
+            path = self.store.path(content_hash)
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            yield self._html_name(page), path, size, page['date_archived']
+
+    def _entry_size(self, name, size, mtime):
+        return len(_header(name, size, mtime)) + size + _padding(size)
+
+    def size(self):
+        '''Returns the archive's length in bytes, generating each
+        document once (and discarding it) to measure it.
+        '''
+        if self._sizes is None:
+            self._sizes = {
+                name: sum(map(len, generate()))
+                for name, generate in self._documents()
+            }
+            total = sum(
+                self._entry_size(name, size, self.mtime)
+                for name, size in self._sizes.items()
+            )
+            total += sum(
+                self._entry_size(name, size, mtime)
+                for name, _, size, mtime in self._blobs()
+            )
+            self._total = total + 2 * tarfile.BLOCKSIZE
+        return self._total
+
+    def stream(self, start=0, end=None):
+        '''Yields the archive's bytes from offset start up to and
+        including end (default: the last). Raises ExportChanged if the
+        library has changed since size() was called.
+        '''
+        total = self.size()
+        if end is None or end >= total:
+            end = total - 1
+        self._offset = 0
+        self._start, self._stop = start, end + 1
+
+        for name, generate in self._documents():
+            yield from self._entry(
+                name, self._sizes[name], self.mtime,
+                lambda skip, generate=generate: _skip(generate(), skip),
+            )
+            if self._offset >= self._stop:
+                return
+        for name, path, size, mtime in self._blobs():
+            yield from self._entry(
+                name, size, mtime,
+                lambda skip, path=path: _read_file(path, skip),
+            )
+            if self._offset >= self._stop:
+                return
+        yield from self._emit(b'\0' * (2 * tarfile.BLOCKSIZE))
+        if self._offset != total:
+            raise ExportChanged
+
+    def _entry(self, name, size, mtime, chunks):
+        header = _header(name, size, mtime)
+        entry_end = self._offset + len(header) + size + _padding(size)
+        if entry_end > self._total:
+            raise ExportChanged(name)
+        if entry_end <= self._start:
+            # Wholly before the range; not generated or read
+            self._offset = entry_end
+            return
+        yield from self._emit(header)
+
+        skip = min(max(self._start - self._offset, 0), size)
+        self._offset += skip
+        written = skip
+        for chunk in chunks(skip):
+            written += len(chunk)
+            if written > size:
+                raise ExportChanged(name)
+            yield from self._emit(chunk)
+            if self._offset >= self._stop:
+                return
+        if written != size:
+            raise ExportChanged(name)
+        yield from self._emit(b'\0' * _padding(size))
+
+    def _emit(self, data):
+        # Trim data, starting at the current offset, to the range
+        offset = self._offset
+        self._offset += len(data)
+        if self._offset <= self._start or offset >= self._stop:
+            return
+        data = data[max(self._start - offset, 0):self._stop - offset]
+        if data:
+            yield data
+
+
+def parse_range(value, total):
+    '''Returns (start, end) byte offsets, inclusive, from a Range header
+    value for a single range, or None if there isn't one (including
+    forms not supported, so the whole archive is sent). Raises
+    ValueError if the range lies beyond total bytes.
+    '''
+    match = re.match(r'^bytes=(\d*)-(\d*)$', (value or '').strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if not start:
+        # Suffix range: the last end bytes
+        start, end = max(total - int(end), 0), total - 1
+    else:
+        start = int(start)
+        end = min(int(end), total - 1) if end else total - 1
+    if start >= total or start > end:
+        raise ValueError(value)
+    return start, end
+
+
+def _skip(chunks, skip):
+    # Drops the first skip bytes of a chunk iterator, re-chunking it
+    buffer = io.BytesIO()
+    for chunk in chunks:
+        if skip >= len(chunk):
+            skip -= len(chunk)
+            continue
+        buffer.write(chunk[skip:])
+        skip = 0
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _read_file(path, skip):
+    with open(path, 'rb') as stream:
+        stream.seek(skip)
+        yield from iter(lambda: stream.read(CHUNK_SIZE), b'')
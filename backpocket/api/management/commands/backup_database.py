@@ -0,0 +1,76 @@
+import datetime, os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from backpocket.maintenance import backup, BackupRestarted
+
+
+class Command(BaseCommand):
+    help = (
+        'Takes an online backup of the SQLite database while the server '
+        'keeps running, copying a few pages at a time.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'dest', nargs='?',
+            help='Backup file or directory (default data/backups/, '
+                 'named by date and time).',
+        )
+        parser.add_argument('--database', default='default')
+        parser.add_argument(
+            '--pages', type=int, default=256,
+            help='Pages copied per step (default 256).',
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0.01,
+            help='Seconds to pause between steps (default 0.01).',
+        )
+        parser.add_argument(
+            '--compress', action='store_true', help='Gzip the backup.',
+        )
+
+    def handle(self, *args, **options):
+        db = connections[options['database']].settings_dict
+        if db['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('Only SQLite databases can be backed up')
+
+        dest = options['dest'] or os.path.join(
+            settings.BASE_DIR, 'data', 'backups'
+        )
+        if os.path.isdir(dest) or not options['dest']:
+            os.makedirs(dest, exist_ok=True)
+            name = '{0}-{1:%Y%m%d-%H%M%S}.sqlite3{2}'.format(
+                os.path.splitext(os.path.basename(db['NAME']))[0],
+                datetime.datetime.now(),
+                '.gz' if options['compress'] else '',
+            )
+            dest = os.path.join(dest, name)
+
+        def progress(remaining, total):
+            if options['verbosity'] > 1:
+                self.stdout.write('{0}/{1} pages left'.format(
+                    remaining, total
+                ))
+
+        try:
+            result = backup(
+                db['NAME'], dest, pages=options['pages'],
+                pause=options['pause'], compress=options['compress'],
+                progress=progress,
+            )
+        except BackupRestarted:
+            raise CommandError(
+                'Backup kept restarting due to writes; retry when quieter, '
+                'with larger --pages, or switch the database to WAL mode'
+            )
+        self.stdout.write(
+            'Backed up {source_mb:.1f} MiB to {dest} ({dest_mb:.1f} MiB) '
+            'in {steps} step(s): copy {copy_seconds:.1f}s, '
+            'total {total_seconds:.1f}s'.format(
+                dest=dest,
+                source_mb=result['source_bytes'] / (1 << 20),
+                dest_mb=result['dest_bytes'] / (1 << 20),
+                **result
+            )
+        )
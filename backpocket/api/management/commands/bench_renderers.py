@@ -0,0 +1,65 @@
+import gzip, statistics, time
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer as DRFJSONRenderer
+from rest_framework.test import APIRequestFactory
+from backpocket.renderers import (
+    JSONRenderer, MessagePackRenderer, msgpack,
+)
+from backpocket.users.models import User
+from backpocket.users.serializers import UserSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks API response encoding: time and payload size for a '
+        'user list rendered by each renderer (built in memory; does not '
+        'touch project data).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=7)
+
+    def handle(self, *args, **options):
+        parent = User(username='parent')
+        users = [
+            User(
+                username='user{0}'.format(i),
+                name='Benchmark User {0}'.format(i),
+                email='user{0}@example.com'.format(i),
+                parent=parent if i % 2 else None,
+            )
+            for i in range(options['rows'])
+        ]
+        request = APIRequestFactory().get('/api/users/')
+        # For the hyperlinks, whatever hosts this deployment serves
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            data = UserSerializer(
+                users, many=True, context={'request': request}
+            ).data
+
+        renderers = [
+            ('DRF JSON', DRFJSONRenderer()),
+            ('JSON', JSONRenderer()),
+        ]
+        if msgpack is not None:
+            renderers.append(('MessagePack', MessagePackRenderer()))
+        else:
+            self.stdout.write('msgpack not installed; skipping MessagePack')
+
+        self.stdout.write('{0} rows'.format(len(data)))
+        for label, renderer in renderers:
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                body = renderer.render(data, renderer.media_type, {})
+                timings.append(time.perf_counter() - start)
+            self.stdout.write(
+                '{0:12} median {1:6.1f}ms, min {2:6.1f}ms, {3:8d} bytes '
+                '({4:d} gzipped)'.format(
+                    label, statistics.median(timings) * 1000,
+                    min(timings) * 1000, len(body),
+                    len(gzip.compress(body, 6)),
+                )
+            )
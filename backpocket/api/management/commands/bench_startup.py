@@ -0,0 +1,96 @@
+import json, os, statistics, subprocess, sys
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+# Run in a fresh interpreter: load the WSGI application as a server
+# would, then time the first and second request for each path
+PROBE = '''
+import io, json, sys, time
+start = time.perf_counter()
+from backpocket.wsgi import application
+result = {'load': time.perf_counter() - start, 'requests': {}}
+
+def request(path):
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80',
+        'HTTP_HOST': 'localhost', 'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+    }
+    start = time.perf_counter()
+    response = application(environ, lambda status, headers: None)
+    b''.join(response)
+    response.close()
+    return time.perf_counter() - start
+
+for path in sys.argv[1:]:
+    result['requests'][path] = [request(path), request(path)]
+print(json.dumps(result))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures worker cold start: application load time and first '
+        'and second request latency, with and without warm-up, each in '
+        'a fresh interpreter.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help='Path to request (repeatable; default /api/ and '
+                 '/admin/login/).',
+        )
+        parser.add_argument(
+            '--profile-imports', action='store_true',
+            help='Also print an import-time profile of one cold start.',
+        )
+
+    def _probe(self, paths, warm, profile=False):
+        env = dict(
+            os.environ, BACKPOCKET_WARM_UP='1' if warm else '0',
+            BACKPOCKET_PROFILE_IMPORTS='1' if profile else '0',
+            DJANGO_SETTINGS_MODULE=os.environ.get(
+                'DJANGO_SETTINGS_MODULE', 'backpocket.settings'
+            ),
+        )
+        output = subprocess.run(
+            [sys.executable, '-c', PROBE] + paths,
+            cwd=settings.BASE_DIR, env=env, check=True,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        return json.loads(output.stdout), output.stderr
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or ['/api/', '/admin/login/']
+        for warm in (False, True):
+            runs = [
+                self._probe(paths, warm)[0]
+                for _ in range(options['repeat'])
+            ]
+            self.stdout.write('{0}: load median {1:.1f}ms'.format(
+                'warm-up' if warm else 'cold',
+                statistics.median(run['load'] for run in runs) * 1000,
+            ))
+            for path in paths:
+                self.stdout.write(
+                    '  {0}: first {1:.1f}ms, second {2:.1f}ms'.format(
+                        path,
+                        statistics.median(
+                            run['requests'][path][0] for run in runs
+                        ) * 1000,
+                        statistics.median(
+                            run['requests'][path][1] for run in runs
+                        ) * 1000,
+                    )
+                )
+
+        if options['profile_imports']:
+            _, stderr = self._probe(paths, False, profile=True)
+            start = stderr.find('ms importing')
+            # The report is the last log record
+            self.stdout.write(stderr[stderr.rfind('\n', 0, start) + 1:])
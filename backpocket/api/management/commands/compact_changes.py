@@ -0,0 +1,26 @@
+import datetime
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from backpocket.api.changes import compact_changes
+
+
+class Command(BaseCommand):
+    help = 'Compacts the sync change log.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tombstone-days', type=int, default=30,
+            help=(
+                'Discard deletion records older than this many days; '
+                'clients last synced before then must resync (default 30).'
+            ),
+        )
+
+    def handle(self, *args, **options):
+        age = datetime.timedelta(days=options['tombstone_days'])
+        with transaction.atomic():
+            counts = compact_changes(tombstone_age=age)
+        self.stdout.write(
+            'Removed {superseded} superseded, {orphaned} orphaned and '
+            '{tombstones} expired change(s)'.format(**counts)
+        )
@@ -0,0 +1,80 @@
+import os, time
+from django.core.management.base import BaseCommand, CommandError
+from backpocket.api.export import LibraryExport, ExportChanged
+from backpocket.users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Writes a user\'s library (links, lists, tags and archived pages '
+        'with their HTML) to a tar archive, streamed in constant memory. '
+        'An interrupted export is resumed where it stopped if the '
+        'library hasn\'t changed since.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('output', help='Archive path.')
+        parser.add_argument(
+            '--as', dest='as_user',
+            help='Export as this username sees the library (default: '
+                 'the owner).',
+        )
+
+    def _user(self, username):
+        try:
+            return User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError('No such user: {0}'.format(username))
+
+    def handle(self, *args, **options):
+        owner = self._user(options['username'])
+        user = owner
+        if options['as_user']:
+            user = self._user(options['as_user'])
+
+        archive = LibraryExport(user, owner)
+        output = options['output']
+        partial = output + '.partial'
+        etag_path = partial + '.etag'
+
+        start = 0
+        if os.path.exists(partial) and os.path.exists(etag_path):
+            with open(etag_path) as f:
+                if f.read() == archive.etag:
+                    start = os.path.getsize(partial)
+        if not start:
+            with open(etag_path, 'w') as f:
+                f.write(archive.etag)
+
+        began = time.perf_counter()
+        total = archive.size()
+        sized = time.perf_counter() - began
+        if start > total:
+            start = 0
+        if start:
+            self.stdout.write('Resuming at byte {0} of {1}'.format(
+                start, total
+            ))
+
+        try:
+            with open(partial, 'ab' if start else 'wb') as f:
+                if start < total:
+                    for chunk in archive.stream(start):
+                        f.write(chunk)
+        except ExportChanged:
+            os.remove(etag_path)
+            raise CommandError(
+                'Library changed during export; run again to start over'
+            )
+        os.replace(partial, output)
+        os.remove(etag_path)
+
+        elapsed = time.perf_counter() - began
+        self.stdout.write(
+            'Wrote {0} bytes in {1:.1f}s ({2:.1f} MB/s, sizing pass '
+            '{3:.1f}s)'.format(
+                total - start, elapsed,
+                (total - start) / elapsed / 1e6 if elapsed else 0, sized,
+            )
+        )
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from backpocket.maintenance import (
+    incremental_vacuum, enable_incremental, VacuumNotIncremental
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Returns free pages in the SQLite database to the filesystem in '
+        'short slices, within a time budget, yielding to writers. Run '
+        'from cron during quiet periods.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument(
+            '--slice-pages', type=int, default=256,
+            help='Pages freed per transaction (default 256).',
+        )
+        parser.add_argument(
+            '--max-seconds', type=float, default=60,
+            help='Stop after this long, leaving the rest for next time '
+                 '(default 60).',
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0.05,
+            help='Seconds to pause between slices (default 0.05).',
+        )
+        parser.add_argument(
+            '--enable-incremental', action='store_true',
+            help='Switch the database to incremental auto-vacuum first. '
+                 'Runs a full VACUUM, which locks the database; needed '
+                 'once.',
+        )
+
+    def handle(self, *args, **options):
+        db = connections[options['database']].settings_dict
+        if db['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('Only SQLite databases can be vacuumed')
+
+        if options['enable_incremental']:
+            enable_incremental(db['NAME'])
+
+        try:
+            result = incremental_vacuum(
+                db['NAME'], slice_pages=options['slice_pages'],
+                max_seconds=options['max_seconds'], pause=options['pause'],
+            )
+        except VacuumNotIncremental:
+            raise CommandError(
+                'Database is not in incremental auto-vacuum mode; run '
+                'once with --enable-incremental during downtime'
+            )
+
+        self.stdout.write(
+            'Freed {freed_pages} page(s) in {slices} slice(s), '
+            '{busy} busy retries, {seconds:.1f}s; '
+            '{remaining_pages} free page(s) left'.format(**result)
+        )
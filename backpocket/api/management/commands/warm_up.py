@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from backpocket.warmup import warm_up
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs the worker warm-up steps in this process and reports how '
+        'long each took, e.g. to check them after a deploy.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--no-connect', action='store_false', dest='connect',
+            help='Skip opening database connections.',
+        )
+
+    def handle(self, *args, **options):
+        timings = warm_up(connect=options['connect'])
+        for name, seconds in timings:
+            self.stdout.write('{0:<12} {1:8.1f}ms'.format(
+                name, seconds * 1000
+            ))
+        self.stdout.write('{0:<12} {1:8.1f}ms'.format(
+            'total', sum(seconds for _, seconds in timings) * 1000
+        ))
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 14:28
+from __future__ import unicode_literals
+
+import backpocket.utils
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def seed_changes(apps, schema_editor):
+    # Existing objects get an initial entry so a full sync from zero
+    # sees everything
+    Change = apps.get_model('bp_api', 'Change')
+    using = schema_editor.connection.alias
+    sources = (
+        ('user', apps.get_model('bp_users', 'User'), 'pk'),
+        ('link', apps.get_model('bp_links', 'Link'), 'owner_id'),
+        ('list', apps.get_model('bp_lists', 'List'), 'owner_id'),
+        ('page', apps.get_model('bp_pages', 'Page'), 'owner_id'),
+    )
+    for kind, model, owner_field in sources:
+        rows = model.objects.using(using).values_list('pk', owner_field)
+        Change.objects.using(using).bulk_create(
+            (
+                Change(kind=kind, object_id=pk, owner_id=owner_id)
+                for pk, owner_id in rows.iterator()
+            ),
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('bp_links', '0002_tags'),
+        ('bp_lists', '0001_initial'),
+        ('bp_pages', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False, verbose_name='sequence')),
+                ('kind', models.CharField(max_length=16, verbose_name='kind')),
+                ('object_id', models.UUIDField(verbose_name='object ID')),
+                ('deleted', models.BooleanField(default=False, verbose_name='deleted')),
+                ('timestamp', models.DateTimeField(default=backpocket.utils.utcnow, verbose_name='timestamp')),
+                ('owner', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='owner')),
+            ],
+            options={
+                'verbose_name': 'change',
+                'verbose_name_plural': 'changes',
+                'db_table': 'bp_change',
+            },
+        ),
+        migrations.CreateModel(
+            name='ChangeHorizon',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.BigIntegerField(default=0, verbose_name='sequence')),
+            ],
+            options={
+                'verbose_name': 'change horizon',
+                'db_table': 'bp_change_horizon',
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='change',
+            index_together=set([('owner', 'seq'), ('kind', 'object_id')]),
+        ),
+        migrations.RunPython(seed_changes, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,61 @@
+from django.conf import settings
 from django.db import models
+from backpocket.utils import utcnow
 
-# Create your models here.
+
+class Change(models.Model):
+    """
+    Entry in the change feed used for incremental client sync.
+    Sequence numbers only ever increase, so a client can ask for
+    everything after the last one it saw.
+    """
+
+    class Meta:
+        verbose_name = 'change'
+        verbose_name_plural = 'changes'
+        db_table = 'bp_change'
+        index_together = (
+            ('owner', 'seq'),
+            ('kind', 'object_id'),
+        )
+
+    seq = models.BigAutoField('sequence', primary_key=True)
+    kind = models.CharField('kind', max_length=16)
+    object_id = models.UUIDField('object ID')
+    # No constraint, so entries can outlive their owner until compacted
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+        verbose_name='owner',
+    )
+    deleted = models.BooleanField('deleted', default=False)
+    timestamp = models.DateTimeField('timestamp', default=utcnow)
+
+
+class ChangeHorizon(models.Model):
+    """
+    Single row recording the highest sequence number whose tombstones
+    have been discarded. Clients behind it must resync from scratch.
+    """
+
+    class Meta:
+        verbose_name = 'change horizon'
+        db_table = 'bp_change_horizon'
+
+    seq = models.BigIntegerField('sequence', default=0)
+
+    @classmethod
+    def get_seq(cls):
+        return (
+            cls.objects.filter(pk=1).values_list('seq', flat=True).first()
+            or 0
+        )
+
+    @classmethod
+    def advance(cls, seq):
+        horizon, _ = cls.objects.get_or_create(pk=1)
+        if seq > horizon.seq:
+            horizon.seq = seq
+            horizon.save(update_fields=['seq'])
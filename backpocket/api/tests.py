@@ -1,3 +1,699 @@
-from django.test import TestCase
+import contextlib, datetime, decimal, gzip, io, json, os, re, shutil, sqlite3
+import tarfile, tempfile, time, unittest, uuid
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer as DRFJSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+from backpocket.api.changes import (
+    ResyncRequired, compact_changes, get_changes,
+)
+from backpocket.api.export import LibraryExport
+from backpocket.api.models import Change, ChangeHorizon
+from backpocket.links.models import Link
+from backpocket.links.tags import set_tags
+from backpocket.maintenance import (
+    BackupRestarted, VacuumNotIncremental, backup, enable_incremental,
+    incremental_vacuum,
+)
+from backpocket.lists.models import List, ListItem
+from backpocket.pages.blobs import BlobStore
+from backpocket.pages.models import Page
+from backpocket.queries import QueryAnalyzer, fingerprint
+from backpocket.renderers import (
+    JSONParser, JSONRenderer, MessagePackRenderer, msgpack
+)
+from backpocket.testing import QueryBudgetMixin
+from backpocket.throttling import (
+    ActionScopedThrottle, CacheThrottleStore, LocMemThrottleStore,
+    SQLiteThrottleStore, get_throttle_store,
+)
+from backpocket.users.models import User
+from backpocket import utils
+from backpocket.utils import utcnow, uuid7, validuuid
+from backpocket.warmup import warm_up
 
-# Create your tests here.
+
+class FingerprintTests(TestCase):
+
+    def test_parameters_normalized(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM "t" WHERE "id" = %s LIMIT 21'),
+            fingerprint('SELECT  * FROM "t"\nWHERE "id" = %s LIMIT 1'),
+        )
+        self.assertEqual(
+            fingerprint('SELECT * FROM "t" WHERE "id" IN (%s, %s, %s)'),
+            fingerprint('SELECT * FROM "t" WHERE "id" IN (%s)'),
+        )
+        self.assertNotEqual(
+            fingerprint('SELECT "a" FROM "t1"'),
+            fingerprint('SELECT "a" FROM "t2"'),
+        )
+
+    def test_repeats_reported_with_stack(self):
+        users = [User.objects.create_user(str(i), 'pw') for i in range(4)]
+        analyzer = QueryAnalyzer()
+        with analyzer.capture():
+            for user in User.objects.all():
+                user.groups.count()
+        repeats = analyzer.repeated(threshold=3)
+        self.assertEqual(len(repeats), 1)
+        self.assertEqual(repeats[0].count, len(users))
+        self.assertIn('test_repeats_reported_with_stack', analyzer.report(3))
+
+
+class WarmUpTests(TestCase):
+
+    def test_steps(self):
+        # Warm-up fills the process-wide content type cache, which would
+        # outlive this test's database
+        self.addCleanup(ContentType.objects.clear_cache)
+        timings = warm_up()
+        self.assertEqual(
+            [name for name, _ in timings],
+            ['imports', 'urls', 'permissions', 'serializers', 'database'],
+        )
+        self.assertNotIn('database', dict(warm_up(connect=False)))
+
+
+class ChangeFeedTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice', 'pw')
+        self.other = User.objects.create_user('bob', 'pw')
+        self.start = Change.objects.latest('seq').seq
+
+    def _link(self, name, owner=None):
+        return Link.objects.create(
+            owner=owner or self.user,
+            url='http://example.com/{0}'.format(name),
+        )
+
+    def test_ordered_pages(self):
+        first, second, third = (self._link(name) for name in 'abc')
+        self._link('d', owner=self.other)
+        changes = get_changes(self.user, since=self.start, limit=2)
+        self.assertTrue(changes['more'])
+        self.assertEqual(changes['changed']['link'], [first, second])
+        changes = get_changes(self.user, since=changes['seq'], limit=2)
+        self.assertFalse(changes['more'])
+        self.assertEqual(changes['changed'], {'link': [third]})
+
+        # Changed again, so reported in its new place
+        first.title = 'First'
+        first.save()
+        changes = get_changes(self.user, since=self.start)
+        self.assertEqual(changes['changed']['link'], [second, third, first])
+        self.assertEqual(
+            get_changes(self.user, since=changes['seq'])['changed'], {}
+        )
+
+    def test_deleted(self):
+        kept, gone = self._link('kept'), self._link('gone')
+        gone_pk = gone.pk
+        gone.delete()
+        changes = get_changes(self.user, since=self.start)
+        self.assertEqual(changes['changed'], {'link': [kept]})
+        self.assertEqual(changes['deleted'], {'link': [gone_pk]})
+
+    def test_compaction(self):
+        link = self._link('a')
+        for title in ('one', 'two'):
+            link.title = title
+            link.save()
+        gone = self._link('b')
+        gone_pk = gone.pk
+        gone.delete()
+        recent = self._link('c')
+        recent_pk = recent.pk
+        recent.delete()
+        Change.objects.filter(object_id=gone_pk).update(
+            timestamp=utcnow() - datetime.timedelta(days=60)
+        )
+        expired_seq = Change.objects.get(object_id=gone_pk, deleted=True).seq
+
+        counts = compact_changes()
+        # Two old link versions, and each deleted link's creation
+        self.assertEqual(counts['superseded'], 4)
+        self.assertEqual(counts['tombstones'], 1)
+        self.assertFalse(Change.objects.filter(object_id=gone_pk).exists())
+        self.assertEqual(ChangeHorizon.get_seq(), expired_seq)
+
+        # Clients behind the horizon missed a deletion
+        with self.assertRaises(ResyncRequired):
+            get_changes(self.user, since=self.start)
+        changes = get_changes(self.user, since=0)
+        self.assertEqual(changes['changed']['link'], [link])
+        self.assertEqual(changes['deleted'], {'link': [recent_pk]})
+
+    def test_resync_response(self):
+        ChangeHorizon.advance(self.start)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/sync/', {'since': self.start - 1})
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(response.data['detail'].code, 'resync_required')
+        response = client.get('/api/sync/', {'since': self.start})
+        self.assertEqual(response.status_code, 200)
+        response = client.get('/api/sync/', {'since': -1})
+        self.assertEqual(response.status_code, 400)
+
+
+class RequestTimingTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice', 'pw')
+        for i in range(3):
+            Link.objects.create(
+                owner=self.user, url='http://example.com/{0}'.format(i)
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @override_settings(REQUEST_TIMING={
+        'ENABLED': True, 'HEADER': True, 'SLOW_THRESHOLD': 60,
+    })
+    def test_server_timing_header(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/links/')
+        self.assertEqual(response.status_code, 200)
+        metrics = dict(
+            metric.split(';', 1)
+            for metric in response['Server-Timing'].split(', ')
+        )
+        self.assertEqual(
+            list(metrics),
+            ['auth', 'perms', 'filter', 'serialize', 'render', 'db', 'total'],
+        )
+        for name, params in metrics.items():
+            self.assertRegex(params, r'^dur=\d+\.\d')
+        count = re.search(r'desc="(\d+) queries"', metrics['db']).group(1)
+        self.assertEqual(int(count), len(queries.captured_queries))
+
+    @override_settings(REQUEST_TIMING={
+        'ENABLED': True, 'HEADER': False, 'SLOW_THRESHOLD': 0,
+    })
+    def test_slow_request_logged(self):
+        with self.assertLogs('backpocket.timing', 'WARNING') as logs:
+            response = self.client.get('/api/links/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertRegex(
+            logs.output[0],
+            r'method=GET path=/api/links/ status=200 user=\S+ total_ms=',
+        )
+
+    @override_settings(REQUEST_TIMING={'ENABLED': False, 'HEADER': True})
+    def test_disabled(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/links/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(len(response.data), 3)
+        self.assertTrue(queries.captured_queries)
+
+
+class UUIDTests(TestCase):
+
+    def test_uuid7_ordered(self):
+        before = int(time.time() * 1000)
+        uids = [uuid7() for _ in range(5000)]
+        after = int(time.time() * 1000)
+        self.assertEqual(uids, sorted(set(uids)))
+        for uid in uids[:10]:
+            self.assertEqual(uid.version, 7)
+            self.assertEqual(uid.variant, uuid.RFC_4122)
+        # Counter overflow may borrow a millisecond or two
+        self.assertLessEqual(before, uids[0].int >> 80)
+        self.assertLessEqual(uids[-1].int >> 80, after + 2)
+
+    def test_uuid7_counter_overflow(self):
+        last = uuid7()
+        millis = (last.int >> 80) + 5
+        # Counter exhausted within a millisecond yet to come
+        with utils._uuid7_lock:
+            utils._uuid7_last = (millis, 0xfff)
+        uid = uuid7()
+        self.assertEqual(uid.int >> 80, millis + 1)
+        self.assertEqual((uid.int >> 64) & 0xfff, 0)
+        self.assertGreater(uid, last)
+        self.assertGreater(uuid7(), uid)
+
+    def test_validuuid(self):
+        uid4, uid7 = uuid.uuid4(), uuid7()
+        self.assertEqual(validuuid(str(uid4)), uid4)
+        self.assertEqual(validuuid(uid7.hex), uid7)
+        self.assertIs(validuuid(uid4), uid4)
+        uid1 = uuid.uuid1()
+        self.assertIsNone(validuuid(str(uid1)))
+        self.assertEqual(validuuid(str(uid1), version=1), uid1)
+        self.assertIsNone(validuuid(str(uid7), version=4))
+        # Version bits right, variant wrong
+        self.assertIsNone(
+            validuuid(str(uuid.UUID(int=uid4.int & ~(1 << 63))))
+        )
+        for invalid in ('', 'not-a-uuid', str(uid4)[:-1], None):
+            with self.subTest(uid=invalid):
+                self.assertIsNone(validuuid(invalid))
+
+
+class MaintenanceTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.source = self.path('source.sqlite3')
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def create(self, journal_mode, rows=2000):
+        with contextlib.closing(sqlite3.connect(self.source)) as conn:
+            conn.execute('PRAGMA journal_mode = {0}'.format(journal_mode))
+            conn.execute('CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT)')
+            conn.executemany(
+                'INSERT INTO t (v) VALUES (?)',
+                (('x' * 200,) for _ in range(rows))
+            )
+            conn.commit()
+
+    def count(self, path):
+        with contextlib.closing(sqlite3.connect(path)) as conn:
+            return conn.execute('SELECT count(*) FROM t').fetchone()[0]
+
+    def test_backup_wal(self):
+        self.create('wal')
+        dest = self.path('backup.sqlite3')
+        result = backup(self.source, dest, pages=16, pause=0)
+        self.assertTrue(result['wal'])
+        self.assertGreater(result['steps'], 1)
+        self.assertEqual(result['restarts'], 0)
+        self.assertEqual(self.count(dest), 2000)
+        self.assertFalse(os.path.exists(dest + '.partial'))
+
+    def test_backup_rollback_journal_restarts(self):
+        self.create('delete')
+        dest = self.path('backup.sqlite3')
+        written = []
+
+        def write_once(remaining, total):
+            # Between steps, as a server would
+            if not written:
+                with contextlib.closing(sqlite3.connect(self.source)) as c:
+                    c.execute("INSERT INTO t (v) VALUES ('late')")
+                    c.commit()
+                written.append(True)
+
+        result = backup(
+            self.source, dest, pages=16, pause=0, progress=write_once
+        )
+        self.assertFalse(result['wal'])
+        self.assertEqual(result['restarts'], 1)
+        self.assertEqual(self.count(dest), 2001)
+
+        written.clear()
+        with self.assertRaises(BackupRestarted):
+            backup(
+                self.source, dest, pages=16, pause=0, progress=write_once,
+                max_restarts=0,
+            )
+        self.assertFalse(os.path.exists(dest + '.partial'))
+
+    def test_backup_compressed(self):
+        self.create('wal')
+        dest = self.path('backup.sqlite3.gz')
+        result = backup(self.source, dest, pause=0, compress=True)
+        self.assertLess(result['dest_bytes'], result['source_bytes'])
+        restored = self.path('restored.sqlite3')
+        with gzip.open(dest, 'rb') as infile, open(restored, 'wb') as out:
+            shutil.copyfileobj(infile, out)
+        self.assertEqual(self.count(restored), 2000)
+
+    def test_incremental_vacuum(self):
+        self.create('wal')
+        with self.assertRaises(VacuumNotIncremental):
+            incremental_vacuum(self.source)
+        enable_incremental(self.source)
+        with contextlib.closing(sqlite3.connect(self.source)) as conn:
+            conn.execute('DELETE FROM t WHERE id > 100')
+            conn.commit()
+            free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        self.assertGreater(free, 20)
+
+        result = incremental_vacuum(self.source, slice_pages=10, pause=0)
+        self.assertEqual(result['freed_pages'], free)
+        self.assertEqual(result['remaining_pages'], 0)
+        self.assertEqual(result['slices'], -(-free // 10))
+        with contextlib.closing(sqlite3.connect(self.source)) as conn:
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+            pages = conn.execute('PRAGMA page_count').fetchone()[0]
+        self.assertEqual(os.path.getsize(self.source), pages * page_size)
+        self.assertEqual(self.count(self.source), 100)
+
+
+class ThrottleStoreTests(TestCase):
+
+    def stores(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        cache_store = CacheThrottleStore()
+        cache_store.clear()
+        return [
+            LocMemThrottleStore(),
+            SQLiteThrottleStore(os.path.join(directory, 'throttle.sqlite3')),
+            cache_store,
+        ]
+
+    def test_limit(self):
+        # Start of a window, for the cache store
+        now = 600.0
+        for store in self.stores():
+            with self.subTest(store=type(store).__name__):
+                for _ in range(3):
+                    self.assertEqual(store.take('a', 3, 60, now), 0)
+                self.assertGreater(store.take('a', 3, 60, now), 0)
+                # Keys have their own budgets
+                self.assertEqual(store.take('b', 3, 60, now), 0)
+
+    def test_token_bucket_wait(self):
+        for store in self.stores()[:2]:
+            with self.subTest(store=type(store).__name__):
+                for _ in range(3):
+                    store.take('a', 3, 60, 600.0)
+                # One token back every 20 seconds
+                self.assertAlmostEqual(store.take('a', 3, 60, 610.0), 10)
+                self.assertEqual(store.take('a', 3, 60, 620.0), 0)
+                self.assertGreater(store.take('a', 3, 60, 620.0), 0)
+
+    def test_sliding_window_wait(self):
+        store = self.stores()[2]
+        for _ in range(3):
+            store.take('a', 3, 60, 600.0)
+        self.assertAlmostEqual(store.take('a', 3, 60, 600.0), 60)
+        # Next window, the previous one's count still weighing fully
+        self.assertAlmostEqual(store.take('a', 3, 60, 660.0), 20)
+        # A third of the way in, a third of it has decayed
+        self.assertEqual(store.take('a', 3, 60, 680.0), 0)
+
+
+class ThrottleView:
+    bulk_actions = ('export',)
+
+    def __init__(self, action):
+        self.action = action
+
+
+@override_settings(REST_FRAMEWORK={
+    'DEFAULT_THROTTLE_RATES': {
+        'read': '3/min', 'write': '2/min', 'bulk': '1/hour',
+    },
+})
+class ActionScopedThrottleTests(TestCase):
+
+    def setUp(self):
+        get_throttle_store().clear()
+        self.factory = APIRequestFactory()
+        self.user = User(pk=1, username='alice')
+
+    def request(self, method='get'):
+        request = getattr(self.factory, method)('/api/users/')
+        request.user = self.user
+        return request
+
+    def throttle(self):
+        throttle = ActionScopedThrottle()
+        throttle.timer = lambda: 600.0
+        return throttle
+
+    def test_scope_by_action(self):
+        throttle = self.throttle()
+        for method, action, scope in (
+                ('get', 'list', 'read'), ('post', 'create', 'write'),
+                ('delete', None, 'write'), ('get', 'export', 'bulk'),
+                ('post', 'export', 'bulk')):
+            with self.subTest(method=method, action=action):
+                self.assertEqual(
+                    throttle.get_scope(
+                        self.request(method), ThrottleView(action)
+                    ),
+                    scope,
+                )
+
+    def test_separate_budgets(self):
+        allowed = lambda method, action: self.throttle().allow_request(
+            self.request(method), ThrottleView(action)
+        )
+        self.assertEqual(
+            [allowed('post', 'create') for _ in range(3)],
+            [True, True, False],
+        )
+        # Reads unaffected by spent writes
+        self.assertEqual(
+            [allowed('get', 'list') for _ in range(4)],
+            [True, True, True, False],
+        )
+        self.assertTrue(allowed('get', 'export'))
+        throttle = self.throttle()
+        self.assertFalse(
+            throttle.allow_request(self.request(), ThrottleView('export'))
+        )
+        self.assertEqual(throttle.wait(), 3600)
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        self.store = BlobStore(root)
+        self.user = User.objects.create_user('user', 'pw')
+        links = []
+        for i in range(3):
+            link = Link.objects.create(
+                owner=self.user, url='http://example.com/{0}'.format(i)
+            )
+            set_tags(link, ['tag{0}'.format(i)])
+            links.append(link)
+        reading = List.objects.create(owner=self.user, name='Reading')
+        for i, link in enumerate(reversed(links)):
+            ListItem.objects.create(list=reading, link=link, position=i)
+        self.html = b'<p>' + b'x' * 2000 + b'</p>'
+        Page.objects.create(
+            owner=self.user, link=links[0], url=links[0].url, text='x',
+            html_hash=self.store.put(self.html),
+        )
+        self.export = LibraryExport(self.user, self.user, store=self.store)
+
+    def test_archive(self):
+        data = b''.join(self.export.stream())
+        self.assertEqual(len(data), self.export.size())
+        archive = tarfile.open(fileobj=io.BytesIO(data))
+        page = json.loads(
+            archive.extractfile('backpocket/pages.jsonl').read().decode()
+        )
+        self.assertEqual(
+            archive.extractfile('backpocket/' + page['html']).read(),
+            self.html,
+        )
+        links = [
+            json.loads(line) for line in
+            archive.extractfile('backpocket/links.jsonl').read().splitlines()
+        ]
+        self.assertEqual(links[0]['tags'], ['tag0'])
+        reading = json.loads(
+            archive.extractfile('backpocket/lists.jsonl').read().decode()
+        )
+        self.assertEqual(
+            reading['links'], [link['id'] for link in reversed(links)]
+        )
+
+        # Every resumed range matches the same bytes of the whole
+        for start in range(0, len(data), 389):
+            self.assertEqual(
+                b''.join(self.export.stream(start, start + 999)),
+                data[start:start + 1000],
+            )
+
+    def test_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = '/api/users/{0}/export/'.format(self.user.pk)
+        with override_settings(PAGE_ARCHIVE={'BLOB_DIR': self.store.root}):
+            response = client.get(url)
+            data = b''.join(response.streaming_content)
+            self.assertEqual(int(response['Content-Length']), len(data))
+            response = client.get(
+                url, HTTP_RANGE='bytes=1000-',
+                HTTP_IF_RANGE=response['ETag'],
+            )
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(
+                b''.join(response.streaming_content), data[1000:]
+            )
+            response = client.get(
+                url, HTTP_RANGE='bytes=1000-', HTTP_IF_RANGE='"stale"'
+            )
+            self.assertEqual(response.status_code, 200)
+
+        client.force_authenticate(User.objects.create_user('other', 'pw'))
+        self.assertEqual(client.get(url).status_code, 404)
+
+
+class RendererTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('user', 'pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = '/api/users/{0}/'.format(self.user.pk)
+
+    def test_json_matches_drf(self):
+        data = [{
+            'id': self.user.pk, 'date': datetime.date(2017, 1, 2),
+            'when': datetime.datetime(
+                2017, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc
+            ),
+            'amount': decimal.Decimal('1.5'), 'text': 'caf\xe9 \u2028',
+            'none': None, 'list': [1, 2.5, True],
+        }]
+        for media_type in ('application/json',
+                           'application/json; indent=4'):
+            self.assertEqual(
+                JSONRenderer().render(data, media_type),
+                DRFJSONRenderer().render(data, media_type),
+            )
+
+    def test_json_request(self):
+        response = self.client.patch(
+            self.url, {'name': 'Caf\xe9'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(response.content.decode())['name'],
+                         'Caf\xe9')
+        response = self.client.patch(
+            self.url, '{"name":', content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_json_request_strict(self):
+        # NaN and Infinity aren't JSON, and are refused as DRF does
+        for value in ('NaN', 'Infinity', '-Infinity'):
+            response = self.client.patch(
+                self.url, '{{"name": "x", "n": {0}}}'.format(value),
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, 400)
+        parser = JSONParser()
+        parser.strict = False
+        self.assertEqual(
+            parser.parse(io.BytesIO(b'{"n": Infinity}')), {'n': float('inf')}
+        )
+
+    @unittest.skipIf(msgpack is None, 'msgpack not installed')
+    def test_msgpack(self):
+        response = self.client.patch(
+            self.url, msgpack.packb({'name': 'Packed'}, use_bin_type=True),
+            content_type=MessagePackRenderer.media_type,
+            HTTP_ACCEPT=MessagePackRenderer.media_type,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response['Content-Type'], MessagePackRenderer.media_type
+        )
+        packed = msgpack.unpackb(response.content, raw=False)
+        self.assertEqual(packed['name'], 'Packed')
+        self.assertEqual(
+            packed, json.loads(self.client.get(self.url).content.decode())
+        )
+
+
+class RouterQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """
+    Query counts for each routed viewset, with enough rows that any
+    per-row query would show up as a repeat.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'admin', 'pw', email='admin@example.com'
+        )
+        cls.user = User.objects.create_user(
+            'user', 'pw', email='user@example.com'
+        )
+        for i in range(8):
+            User.objects.create_user(
+                'other{0}'.format(i), 'pw', parent=cls.user
+            )
+        for i in range(3):
+            group = Group.objects.create(name='group{0}'.format(i))
+            group.permissions.set(Permission.objects.all()[i:i + 3])
+            group.user_set.set(User.objects.all())
+        cls.links = []
+        for i in range(10):
+            link = Link.objects.create(
+                owner=cls.user, url='http://example.com/{0}'.format(i),
+                title='Example {0}'.format(i),
+            )
+            set_tags(link, ['tag{0}'.format(i % 3), 'all'])
+            cls.links.append(link)
+
+    def test_links(self):
+        response = self.assert_query_budget('link-list', 2, user=self.user)
+        self.assertEqual(len(response.data), 10)
+        self.assert_query_budget(
+            'link-detail', 2, kwargs={'pk': self.links[0].pk}, user=self.user
+        )
+
+    def test_link_facets(self):
+        self.assert_query_budget('link-facets', 1, user=self.user)
+        self.assert_query_budget(
+            'link-facets', 1, data={'tag': 'all'}, user=self.user
+        )
+
+    def test_users(self):
+        response = self.assert_query_budget(
+            'user-list', 1, user=self.admin
+        )
+        self.assertEqual(len(response.data), 10)
+        response = self.assert_query_budget('user-list', 1, user=self.user)
+        self.assertEqual(len(response.data), 9)
+        self.assert_query_budget(
+            'user-detail', 1, kwargs={'pk': self.user.pk}, user=self.user
+        )
+
+    def test_user_groups_and_permissions(self):
+        response = self.assert_query_budget(
+            'user-groups', 4, kwargs={'pk': self.user.pk}, user=self.user
+        )
+        self.assertEqual(len(response.data), 3)
+        self.assertEqual(len(response.data[0]['members']), 9)
+        response = self.assert_query_budget(
+            'user-permissions', 3, kwargs={'pk': self.user.pk},
+            user=self.user
+        )
+        self.assertIn(
+            'bp_users.view_user', response.data['object_permissions']
+        )
+
+    def test_groups(self):
+        response = self.assert_query_budget(
+            'group-list', 3, user=self.admin
+        )
+        self.assertEqual(len(response.data[0]['members']), 10)
+        self.assert_query_budget('group-list', 3, user=self.user)
+
+    def test_search(self):
+        response = self.assert_query_budget(
+            'search-list', 3, data={'q': 'example'}, user=self.user
+        )
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_sync(self):
+        response = self.assert_query_budget(
+            'sync-list', 6, data={'since': 0}, user=self.user
+        )
+        self.assertTrue(response.data['changed'])
@@ -1,12 +1,18 @@
 from django.conf.urls import url, include
 from rest_framework import routers
-from backpocket.users.views import UserViewSet
+from backpocket.api.views import SyncViewSet
+from backpocket.links.views import LinkViewSet
+from backpocket.search.views import SearchViewSet
+from backpocket.users.views import UserViewSet, GroupViewSet
 
 router = routers.DefaultRouter()
-# router.register(r'links', UserViewSet)
+router.register(r'links', LinkViewSet)
 # router.register(r'lists', UserViewSet)
 # router.register(r'pages', UserViewSet)
 router.register(r'users', UserViewSet)
+router.register(r'groups', GroupViewSet)
+router.register(r'search', SearchViewSet, base_name='search')
+router.register(r'sync', SyncViewSet, base_name='sync')
 
 urlpatterns = [
     url(r'^', include(router.urls)),
@@ -1,3 +1,54 @@
-from django.shortcuts import render
+from rest_framework import exceptions, permissions, status, viewsets
+from rest_framework.response import Response
+from backpocket.api.changes import (
+    get_changes, get_sync_kinds, ResyncRequired
+)
+from backpocket.timing import RequestTimingMixin
 
-# Create your views here.
+
+class ResyncRequiredError(exceptions.APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = 'Sequence too old, full resync required.'
+    default_code = 'resync_required'
+
+
+class SyncViewSet(RequestTimingMixin, viewsets.ViewSet):
+    """
+    Change feed for offline clients. Returns objects changed or deleted
+    after the 'since' sequence number; repeat with the returned 'seq'
+    while 'more' is true. Start from since=0 for a full sync.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    page_size = 500
+
+    def list(self, request):
+        try:
+            since = int(request.query_params.get('since', 0))
+        except ValueError:
+            raise exceptions.ValidationError({'since': 'Must be an integer.'})
+        if since < 0:
+            raise exceptions.ValidationError({'since': 'Must be positive.'})
+
+        try:
+            changes = get_changes(
+                request.user, since=since, limit=self.page_size
+            )
+        except ResyncRequired:
+            raise ResyncRequiredError
+
+        context = {'request': request, 'view': self}
+        sync_kinds = get_sync_kinds()
+        changed = {
+            kind: sync_kinds[kind].serializer(
+                objects, many=True, context=context
+            ).data
+            for kind, objects in changes['changed'].items()
+        }
+
+        return Response({
+            'seq': changes['seq'],
+            'more': changes['more'],
+            'changed': changed,
+            'deleted': changes['deleted'],
+        })
@@ -0,0 +1,21 @@
+from django.contrib import admin
+from backpocket.audit.models import AuditEvent
+
+
+@admin.register(AuditEvent)
+class AuditEventAdmin(admin.ModelAdmin):
+    list_display = ('timestamp', 'actor', 'action', 'subject_id')
+    list_filter = ('action',)
+    list_select_related = ('actor',)
+    readonly_fields = (
+        'timestamp', 'actor', 'action', 'subject_id', 'permission',
+        'detail',
+    )
+
+    # Append-only: viewable, never added, changed or deleted here
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,7 @@
+from django.apps import AppConfig
+
+
+class AuditConfig(AppConfig):
+    name = 'backpocket.audit'
+    label = 'bp_audit'
+    verbose_name = 'Audit'
@@ -0,0 +1,193 @@
+"""
+Audit trail for permission-sensitive actions on users.
+
+Rather than an INSERT per action, events are buffered in-process once
+the request's transaction commits (so rolled-back actions leave no
+trace) and written with bulk inserts, when the buffer fills or the
+flush interval has passed, and at interpreter exit. Events buffered by
+a process that crashes are lost; set SYNC to write each event in the
+action's own transaction instead, as tests do.
+
+Events older than the retention period are moved to gzipped JSON
+lines files, one per month, appended to as each run archives more.
+Each batch is written to its file before being deleted, so a crash
+mid-run may archive a batch twice, never zero times.
+"""
+import atexit, datetime, gzip, json, os, threading, time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from backpocket.audit.models import AuditEvent
+from backpocket.utils import utcnow
+
+
+def _setting(name, default):
+    return getattr(settings, 'AUDIT_LOG', {}).get(name, default)
+
+
+class AuditLog:
+    """
+    Buffers events and writes them in bulk, or at once while the SYNC
+    setting is on.
+    """
+
+    def __init__(self, interval=5, max_buffer=500):
+        self.interval = interval
+        self.max_buffer = max_buffer
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def record(self, actor, action, subject_ids=(None,), permission='',
+               **detail):
+        '''Records action by actor (a user, or None for the system) on
+        each of subject_ids, with keyword arguments as details.
+        '''
+        now = utcnow()
+        detail = json.dumps(detail, cls=DjangoJSONEncoder) if detail else ''
+        events = [
+            AuditEvent(
+                timestamp=now, actor_id=actor.pk if actor else None,
+                action=action, subject_id=subject_id,
+                permission=permission, detail=detail,
+            )
+            for subject_id in subject_ids
+        ]
+        if _setting('SYNC', False):
+            AuditEvent.objects.bulk_create(events)
+        else:
+            transaction.on_commit(lambda: self._add(events))
+
+    def _add(self, events):
+        with self._lock:
+            self._pending.extend(events)
+            full = len(self._pending) >= self.max_buffer
+        if full or time.monotonic() - self._last_flush >= self.interval:
+            # One flushing thread at a time; others carry on
+            if self._flush_lock.acquire(blocking=False):
+                try:
+                    self._flush()
+                finally:
+                    self._flush_lock.release()
+
+    def _flush(self):
+        self._last_flush = time.monotonic()
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+        try:
+            AuditEvent.objects.bulk_create(pending, batch_size=500)
+        except BaseException:
+            # Put them back, ahead of anything added meanwhile
+            with self._lock:
+                self._pending[:0] = pending
+            raise
+        return len(pending)
+
+    def flush(self):
+        '''Writes all buffered events. Returns the number written.'''
+        with self._flush_lock:
+            return self._flush()
+
+
+def events(actor=None, start=None, end=None):
+    '''Returns a queryset of events in [start, end), optionally by one
+    actor, oldest first. Buffered events aren't included until flushed.
+    '''
+    queryset = AuditEvent.objects.order_by('timestamp', 'pk')
+    if actor is not None:
+        queryset = queryset.filter(actor_id=actor.pk)
+    if start is not None:
+        queryset = queryset.filter(timestamp__gte=start)
+    if end is not None:
+        queryset = queryset.filter(timestamp__lt=end)
+    return queryset
+
+
+def _archive_record(event):
+    return {
+        'id': event['id'],
+        'timestamp': event['timestamp'],
+        'actor': event['actor_id'],
+        'action': event['action'],
+        'subject': event['subject_id'],
+        'permission': event['permission'],
+        'detail': json.loads(event['detail']) if event['detail'] else {},
+    }
+
+
+def archive_events(before=None, directory=None, batch_size=500):
+    '''Moves events older than before (datetime; default the retention
+    period ago) to gzipped JSON lines files in directory, named
+    audit-YYYY-MM.jsonl.gz by month. Returns the number of events
+    archived.
+    '''
+    if before is None:
+        before = utcnow() - datetime.timedelta(
+            days=_setting('RETENTION_DAYS', 365)
+        )
+    directory = directory or _setting(
+        'ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'data', 'audit')
+    )
+    os.makedirs(directory, exist_ok=True)
+    fields = (
+        'id', 'timestamp', 'actor_id', 'action', 'subject_id',
+        'permission', 'detail',
+    )
+    archived = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                AuditEvent.objects.filter(timestamp__lt=before)
+                .order_by('timestamp', 'pk').values(*fields)[:batch_size]
+            )
+            if not batch:
+                return archived
+            months = {}
+            for event in batch:
+                months.setdefault(
+                    event['timestamp'].strftime('%Y-%m'), []
+                ).append(event)
+            for month, month_events in sorted(months.items()):
+                path = os.path.join(
+                    directory, 'audit-{0}.jsonl.gz'.format(month)
+                )
+                lines = ''.join(
+                    json.dumps(
+                        _archive_record(event), cls=DjangoJSONEncoder,
+                        sort_keys=True,
+                    ) + '\n'
+                    for event in month_events
+                )
+                # Each append is a complete gzip member of its own
+                with open(path, 'ab') as f:
+                    f.write(gzip.compress(lines.encode('utf-8')))
+                    f.flush()
+                    os.fsync(f.fileno())
+            AuditEvent.objects.filter(
+                pk__in=[event['id'] for event in batch]
+            ).delete()
+        archived += len(batch)
+
+
+def read_archive(path):
+    '''Yields the event dicts in an archive file, in order.'''
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def _create_log():
+    return AuditLog(
+        interval=_setting('FLUSH_INTERVAL', 5),
+        max_buffer=_setting('MAX_BUFFER', 500),
+    )
+
+
+audit_log = _create_log()
+
+# Graceful shutdown writes whatever is still buffered
+atexit.register(audit_log.flush)
@@ -0,0 +1,30 @@
+import datetime
+from django.core.management.base import BaseCommand
+from backpocket.audit.log import archive_events
+from backpocket.utils import utcnow
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves audit events older than the retention period to gzipped '
+        'monthly archive files.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help='Keep this many days of events in the database '
+                 '(default AUDIT_LOG RETENTION_DAYS setting).',
+        )
+        parser.add_argument(
+            '--dir', dest='directory', default=None,
+            help='Archive directory (default AUDIT_LOG ARCHIVE_DIR '
+                 'setting).',
+        )
+
+    def handle(self, *args, **options):
+        before = None
+        if options['days'] is not None:
+            before = utcnow() - datetime.timedelta(days=options['days'])
+        count = archive_events(before, directory=options['directory'])
+        self.stdout.write('Archived {0} event(s)'.format(count))
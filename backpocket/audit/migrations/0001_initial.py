@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 15:33
+from __future__ import unicode_literals
+
+import backpocket.utils
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False, verbose_name='event ID')),
+                ('timestamp', models.DateTimeField(db_index=True, default=backpocket.utils.utcnow, verbose_name='timestamp')),
+                ('action', models.CharField(max_length=64, verbose_name='action')),
+                ('subject_id', models.UUIDField(null=True, verbose_name='subject ID')),
+                ('permission', models.CharField(blank=True, max_length=100, verbose_name='permission')),
+                ('detail', models.TextField(blank=True, verbose_name='detail')),
+                ('actor', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='actor')),
+            ],
+            options={
+                'verbose_name': 'audit event',
+                'verbose_name_plural': 'audit events',
+                'db_table': 'bp_audit_event',
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='auditevent',
+            index_together=set([('actor', 'timestamp')]),
+        ),
+    ]
@@ -0,0 +1,44 @@
+import json
+from django.conf import settings
+from django.db import models
+from backpocket.utils import utcnow
+
+
+class AuditEvent(models.Model):
+    """
+    Append-only record of a permission-sensitive action by one user
+    (the actor) on another (the subject). Written in batches by
+    backpocket.audit.log, and moved to archive files once old.
+    """
+
+    class Meta:
+        verbose_name = 'audit event'
+        verbose_name_plural = 'audit events'
+        db_table = 'bp_audit_event'
+        index_together = (('actor', 'timestamp'),)
+
+    id = models.BigAutoField('event ID', primary_key=True)
+    timestamp = models.DateTimeField(
+        'timestamp', default=utcnow, db_index=True
+    )
+    # No constraints, so events outlive deleted users
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        related_name='+',
+        verbose_name='actor',
+    )
+    action = models.CharField('action', max_length=64)
+    subject_id = models.UUIDField('subject ID', null=True)
+    # Permission the action required, as 'app_label.codename'
+    permission = models.CharField('permission', max_length=100, blank=True)
+    # JSON object of action-specific details
+    detail = models.TextField('detail', blank=True)
+
+    def get_detail(self):
+        return json.loads(self.detail) if self.detail else {}
+
+    def __str__(self):
+        return '{0} {1}'.format(self.timestamp, self.action)
@@ -0,0 +1,144 @@
+import datetime, os, shutil, tempfile
+from django.contrib.auth.models import Group
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from backpocket.audit.log import (
+    AuditLog, archive_events, events, read_archive,
+)
+from backpocket.audit.models import AuditEvent
+from backpocket.users import bulk
+from backpocket.users.models import User
+from backpocket.utils import utcnow
+
+
+@override_settings(AUDIT_LOG={'SYNC': True})
+class AuditEventTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'root', 'pw', email='root@example.net'
+        )
+        cls.users = [
+            User.objects.create_user('user{0}'.format(i), 'pw')
+            for i in range(3)
+        ]
+
+    def test_api_actions(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        user = self.users[0]
+        url = '/api/users/{0}/'.format(user.pk)
+        client.post(url + 'activate/', {'is_active': False}, format='json')
+        client.post(url + 'reset_password/')
+        # Unchanged, so not recorded
+        client.post(url + 'activate/', {'is_active': False}, format='json')
+        self.assertEqual(
+            [(e.actor_id, e.action, e.subject_id, e.permission)
+             for e in events(actor=self.admin)],
+            [
+                (self.admin.pk, 'user.deactivate', user.pk,
+                 'bp_users.set_user_active'),
+                (self.admin.pk, 'user.reset_password', user.pk,
+                 'bp_users.reset_user_password'),
+            ]
+        )
+        self.assertEqual(
+            events(actor=self.admin).last().get_detail(), {'sent': False}
+        )
+
+    def test_bulk_event_per_user(self):
+        group = Group.objects.create(name='readers')
+        bulk.add_to_group(self.admin, User.objects.all(), group)
+        recorded = AuditEvent.objects.filter(action='user.add_to_group')
+        self.assertEqual(
+            {event.subject_id for event in recorded},
+            {self.admin.pk} | {user.pk for user in self.users},
+        )
+        self.assertEqual(recorded[0].get_detail(), {'group': 'readers'})
+
+    def test_rolled_back_with_action(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            bulk.set_active(self.admin, User.objects.all(), False)
+            raise RuntimeError
+        self.assertFalse(AuditEvent.objects.exists())
+
+    def test_time_range(self):
+        now = utcnow()
+        for days in (30, 20, 10):
+            AuditEvent.objects.create(
+                actor=self.admin, action='user.change',
+                timestamp=now - datetime.timedelta(days=days),
+            )
+        AuditEvent.objects.create(actor=self.users[0], action='user.change')
+        self.assertEqual(events(actor=self.admin).count(), 3)
+        self.assertEqual(
+            events(
+                actor=self.admin, start=now - datetime.timedelta(days=25),
+                end=now - datetime.timedelta(days=5),
+            ).count(),
+            2,
+        )
+
+    def test_archive(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        for when in ('2016-01-31T23:00', '2016-02-01T01:00',
+                     '2016-02-03T00:00', '2017-06-01T00:00'):
+            AuditEvent.objects.create(
+                actor=self.admin, action='user.change',
+                subject_id=self.users[0].pk, detail='{"fields": ["name"]}',
+                timestamp=datetime.datetime.strptime(
+                    when, '%Y-%m-%dT%H:%M'
+                ).replace(tzinfo=datetime.timezone.utc),
+            )
+        before = datetime.datetime(2017, 1, 1, tzinfo=datetime.timezone.utc)
+        self.assertEqual(
+            archive_events(before, directory, batch_size=2), 3
+        )
+        self.assertEqual(
+            sorted(os.listdir(directory)),
+            ['audit-2016-01.jsonl.gz', 'audit-2016-02.jsonl.gz'],
+        )
+        archived = list(
+            read_archive(os.path.join(directory, 'audit-2016-02.jsonl.gz'))
+        )
+        self.assertEqual(
+            [event['timestamp'] for event in archived],
+            ['2016-02-01T01:00:00Z', '2016-02-03T00:00:00Z'],
+        )
+        self.assertEqual(archived[0]['subject'], str(self.users[0].pk))
+        self.assertEqual(archived[0]['detail'], {'fields': ['name']})
+        self.assertEqual(AuditEvent.objects.count(), 1)
+
+
+class AuditBufferTests(TransactionTestCase):
+
+    def test_buffered_until_flush(self):
+        admin = User.objects.create_superuser(
+            'root', 'pw', email='root@example.net'
+        )
+        log = AuditLog(interval=3600, max_buffer=3)
+        log.record(admin, 'user.change', [admin.pk])
+        with transaction.atomic():
+            log.record(admin, 'user.change', [admin.pk])
+            # Not buffered until the transaction commits
+            self.assertEqual(len(log._pending), 1)
+        self.assertEqual(len(log._pending), 2)
+        self.assertFalse(AuditEvent.objects.exists())
+
+        # Full buffer flushed in one insert
+        with CaptureQueriesContext(connection) as queries:
+            log.record(admin, 'user.change', [admin.pk])
+        self.assertEqual(
+            [q['sql'].split()[0] for q in queries.captured_queries
+             if not q['sql'].startswith('BEGIN')],
+            ['INSERT'],
+        )
+        self.assertEqual(AuditEvent.objects.count(), 3)
+        log.record(admin, 'user.change', [admin.pk])
+        self.assertEqual(log.flush(), 1)
+        self.assertEqual(log.flush(), 0)
+        self.assertEqual(AuditEvent.objects.count(), 4)
@@ -0,0 +1,108 @@
+"""
+Import-time profile.
+
+ImportProfiler sits at the front of sys.meta_path and times each
+module's execution, so the report shows which imports a cold worker
+spends its start-up on. Self time excludes nested imports; cumulative
+time includes them. Stdlib-only, so it can be installed before Django
+or anything else is imported.
+"""
+import os, sys, time
+
+
+class _TimedLoader:
+    """
+    Loader proxy timing exec_module() into an ImportProfiler.
+    """
+
+    def __init__(self, loader, profiler):
+        self._loader = loader
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        profiler = self._profiler
+        profiler._stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            total = time.perf_counter() - start
+            nested = profiler._stack.pop()
+            if profiler._stack:
+                profiler._stack[-1] += total
+            profiler.times[module.__name__] = (total - nested, total)
+
+
+class ImportProfiler:
+    """
+    Meta path finder recording (self, cumulative) seconds per module
+    imported while installed.
+    """
+
+    def __init__(self):
+        self.times = {}
+        self._stack = []
+        self._finding = set()
+
+    @classmethod
+    def from_environ(cls, name='BACKPOCKET_PROFILE_IMPORTS'):
+        '''Returns an installed profiler if the environment variable is
+        set to a non-empty value other than '0', otherwise None.
+        '''
+        if os.environ.get(name, '0') in ('', '0'):
+            return None
+        profiler = cls()
+        profiler.install()
+        return profiler
+
+    def install(self):
+        sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, fullname, path, target=None):
+        # Let the remaining finders locate it, then wrap its loader
+        if fullname in self._finding:
+            return None
+        self._finding.add(fullname)
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, 'find_spec'):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._finding.discard(fullname)
+
+        if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+            spec.loader = _TimedLoader(spec.loader, self)
+        return spec
+
+    def total(self):
+        '''Seconds spent executing imported modules.'''
+        return sum(own for own, _ in self.times.values())
+
+    def report(self, limit=25):
+        lines = ['{0:.1f}ms importing {1} modules; slowest by self time:'
+                 .format(self.total() * 1000, len(self.times))]
+        slowest = sorted(
+            self.times.items(), key=lambda item: -item[1][0]
+        )[:limit]
+        lines.extend(
+            '  {0:8.2f}ms self {1:8.2f}ms cumulative  {2}'.format(
+                own * 1000, cumulative * 1000, name
+            )
+            for name, (own, cumulative) in slowest
+        )
+        return '\n'.join(lines)
@@ -0,0 +1,267 @@
+"""
+Write-behind visit counts and read progress for links.
+
+Clients report opens and scroll position often, so rather than an
+UPDATE per event, reports are merged in a buffer (in-process, or an
+SQLite file shared by all workers on a host) and written periodically
+with one batched UPDATE per chunk of links. Buffered entries are only
+dropped once the UPDATE succeeds, and are flushed at interpreter exit,
+so nothing is lost on graceful shutdown; a crash mid-flush may count
+a batch twice, never zero times.
+
+Flushes use queryset updates, so they neither touch date_modified nor
+send model signals; links_updated is sent for each chunk instead, so
+the change feed picks them up.
+"""
+import atexit, collections, datetime, os, sqlite3, threading, time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Case, When, Value, F, DateTimeField, FloatField, IntegerField
+)
+from django.utils.module_loading import import_string
+from backpocket.links.models import Link
+from backpocket.links.signals import links_updated
+from backpocket.utils import utcnow
+
+
+# Merged activity for one link; progress is None if not reported
+Pending = collections.namedtuple(
+    'Pending', ('visits', 'last_visited', 'progress', 'progress_at')
+)
+
+
+def _merge(old, new):
+    if old is None:
+        return new
+    if new.progress is not None and (
+            old.progress is None or new.progress_at >= old.progress_at):
+        progress, progress_at = new.progress, new.progress_at
+    else:
+        progress, progress_at = old.progress, old.progress_at
+    return Pending(
+        visits=old.visits + new.visits,
+        last_visited=max(
+            filter(None, (old.last_visited, new.last_visited)), default=None
+        ),
+        progress=progress,
+        progress_at=progress_at,
+    )
+
+
+class BaseActivityBuffer:
+    """
+    Buffer interface. 'flush()' passes all pending entries, keyed by
+    link ID string, to apply(); they're discarded only if it returns
+    without raising.
+    """
+
+    def add(self, link_id, pending):
+        raise NotImplementedError
+
+    def flush(self, apply):
+        raise NotImplementedError
+
+
+class LocMemActivityBuffer(BaseActivityBuffer):
+    """
+    Per-process buffer. Survives graceful shutdown only.
+    """
+
+    def __init__(self, **options):
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def add(self, link_id, pending):
+        with self._lock:
+            self._pending[link_id] = _merge(
+                self._pending.get(link_id), pending
+            )
+
+    def flush(self, apply):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        try:
+            return apply(pending)
+        except BaseException:
+            # Put it all back, merged with anything added meanwhile
+            for link_id, entry in pending.items():
+                self.add(link_id, entry)
+            raise
+
+
+class SQLiteActivityBuffer(BaseActivityBuffer):
+    """
+    Buffer in a separate SQLite file shared by all workers on a host,
+    so any worker's flush covers everyone's reports and a crashed
+    worker's reports are kept. The file's write lock is held while
+    applying, so reports can't slip in between applying and clearing.
+    """
+
+    def __init__(self, path=None, **options):
+        self.path = path or os.path.join(
+            settings.BASE_DIR, 'data', 'activity.sqlite3'
+        )
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None
+            )
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS pending ('
+                'link_id TEXT PRIMARY KEY, visits INTEGER, '
+                'last_visited REAL, progress REAL, progress_at REAL)'
+            )
+            self._local.connection = conn
+        return conn
+
+    def add(self, link_id, pending):
+        to_ts = lambda dt: dt.timestamp() if dt else None
+        self.connection.execute(
+            'INSERT INTO pending VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (link_id) DO UPDATE SET '
+            'visits = visits + excluded.visits, '
+            'last_visited = max('
+            'coalesce(last_visited, excluded.last_visited), '
+            'coalesce(excluded.last_visited, last_visited)), '
+            'progress = CASE WHEN excluded.progress IS NOT NULL AND '
+            '(progress IS NULL OR excluded.progress_at >= progress_at) '
+            'THEN excluded.progress ELSE progress END, '
+            'progress_at = CASE WHEN excluded.progress IS NOT NULL AND '
+            '(progress IS NULL OR excluded.progress_at >= progress_at) '
+            'THEN excluded.progress_at ELSE progress_at END',
+            (
+                link_id, pending.visits, to_ts(pending.last_visited),
+                pending.progress, to_ts(pending.progress_at),
+            )
+        )
+
+    def flush(self, apply):
+        from_ts = lambda ts: (
+            datetime.datetime.fromtimestamp(ts, datetime.timezone.utc)
+            if ts else None
+        )
+        conn = self.connection
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            pending = {
+                link_id: Pending(
+                    visits, from_ts(last_visited),
+                    progress, from_ts(progress_at),
+                )
+                for link_id, visits, last_visited, progress, progress_at
+                in conn.execute('SELECT * FROM pending')
+            }
+            count = apply(pending) if pending else 0
+            conn.execute('DELETE FROM pending')
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return count
+
+
+def apply_activity(pending, chunk_size=200):
+    '''Writes merged activity to links with one UPDATE per chunk.
+    Returns the number of links updated.
+    '''
+    updated = 0
+    link_ids = list(pending)
+    with transaction.atomic():
+        for start in range(0, len(link_ids), chunk_size):
+            chunk = link_ids[start:start + chunk_size]
+            visited = [pk for pk in chunk if pending[pk].visits]
+            read = [pk for pk in chunk if pending[pk].progress is not None]
+            fields = {}
+            if visited:
+                fields['visit_count'] = F('visit_count') + Case(
+                    *(When(pk=pk, then=Value(pending[pk].visits))
+                      for pk in visited),
+                    default=Value(0), output_field=IntegerField()
+                )
+                fields['last_visited'] = Case(
+                    *(When(pk=pk, then=Value(pending[pk].last_visited))
+                      for pk in visited),
+                    default=F('last_visited'), output_field=DateTimeField()
+                )
+            if read:
+                fields['read_progress'] = Case(
+                    *(When(pk=pk, then=Value(pending[pk].progress))
+                      for pk in read),
+                    default=F('read_progress'), output_field=FloatField()
+                )
+            if fields:
+                links = Link.objects.filter(pk__in=chunk)
+                updated += links.update(**fields)
+                links_updated.send(
+                    sender=Link, links=list(links.values_list('pk', 'owner'))
+                )
+    return updated
+
+
+class LinkActivityRecorder:
+    """
+    Records visits and progress into the configured buffer, flushing
+    it once the interval has passed since this process last did.
+    """
+
+    def __init__(self, buffer, interval=10):
+        self.buffer = buffer
+        self.interval = interval
+        self._last_flush = time.monotonic()
+        self._flush_lock = threading.Lock()
+
+    def record_visit(self, link_id, progress=None):
+        now = utcnow()
+        self.buffer.add(str(link_id), Pending(
+            1, now, progress, now if progress is not None else None
+        ))
+        self._maybe_flush()
+
+    def record_progress(self, link_id, progress):
+        now = utcnow()
+        self.buffer.add(str(link_id), Pending(0, None, progress, now))
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        if time.monotonic() - self._last_flush >= self.interval:
+            # One flushing thread at a time; others carry on
+            if self._flush_lock.acquire(blocking=False):
+                try:
+                    self._flush()
+                finally:
+                    self._flush_lock.release()
+
+    def _flush(self):
+        self._last_flush = time.monotonic()
+        return self.buffer.flush(apply_activity)
+
+    def flush(self):
+        with self._flush_lock:
+            return self._flush()
+
+
+def _create_recorder():
+    config = getattr(settings, 'LINK_ACTIVITY', {})
+    buffer_cls = import_string(config.get(
+        'BACKEND', 'backpocket.links.activity.LocMemActivityBuffer'
+    ))
+    return LinkActivityRecorder(
+        buffer_cls(**config.get('OPTIONS', {})),
+        interval=config.get('FLUSH_INTERVAL', 10),
+    )
+
+
+activity = _create_recorder()
+
+# Graceful shutdown writes whatever is still buffered
+atexit.register(activity.flush)
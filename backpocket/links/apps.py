@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class LinksConfig(AppConfig):
     name = 'backpocket.links'
     label = 'bp_links'
+
+    def ready(self):
+        from backpocket.links import checker, tags
+        tags.connect_signals()
+        checker.connect_signals()
@@ -0,0 +1,558 @@
+# Dead-link checking
+#
+# Each saved URL has one LinkCheck row, however many links point to it.
+# A worker claims due rows in batches, groups them by host, and checks
+# each host's URLs one after another over a keep-alive connection
+# (several hosts at once, but never two requests to one host), pausing
+# HOST_DELAY between requests. Requests are HEAD unless the server has
+# refused it, and carry the ETag/Last-Modified validators from the last
+# check, so an unchanged resource costs a 304 and no body.
+#
+# Re-checks are scheduled adaptively: a URL that answers the same way
+# again has its interval doubled, up to MAX_INTERVAL, so stable links
+# settle at rare checks; one that has changed is checked sooner. Failed
+# URLs are retried with backoff, and marked dead after DEAD_AFTER
+# consecutive failures, which sets dead_since on every link to them.
+#
+# Users choose the URLs, so before each request (redirects included)
+# the host is resolved, and URLs on loopback, link-local, private or
+# other non-global addresses are refused rather than requested, unless
+# in ALLOWED_NETWORKS.
+
+import collections, concurrent.futures, datetime, email.utils, http.client
+import ipaddress, random, socket, ssl, struct, time, uuid
+from urllib.parse import urljoin, urlsplit
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.db.models.signals import post_save
+from backpocket.links.models import Link, LinkCheck
+from backpocket.links.signals import links_updated
+from backpocket.utils import utcnow
+
+
+DAY = 24 * 60 * 60
+
+# History runs: first and last seen (epoch seconds), status (0 for no
+# response) and how many checks in a row gave that status
+HISTORY_RUN = struct.Struct('<IIHH')
+HISTORY_RUNS = 16
+
+# A GET response body is drained (keeping the connection) up to this
+# size; a larger one closes the connection instead
+MAX_DRAIN = 1 << 16
+
+# Servers answering these to HEAD get GET from then on
+HEAD_REFUSED = {405, 501}
+# Responses meaning the resource is there, if not for us
+RESTRICTED = {401, 403}
+REDIRECTS = {301, 302, 303, 307, 308}
+# Only these URLs are checked
+SCHEMES = ('http', 'https')
+THROTTLED = {429, 503}
+
+
+def _setting(name, default):
+    return getattr(settings, 'LINK_CHECK', {}).get(name, default)
+
+
+# Status history
+
+def unpack_history(data):
+    '''Returns the list of (first, last, status, count) runs, oldest
+    first, from a packed history.
+    '''
+    return list(HISTORY_RUN.iter_unpack(bytes(data)))
+
+
+def pack_history(runs):
+    return b''.join(HISTORY_RUN.pack(*run) for run in runs[-HISTORY_RUNS:])
+
+
+def record_history(data, status, when):
+    '''Returns packed history data with a check's status (None if
+    there was no response) appended: the latest run is extended if the
+    status is unchanged, otherwise a run is started, dropping the
+    oldest beyond HISTORY_RUNS.
+    '''
+    runs = unpack_history(data)
+    status = status or 0
+    when = int(when.timestamp())
+    if runs and runs[-1][2] == status and runs[-1][3] < 0xffff:
+        first, _, _, count = runs[-1]
+        runs[-1] = (first, when, status, count + 1)
+    else:
+        runs.append((when, when, status, 1))
+    return pack_history(runs)
+
+
+# Checking
+
+CheckResult = collections.namedtuple('CheckResult', (
+    'status', 'error', 'etag', 'last_modified', 'url', 'use_get',
+    'retry_after',
+))
+
+
+class HostSession:
+    """
+    Keep-alive connections for checking one host's URLs, plus any
+    they redirect to. Call close() when done.
+    """
+
+    def __init__(self, timeout=None, user_agent=None):
+        self.timeout = timeout or _setting('TIMEOUT', 15)
+        self.user_agent = user_agent or _setting(
+            'USER_AGENT', 'backpocket-link-checker'
+        )
+        self.connections = {}
+        self.requests = 0
+
+    def close(self):
+        for connection in self.connections.values():
+            connection.close()
+        self.connections = {}
+
+    def _connection(self, scheme, netloc):
+        connection = self.connections.get((scheme, netloc))
+        if connection is None:
+            if scheme == 'https':
+                connection = http.client.HTTPSConnection(
+                    netloc, timeout=self.timeout,
+                    context=ssl.create_default_context(),
+                )
+            else:
+                connection = http.client.HTTPConnection(
+                    netloc, timeout=self.timeout
+                )
+            self.connections[(scheme, netloc)] = connection
+        return connection
+
+    def _drop(self, scheme, netloc):
+        connection = self.connections.pop((scheme, netloc), None)
+        if connection is not None:
+            connection.close()
+
+    def request(self, method, url, headers=()):
+        '''Sends a request and reads the response. Returns (status,
+        headers). A connection the server has closed since its last use
+        is reopened and the request sent again.
+        '''
+        parts = urlsplit(url)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        headers = dict(headers, **{'User-Agent': self.user_agent})
+        for attempt in (1, 2):
+            connection = self._connection(parts.scheme, parts.netloc)
+            reused = connection.sock is not None
+            try:
+                connection.request(method, path, headers=headers)
+                response = connection.getresponse()
+                if method == 'HEAD':
+                    response.read()
+                elif (len(response.read(MAX_DRAIN)) == MAX_DRAIN
+                        and not response.isclosed()):
+                    # Body too long to drain; give up the connection
+                    self._drop(parts.scheme, parts.netloc)
+            except (http.client.RemoteDisconnected, BrokenPipeError,
+                    ConnectionResetError):
+                self._drop(parts.scheme, parts.netloc)
+                if reused and attempt == 1:
+                    continue
+                raise
+            except Exception:
+                self._drop(parts.scheme, parts.netloc)
+                raise
+            if response.will_close:
+                self._drop(parts.scheme, parts.netloc)
+            self.requests += 1
+            return response.status, response.headers
+
+
+def _retry_after(value):
+    # Seconds from a Retry-After header, either seconds or a date
+    if not value:
+        return None
+    try:
+        return max(int(value), 0)
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=datetime.timezone.utc)
+    return max((when - utcnow()).total_seconds(), 0)
+
+
+def refused_address(url):
+    '''Returns the first address url's host resolves to that may not be
+    checked, being neither global nor in ALLOWED_NETWORKS, or None.
+    Raises OSError if the host can't be resolved.
+    '''
+    allowed = [
+        ipaddress.ip_network(network)
+        for network in _setting('ALLOWED_NETWORKS', ())
+    ]
+    parts = urlsplit(url)
+    port = parts.port or (443 if parts.scheme == 'https' else 80)
+    for _, _, _, _, sockaddr in socket.getaddrinfo(
+            parts.hostname, port, proto=socket.IPPROTO_TCP):
+        address = ipaddress.ip_address(sockaddr[0])
+        if not (address.is_global
+                or any(address in network for network in allowed)):
+            return address
+    return None
+
+
+def check_url(session, url, etag='', last_modified='', validated_url='',
+              use_get=False):
+    '''Checks url over session, following redirects, and returns a
+    CheckResult. Validators from the last check are sent to
+    validated_url (the URL they came from) only. URLs on refused
+    addresses (see refused_address()) are not requested. Makes no
+    database queries, so may run in any thread.
+    '''
+    max_redirects = _setting('MAX_REDIRECTS', 5)
+    method = 'GET' if use_get else 'HEAD'
+    current = url
+    redirects = 0
+    while True:
+        headers = {}
+        if current == (validated_url or url):
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        try:
+            address = refused_address(current)
+            if address is not None:
+                return CheckResult(
+                    None, 'Refused address {0}'.format(address), '', '',
+                    current, use_get, None,
+                )
+            status, response_headers = session.request(
+                method, current, headers
+            )
+        except (OSError, ValueError, http.client.HTTPException) as exc:
+            if isinstance(exc, socket.timeout):
+                error = 'Timed out'
+            else:
+                error = '{0}: {1}'.format(type(exc).__name__, exc)
+            return CheckResult(
+                None, error[:255], '', '', current, use_get, None
+            )
+
+        if status in HEAD_REFUSED and method == 'HEAD':
+            method, use_get = 'GET', True
+            continue
+        if status in REDIRECTS and 'Location' in response_headers:
+            redirects += 1
+            if redirects > max_redirects:
+                return CheckResult(
+                    status, 'Too many redirects', '', '', current,
+                    use_get, None,
+                )
+            location = urljoin(current, response_headers['Location'])
+            if urlsplit(location).scheme not in SCHEMES:
+                return CheckResult(
+                    status, 'Redirected to {0}'.format(location)[:255],
+                    '', '', current, use_get, None,
+                )
+            current = location
+            if status == 303:
+                method = 'GET'
+            continue
+
+        if status == 304:
+            # Validators stand unless the server sent new ones
+            etag = response_headers.get('ETag', etag)
+            last_modified = response_headers.get(
+                'Last-Modified', last_modified
+            )
+        else:
+            etag = response_headers.get('ETag', '')
+            last_modified = response_headers.get('Last-Modified', '')
+        retry_after = None
+        if status in THROTTLED:
+            retry_after = _retry_after(response_headers.get('Retry-After'))
+        return CheckResult(
+            status, '', etag[:255], last_modified[:64], current, use_get,
+            retry_after,
+        )
+
+
+def check_host(urls, delay=None, **session_options):
+    '''Checks each of a host's (URL, validators) pairs in turn, over
+    one session, waiting delay seconds between requests. validators is
+    a dict of check_url()'s keyword arguments. Returns a list of
+    CheckResults (one per URL, or fewer if the host asked us to back
+    off, in which case the last says so) and the number of requests.
+    '''
+    if delay is None:
+        delay = _setting('HOST_DELAY', 1)
+    session = HostSession(**session_options)
+    results = []
+    try:
+        for i, (url, validators) in enumerate(urls):
+            if i and delay:
+                time.sleep(delay)
+            result = check_url(session, url, **validators)
+            results.append(result)
+            if result.retry_after is not None:
+                break
+    finally:
+        session.close()
+    return results, session.requests
+
+
+def _is_alive(status):
+    return status is not None and (
+        200 <= status < 300 or status == 304 or status in RESTRICTED
+    )
+
+
+def _jitter(seconds):
+    return datetime.timedelta(seconds=seconds * random.uniform(1, 1.25))
+
+
+def apply_result(check, result, now):
+    '''Updates check (unsaved) from a CheckResult: state, validators,
+    history and the next check time. Returns True if the URL became
+    dead or came back.
+    '''
+    min_interval = _setting('MIN_INTERVAL', DAY)
+    max_interval = _setting('MAX_INTERVAL', 60 * DAY)
+    retry_interval = _setting('RETRY_INTERVAL', 60 * 60)
+    was_dead = check.state == LinkCheck.DEAD
+
+    check.last_checked = now
+    check.status = result.status
+    check.error = result.error
+    check.use_get = result.use_get
+    check.redirect = '' if result.url == check.url else result.url
+    check.history = record_history(check.history, result.status, now)
+    check.claim = ''
+
+    if result.retry_after is not None:
+        # Asked to slow down: not the URL's fault, so no failure
+        check.next_check = now + _jitter(
+            max(result.retry_after, retry_interval)
+        )
+        return False
+
+    if _is_alive(result.status):
+        unchanged = result.status == 304 or (
+            (check.etag or check.last_modified)
+            and (check.etag, check.last_modified)
+            == (result.etag, result.last_modified)
+        )
+        if check.state != LinkCheck.OK or not check.interval:
+            check.interval = min_interval
+        elif unchanged or not (result.etag or result.last_modified):
+            check.interval = min(check.interval * 2, max_interval)
+        else:
+            check.interval = max(check.interval // 2, min_interval)
+        check.state = LinkCheck.OK
+        check.failures = 0
+        check.dead_since = None
+        check.etag = result.etag
+        check.last_modified = result.last_modified
+        check.next_check = now + _jitter(check.interval)
+    else:
+        check.failures += 1
+        if check.failures >= _setting('DEAD_AFTER', 3):
+            check.state = LinkCheck.DEAD
+            if check.dead_since is None:
+                check.dead_since = now
+        else:
+            check.state = LinkCheck.FAILING
+        check.etag = check.last_modified = ''
+        check.interval = min(
+            retry_interval * 2 ** (check.failures - 1), max_interval
+        )
+        check.next_check = now + _jitter(check.interval)
+    return was_dead != (check.state == LinkCheck.DEAD)
+
+
+def _update_links(check):
+    # Copies dead_since to every link to the URL
+    links = list(
+        Link.objects.filter(url=check.url)
+        .exclude(dead_since=check.dead_since)
+        .values_list('pk', 'owner_id')
+    )
+    if links:
+        Link.objects.filter(pk__in=[pk for pk, _ in links]).update(
+            dead_since=check.dead_since
+        )
+        links_updated.send(sender=Link, links=links)
+
+
+CHECK_FIELDS = [
+    'state', 'status', 'error', 'etag', 'last_modified', 'redirect',
+    'use_get', 'failures', 'interval', 'next_check', 'last_checked',
+    'dead_since', 'claim', 'history',
+]
+
+
+class LinkChecker:
+    """
+    Checks due URLs in batches, a thread per host, up to MAX_HOSTS
+    hosts at once. Database work stays in the calling thread.
+    """
+
+    def __init__(self, batch_size=None, max_hosts=None, **session_options):
+        self.batch_size = batch_size or _setting('BATCH_SIZE', 200)
+        self.max_hosts = max_hosts or _setting('MAX_HOSTS', 8)
+        self.lease = datetime.timedelta(seconds=_setting('LEASE', 15 * 60))
+        self.session_options = session_options
+        self.requests = 0
+
+    def claim(self, now):
+        '''Claims up to a batch of due checks, so other workers skip
+        them until the lease runs out. Returns the claimed checks.
+        '''
+        ids = list(
+            LinkCheck.objects.filter(next_check__lte=now)
+            .order_by('next_check')
+            .values_list('pk', flat=True)[:self.batch_size]
+        )
+        if not ids:
+            return []
+        token = uuid.uuid4().hex
+        LinkCheck.objects.filter(pk__in=ids, next_check__lte=now).update(
+            claim=token, next_check=now + self.lease
+        )
+        return list(LinkCheck.objects.filter(claim=token))
+
+    def check_batch(self):
+        '''Checks one batch of due URLs. Returns a Counter of the
+        resulting states (plus 'deferred' for checks put off by hosts
+        asking to back off).
+        '''
+        now = utcnow()
+        checks = self.claim(now)
+        counts = collections.Counter()
+        if not checks:
+            return counts
+
+        hosts = collections.OrderedDict()
+        for check in checks:
+            host = urlsplit(check.url).netloc.lower()
+            hosts.setdefault(host, []).append(check)
+
+        with concurrent.futures.ThreadPoolExecutor(
+                min(self.max_hosts, len(hosts))) as pool:
+            futures = {
+                pool.submit(check_host, [
+                    (check.url, {
+                        'etag': check.etag,
+                        'last_modified': check.last_modified,
+                        'validated_url': check.redirect,
+                        'use_get': check.use_get,
+                    })
+                    for check in host_checks
+                ], **self.session_options): host_checks
+                for host_checks in hosts.values()
+            }
+            for future in concurrent.futures.as_completed(futures):
+                results, requests = future.result()
+                self.requests += requests
+                self._save(futures[future], results, counts)
+        return counts
+
+    def _save(self, checks, results, counts):
+        now = utcnow()
+        with transaction.atomic():
+            for check, result in zip(checks, results):
+                if apply_result(check, result, now):
+                    _update_links(check)
+                check.save(update_fields=CHECK_FIELDS)
+                if result.retry_after is not None:
+                    counts['deferred'] += 1
+                else:
+                    counts[check.state] += 1
+            # Unchecked when the host asked us to back off
+            deferred = [check.pk for check in checks[len(results):]]
+            if deferred:
+                retry_after = results[-1].retry_after
+                LinkCheck.objects.filter(pk__in=deferred).update(
+                    claim='', next_check=now + _jitter(max(
+                        retry_after, _setting('RETRY_INTERVAL', 60 * 60)
+                    ))
+                )
+                counts['deferred'] += len(deferred)
+
+    def run(self, interval=None, stop=None):
+        '''Checks batches until stop() returns true, waiting interval
+        seconds whenever nothing is due.
+        '''
+        interval = interval or _setting('POLL_INTERVAL', 60)
+        while not (stop and stop()):
+            if not self.check_batch():
+                time.sleep(interval)
+
+
+# Enrolment
+
+def enroll_links(batch_size=1000):
+    '''Adds checks for saved URLs without one, and deletes checks for
+    URLs no longer saved. Returns (added, removed).
+    '''
+    added = 0
+    saved = Link.objects.filter(
+        Q(url__startswith='http://') | Q(url__startswith='https://')
+    )
+    urls = saved.order_by('url').values_list('url', flat=True).distinct()
+    last_url = None
+    while True:
+        batch = urls if last_url is None else urls.filter(url__gt=last_url)
+        batch = list(batch[:batch_size])
+        if not batch:
+            break
+        last_url = batch[-1]
+        known = set(
+            LinkCheck.objects.filter(url__in=batch)
+            .values_list('url', flat=True)
+        )
+        new = [url for url in batch if url not in known]
+        try:
+            with transaction.atomic():
+                LinkCheck.objects.bulk_create(
+                    LinkCheck(url=url) for url in new
+                )
+        except IntegrityError:
+            # Some were added as links were saved meanwhile
+            new = [
+                url for url in new
+                if LinkCheck.objects.get_or_create(url=url)[1]
+            ]
+        added += len(new)
+
+    removed, _ = LinkCheck.objects.exclude(
+        url__in=saved.values('url')
+    ).delete()
+    return added, removed
+
+
+def _handle_link_save(sender, instance, created=False, raw=False,
+                      update_fields=None, **kwargs):
+    if raw or (update_fields is not None and 'url' not in update_fields):
+        return
+    if urlsplit(instance.url).scheme not in SCHEMES:
+        return
+    check, _ = LinkCheck.objects.get_or_create(url=instance.url)
+    if instance.dead_since != check.dead_since:
+        Link.objects.filter(pk=instance.pk).update(
+            dead_since=check.dead_since
+        )
+        instance.dead_since = check.dead_since
+
+
+def connect_signals():
+    post_save.connect(
+        _handle_link_save, sender=Link, dispatch_uid='bp_links_checker'
+    )
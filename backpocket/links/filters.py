@@ -0,0 +1,18 @@
+from rest_framework.filters import BaseFilterBackend
+from backpocket.links.tags import normalize_tags
+
+
+class LinkTagFilter(BaseFilterBackend):
+    """
+    Restricts links to those carrying every tag given as a
+    repeated 'tag' query parameter.
+    """
+    query_param = 'tag'
+
+    def get_tags(self, request):
+        return normalize_tags(request.query_params.getlist(self.query_param))
+
+    def filter_queryset(self, request, queryset, view):
+        for name in self.get_tags(request):
+            queryset = queryset.filter(tags__name=name)
+        return queryset
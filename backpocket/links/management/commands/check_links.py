@@ -0,0 +1,62 @@
+import time
+from django.core.management.base import BaseCommand
+from backpocket.links.checker import LinkChecker, enroll_links
+
+
+class Command(BaseCommand):
+    help = (
+        'Checks saved URLs for dead links, re-checking each on an '
+        'adaptive schedule.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Check what is currently due, then exit.',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=None,
+            help='Seconds to wait when nothing is due.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='URLs to claim per batch.',
+        )
+        parser.add_argument(
+            '--enroll', action='store_true',
+            help='First add checks for saved URLs without one (such as '
+                 'links saved before checking began), and remove checks '
+                 'for URLs no longer saved.',
+        )
+
+    def handle(self, *args, **options):
+        if options['enroll']:
+            added, removed = enroll_links()
+            self.stdout.write(
+                'Added {0} URL(s), removed {1}'.format(added, removed)
+            )
+
+        checker = LinkChecker(batch_size=options['batch_size'])
+
+        if not options['once']:
+            checker.run(interval=options['interval'])
+            return
+
+        began = time.perf_counter()
+        totals = None
+        while True:
+            counts = checker.check_batch()
+            if not counts:
+                break
+            totals = counts if totals is None else totals + counts
+        self.stdout.write(
+            'Checked {0} URL(s) with {1} request(s) in {2:.1f}s: '
+            '{3}'.format(
+                sum((totals or {}).values()), checker.requests,
+                time.perf_counter() - began,
+                ', '.join(
+                    '{0} {1}'.format(count, state)
+                    for state, count in sorted((totals or {}).items())
+                ) or 'none due',
+            )
+        )
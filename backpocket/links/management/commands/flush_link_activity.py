@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from backpocket.links.activity import activity
+
+
+class Command(BaseCommand):
+    help = (
+        'Writes buffered link visits and read progress '
+        '(from the shared SQLiteActivityBuffer; others are per-process).'
+    )
+
+    def handle(self, *args, **options):
+        updated = activity.flush()
+        self.stdout.write('Updated {0} link(s)'.format(updated))
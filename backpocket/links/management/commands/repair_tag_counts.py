@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from backpocket.links.tags import recount_tags
+
+
+class Command(BaseCommand):
+    help = 'Recomputes denormalized per-user tag counts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', default=None,
+            help='Only repair tags owned by this username.',
+        )
+
+    def handle(self, *args, **options):
+        owner = None
+        if options['user']:
+            User = get_user_model()
+            try:
+                owner = User.objects.get_by_natural_key(options['user'])
+            except User.DoesNotExist:
+                raise CommandError(
+                    "User '{0}' does not exist".format(options['user'])
+                )
+
+        updated = recount_tags(owner=owner)
+        self.stdout.write('Recounted {0} tag(s)'.format(updated))
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 14:23
+from __future__ import unicode_literals
+
+import backpocket.utils
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Link',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, verbose_name='link ID')),
+                ('url', models.URLField(max_length=2048, verbose_name='URL')),
+                ('title', models.CharField(blank=True, max_length=500, verbose_name='title')),
+                ('notes', models.TextField(blank=True, verbose_name='notes')),
+                ('date_added', models.DateTimeField(default=backpocket.utils.utcnow, verbose_name='date added')),
+                ('date_modified', models.DateTimeField(default=backpocket.utils.utcnow, verbose_name='date modified')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='links', to=settings.AUTH_USER_MODEL, verbose_name='owner')),
+            ],
+            options={
+                'verbose_name': 'link',
+                'verbose_name_plural': 'links',
+                'db_table': 'bp_link',
+                'permissions': (('view_link', 'Can view link'),),
+                'default_related_name': 'links',
+            },
+        ),
+    ]
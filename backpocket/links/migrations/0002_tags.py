@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 14:26
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('bp_links', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LinkTag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('link', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='bp_links.Link')),
+            ],
+            options={
+                'verbose_name': 'link tag',
+                'verbose_name_plural': 'link tags',
+                'db_table': 'bp_link_tag',
+            },
+        ),
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, verbose_name='tag ID')),
+                ('name', models.CharField(max_length=64, verbose_name='name')),
+                ('link_count', models.PositiveIntegerField(default=0, verbose_name='link count')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tags', to=settings.AUTH_USER_MODEL, verbose_name='owner')),
+            ],
+            options={
+                'verbose_name': 'tag',
+                'verbose_name_plural': 'tags',
+                'db_table': 'bp_tag',
+                'permissions': (('view_tag', 'Can view tag'),),
+            },
+        ),
+        migrations.AddField(
+            model_name='linktag',
+            name='tag',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='bp_links.Tag'),
+        ),
+        migrations.AddField(
+            model_name='link',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='links', through='bp_links.LinkTag', to='bp_links.Tag', verbose_name='tags'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='tag',
+            unique_together=set([('owner', 'name')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='linktag',
+            unique_together=set([('link', 'tag')]),
+        ),
+    ]
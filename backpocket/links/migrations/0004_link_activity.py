@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 14:41
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bp_links', '0003_uuid7'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='link',
+            name='last_visited',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='last visited'),
+        ),
+        migrations.AddField(
+            model_name='link',
+            name='read_progress',
+            field=models.FloatField(default=0, editable=False, verbose_name='read progress'),
+        ),
+        migrations.AddField(
+            model_name='link',
+            name='visit_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='visit count'),
+        ),
+    ]
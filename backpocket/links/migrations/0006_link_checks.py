@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 15:27
+from __future__ import unicode_literals
+
+import backpocket.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bp_links', '0005_link_owner_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LinkCheck',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=2048, unique=True, verbose_name='URL')),
+                ('state', models.CharField(choices=[('unchecked', 'Unchecked'), ('ok', 'OK'), ('failing', 'Failing'), ('dead', 'Dead')], default='unchecked', max_length=16, verbose_name='state')),
+                ('status', models.PositiveSmallIntegerField(null=True, verbose_name='status')),
+                ('error', models.CharField(blank=True, max_length=255, verbose_name='error')),
+                ('etag', models.CharField(blank=True, max_length=255, verbose_name='ETag')),
+                ('last_modified', models.CharField(blank=True, max_length=64, verbose_name='Last-Modified')),
+                ('redirect', models.URLField(blank=True, max_length=2048, verbose_name='redirected to')),
+                ('use_get', models.BooleanField(default=False, verbose_name='use GET')),
+                ('failures', models.PositiveSmallIntegerField(default=0, verbose_name='consecutive failures')),
+                ('interval', models.PositiveIntegerField(default=0, verbose_name='check interval')),
+                ('next_check', models.DateTimeField(db_index=True, default=backpocket.utils.utcnow, verbose_name='next check')),
+                ('last_checked', models.DateTimeField(null=True, verbose_name='last checked')),
+                ('dead_since', models.DateTimeField(null=True, verbose_name='dead since')),
+                ('claim', models.CharField(blank=True, editable=False, max_length=32)),
+                ('history', models.BinaryField(default=b'', verbose_name='history')),
+            ],
+            options={
+                'verbose_name': 'link check',
+                'verbose_name_plural': 'link checks',
+                'db_table': 'bp_link_check',
+            },
+        ),
+        migrations.AddField(
+            model_name='link',
+            name='dead_since',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='dead since'),
+        ),
+        migrations.AlterField(
+            model_name='link',
+            name='url',
+            field=models.URLField(db_index=True, max_length=2048, verbose_name='URL'),
+        ),
+    ]
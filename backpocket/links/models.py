@@ -1,3 +1,232 @@
+from django.conf import settings
 from django.db import models
+from backpocket.owned import (
+    OwnedObjectPermissions, OwnedObjectPermissionFilters
+)
+from backpocket.sharing.models import CHANGE, DELETE
+from backpocket.utils import utcnow, uuid7
 
-# Create your models here.
+
+class LinkObjectPermissions(OwnedObjectPermissions):
+
+    def add_link(self, user, obj):
+        return False
+
+    def change_link(self, user, obj):
+        return self._is_owner_or_shared(user, obj, CHANGE)
+
+    def delete_link(self, user, obj):
+        return self._is_owner_or_shared(user, obj, DELETE)
+
+    def view_link(self, user, obj):
+        return self._is_admin_owner_or_shared(user, obj)
+
+
+class LinkObjectPermissionFilters(OwnedObjectPermissionFilters):
+
+    def view_link(self, user, queryset):
+        return self._admin_all_user_own_or_shared(user, queryset)
+
+
+class TagObjectPermissions(OwnedObjectPermissions):
+
+    def add_tag(self, user, obj):
+        return False
+
+    def change_tag(self, user, obj):
+        return self._is_owner(user, obj)
+
+    def delete_tag(self, user, obj):
+        return self._is_owner(user, obj)
+
+    def view_tag(self, user, obj):
+        return self._is_admin_or_owner(user, obj)
+
+
+class TagObjectPermissionFilters(OwnedObjectPermissionFilters):
+
+    def view_tag(self, user, queryset):
+        return self._admin_all_user_own(user, queryset)
+
+
+class LinkSearchIndex:
+    """
+    Search document definition for links.
+    """
+    kind = 'link'
+
+    def get_document(self, obj):
+        return {
+            'title': obj.title,
+            'url': obj.url,
+            'body': obj.notes,
+        }
+
+
+class Link(models.Model):
+
+    class Meta:
+        verbose_name = 'link'
+        verbose_name_plural = 'links'
+        default_related_name = 'links'
+        db_table = 'bp_link'
+        # Walking a library in key order (export)
+        index_together = (('owner', 'id'),)
+        permissions = (
+            ('view_link', 'Can view link'),
+        )
+
+    ObjectPermissions = LinkObjectPermissions()
+
+    ObjectPermissionFilters = LinkObjectPermissionFilters()
+
+    SearchIndex = LinkSearchIndex()
+
+    id = models.UUIDField(
+        'link ID', primary_key=True, default=uuid7, editable=False
+    )
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        verbose_name='owner',
+    )
+    url = models.URLField('URL', max_length=2048, db_index=True)
+    title = models.CharField('title', max_length=500, blank=True)
+    notes = models.TextField('notes', blank=True)
+    date_added = models.DateTimeField('date added', default=utcnow)
+    date_modified = models.DateTimeField('date modified', default=utcnow)
+    # Written behind by backpocket.links.activity, so may lag briefly
+    visit_count = models.PositiveIntegerField(
+        'visit count', default=0, editable=False
+    )
+    last_visited = models.DateTimeField(
+        'last visited', null=True, blank=True, editable=False
+    )
+    read_progress = models.FloatField(
+        'read progress', default=0, editable=False
+    )
+    # Set by backpocket.links.checker while the URL is unreachable
+    dead_since = models.DateTimeField(
+        'dead since', null=True, blank=True, editable=False
+    )
+    tags = models.ManyToManyField(
+        'Tag',
+        through='LinkTag',
+        related_name='links',
+        blank=True,
+        verbose_name='tags',
+    )
+
+    def __str__(self):
+        return self.title or self.url
+
+    def save(self, *args, **kwargs):
+        self.date_modified = utcnow()
+        super().save(*args, **kwargs)
+
+
+class Tag(models.Model):
+    """
+    Per-user tag. The link_count column is a denormalized count of
+    tagged links, maintained by backpocket.links.tags, so facet counts
+    for an unfiltered library never need to aggregate the join table.
+    """
+
+    class Meta:
+        verbose_name = 'tag'
+        verbose_name_plural = 'tags'
+        db_table = 'bp_tag'
+        unique_together = (('owner', 'name'),)
+        permissions = (
+            ('view_tag', 'Can view tag'),
+        )
+
+    ObjectPermissions = TagObjectPermissions()
+
+    ObjectPermissionFilters = TagObjectPermissionFilters()
+
+    id = models.UUIDField(
+        'tag ID', primary_key=True, default=uuid7, editable=False
+    )
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='tags',
+        verbose_name='owner',
+    )
+    name = models.CharField('name', max_length=64)
+    link_count = models.PositiveIntegerField('link count', default=0)
+
+    def __str__(self):
+        return self.name
+
+
+class LinkTag(models.Model):
+
+    class Meta:
+        verbose_name = 'link tag'
+        verbose_name_plural = 'link tags'
+        db_table = 'bp_link_tag'
+        unique_together = (('link', 'tag'),)
+
+    link = models.ForeignKey(
+        Link, on_delete=models.CASCADE, related_name='+'
+    )
+    tag = models.ForeignKey(
+        Tag, on_delete=models.CASCADE, related_name='+'
+    )
+
+
+class LinkCheck(models.Model):
+    """
+    Reachability of one saved URL, shared by every link to it, as
+    last seen by the dead-link checker (backpocket.links.checker).
+    """
+
+    class Meta:
+        verbose_name = 'link check'
+        verbose_name_plural = 'link checks'
+        db_table = 'bp_link_check'
+
+    UNCHECKED = 'unchecked'
+    OK = 'ok'
+    FAILING = 'failing'
+    DEAD = 'dead'
+    STATE_CHOICES = (
+        (UNCHECKED, 'Unchecked'),
+        (OK, 'OK'),
+        (FAILING, 'Failing'),
+        (DEAD, 'Dead'),
+    )
+
+    url = models.URLField('URL', max_length=2048, unique=True)
+    state = models.CharField(
+        'state', max_length=16, choices=STATE_CHOICES, default=UNCHECKED
+    )
+    # Last HTTP status, or null if there was no response
+    status = models.PositiveSmallIntegerField('status', null=True)
+    error = models.CharField('error', max_length=255, blank=True)
+    # Validators for conditional requests
+    etag = models.CharField('ETag', max_length=255, blank=True)
+    last_modified = models.CharField(
+        'Last-Modified', max_length=64, blank=True
+    )
+    redirect = models.URLField('redirected to', max_length=2048, blank=True)
+    # Set once the server refuses HEAD
+    use_get = models.BooleanField('use GET', default=False)
+    failures = models.PositiveSmallIntegerField(
+        'consecutive failures', default=0
+    )
+    interval = models.PositiveIntegerField('check interval', default=0)
+    next_check = models.DateTimeField(
+        'next check', default=utcnow, db_index=True
+    )
+    last_checked = models.DateTimeField('last checked', null=True)
+    dead_since = models.DateTimeField('dead since', null=True)
+    # Set by the worker checking the URL, until its lease expires
+    claim = models.CharField(max_length=32, blank=True, editable=False)
+    # Packed runs of identical results (see checker.record_history)
+    history = models.BinaryField('history', default=b'', editable=False)
+
+    def __str__(self):
+        return self.url
@@ -0,0 +1,38 @@
+from backpocket.permissions import (
+    BaseActionObjectPermissions, BaseActionObjectPermissionFilter
+)
+
+
+class LinkObjectPermissions(BaseActionObjectPermissions):
+    """
+    BaseActionObjectPermissions updated for per-user libraries:
+    any authenticated user may add links to their own library.
+    """
+    perms_map = {
+        **BaseActionObjectPermissions.perms_map,
+        'create': (),
+        'facets': (),
+        'visit': (),
+        'progress': (),
+        'duplicates': (),
+    }
+
+    obj_perms_map = {
+        **BaseActionObjectPermissions.obj_perms_map,
+        'visit': ('{app_label}.view_{model_name}',),
+        'progress': ('{app_label}.view_{model_name}',),
+        'duplicates': ('{app_label}.view_{model_name}',),
+    }
+
+
+class LinkObjectPermissionFilter(BaseActionObjectPermissionFilter):
+    """
+    BaseActionObjectPermissionFilter updated with additional actions.
+    """
+    perms_map = {
+        **BaseActionObjectPermissionFilter.perms_map,
+        'facets': ('{app_label}.view_{model_name}',),
+        'visit': (),
+        'progress': (),
+        'duplicates': (),
+    }
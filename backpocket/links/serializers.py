@@ -0,0 +1,48 @@
+from rest_framework import serializers
+from backpocket.links.models import Link
+from backpocket.links.tags import set_tags
+
+
+class TagListField(serializers.ListField):
+    """
+    Tags as a flat list of names.
+    """
+    child = serializers.CharField(max_length=64)
+
+    def to_representation(self, data):
+        # Use prefetched tags where available
+        return sorted(tag.name for tag in data.all())
+
+
+class LinkSerializer(serializers.ModelSerializer):
+    """
+    General link model serializer.
+    """
+    url = serializers.HyperlinkedIdentityField(view_name='link-detail')
+    # Model's 'url' is exposed as 'link', 'url' being the API hyperlink
+    link = serializers.URLField(source='url', max_length=2048)
+    tags = TagListField(required=False)
+
+    class Meta:
+        model = Link
+        fields = (
+            'id', 'owner', 'url', 'link', 'title', 'notes', 'tags',
+            'date_added', 'date_modified',
+            'visit_count', 'last_visited', 'read_progress', 'dead_since',
+        )
+        read_only_fields = ('owner', 'date_added', 'date_modified')
+
+    def create(self, validated_data):
+        tags = validated_data.pop('tags', None)
+        validated_data['owner'] = self.context['request'].user
+        link = super().create(validated_data)
+        if tags:
+            set_tags(link, tags)
+        return link
+
+    def update(self, instance, validated_data):
+        tags = validated_data.pop('tags', None)
+        link = super().update(instance, validated_data)
+        if tags is not None:
+            set_tags(link, tags)
+        return link
@@ -0,0 +1,10 @@
+from django.dispatch import Signal
+
+
+# Sent after a link's tags are added or removed, as join rows are
+# bulk-created and deleted without per-row model signals
+tags_changed = Signal(providing_args=['link'])
+
+# Sent after links are changed in bulk by queryset update, with
+# (link ID, owner ID) pairs
+links_updated = Signal(providing_args=['links'])
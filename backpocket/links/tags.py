@@ -0,0 +1,135 @@
+# Tag assignment with denormalized per-user tag counts
+#
+# All tag changes on links should go through these functions, which
+# update Tag.link_count in the same transaction as the join rows.
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import pre_delete
+from backpocket.links.models import Link, LinkTag, Tag
+from backpocket.links.signals import tags_changed
+
+
+def normalize_tags(names):
+    '''Returns list of unique, stripped, lowercased tag names,
+    preserving first-seen order and skipping empty names.
+    '''
+    seen = {}
+    for name in names:
+        name = name.strip().lower()
+        if name:
+            seen.setdefault(name, None)
+    return list(seen)
+
+
+def _adjust_counts(tag_ids, delta):
+    if tag_ids:
+        Tag.objects.filter(pk__in=tag_ids).update(
+            link_count=F('link_count') + delta
+        )
+
+
+def add_tags(link, names):
+    '''Adds named tags to link, creating the owner's tags as needed.
+    Returns list of tags newly attached to link.
+    '''
+    names = normalize_tags(names)
+    if not names:
+        return []
+
+    with transaction.atomic():
+        existing = {
+            tag.name: tag for tag in
+            Tag.objects.filter(owner_id=link.owner_id, name__in=names)
+        }
+        missing = [
+            Tag(owner_id=link.owner_id, name=name)
+            for name in names if name not in existing
+        ]
+        Tag.objects.bulk_create(missing)
+        for tag in missing:
+            existing[tag.name] = tag
+
+        linked = set(
+            LinkTag.objects.filter(
+                link=link, tag__in=existing.values()
+            ).values_list('tag_id', flat=True)
+        )
+        added = [
+            tag for tag in existing.values() if tag.pk not in linked
+        ]
+        LinkTag.objects.bulk_create(
+            LinkTag(link=link, tag=tag) for tag in added
+        )
+        _adjust_counts([tag.pk for tag in added], 1)
+        if added:
+            tags_changed.send(sender=Link, link=link)
+
+    return added
+
+
+def remove_tags(link, names):
+    '''Removes named tags from link. Tags themselves are kept, even
+    if no longer in use. Returns number of tags removed.
+    '''
+    names = normalize_tags(names)
+    if not names:
+        return 0
+
+    with transaction.atomic():
+        rows = LinkTag.objects.filter(link=link, tag__name__in=names)
+        tag_ids = list(rows.values_list('tag_id', flat=True))
+        # Re-filter on ids, as SQLite can't delete through a join
+        LinkTag.objects.filter(link=link, tag_id__in=tag_ids).delete()
+        _adjust_counts(tag_ids, -1)
+        if tag_ids:
+            tags_changed.send(sender=Link, link=link)
+
+    return len(tag_ids)
+
+
+def set_tags(link, names):
+    '''Replaces link's tags with the named tags.'''
+    names = normalize_tags(names)
+
+    with transaction.atomic():
+        current = set(
+            LinkTag.objects.filter(link=link)
+            .values_list('tag__name', flat=True)
+        )
+        remove_tags(link, current.difference(names))
+        add_tags(link, [name for name in names if name not in current])
+
+
+def recount_tags(owner=None):
+    '''Recomputes Tag.link_count from the join table in a single
+    UPDATE, optionally for one owner only. Returns rows updated.
+    '''
+    counts = (
+        LinkTag.objects.filter(tag=OuterRef('pk'))
+        .order_by().values('tag')
+        .annotate(count=Count('pk')).values('count')
+    )
+    tags = Tag.objects.all()
+    if owner is not None:
+        tags = tags.filter(owner=owner)
+
+    return tags.update(
+        link_count=Coalesce(Subquery(counts), Value(0))
+    )
+
+
+def _handle_link_delete(sender, instance, **kwargs):
+    # Join rows go with the link via cascade, so decrement first
+    tag_ids = list(
+        LinkTag.objects.filter(link=instance)
+        .values_list('tag_id', flat=True)
+    )
+    _adjust_counts(tag_ids, -1)
+
+
+def connect_signals():
+    pre_delete.connect(
+        _handle_link_delete, sender=Link, dispatch_uid='bp_links_tags'
+    )
@@ -1,3 +1,452 @@
-from django.test import TestCase
+import datetime, http.server, os, shutil, socketserver, tempfile, threading
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from backpocket.api.models import Change
+from backpocket.links.activity import (
+    LinkActivityRecorder, LocMemActivityBuffer, Pending,
+    SQLiteActivityBuffer, apply_activity,
+)
+from backpocket.links.checker import (
+    LinkChecker, check_url, enroll_links, record_history, unpack_history,
+)
+from backpocket.links.models import Link, LinkCheck, Tag
+from backpocket.links.tags import (
+    add_tags, recount_tags, remove_tags, set_tags,
+)
+from backpocket.users.models import User
+from backpocket.utils import utcnow
 
-# Create your tests here.
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def _respond(self, body):
+        self.server.requests.append((self.command, self.path, self.headers))
+        status, headers = self.server.routes.get(self.path, (404, {}))
+        if callable(status):
+            status, headers = status(self)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        payload = b'' if status == 304 else b'<p>Hello</p>'
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        if body:
+            self.wfile.write(payload)
+
+    def do_HEAD(self):
+        if self.server.refuse_head:
+            self.server.requests.append(('HEAD', self.path, self.headers))
+            self.send_response(405)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self._respond(False)
+
+    def do_GET(self):
+        self._respond(True)
+
+
+class StandInHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """
+    Local HTTP server answering from a path -> (status, headers) map,
+    recording requests and connection count.
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StandInHandler)
+        self.routes = {}
+        self.requests = []
+        self.connections = 0
+        self.refuse_head = False
+
+    def url(self, path):
+        return 'http://127.0.0.1:{0}{1}'.format(self.server_port, path)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self.thread.join()
+
+
+def _etag_route(etag):
+    def respond(handler):
+        if handler.headers.get('If-None-Match') == etag:
+            return 304, {'ETag': etag}
+        return 200, {'ETag': etag}
+    return respond
+
+
+class StandInSession:
+    """
+    HostSession stand-in answering from a URL -> (status, headers) map,
+    recording URLs requested.
+    """
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.requested = []
+
+    def request(self, method, url, headers=()):
+        self.requested.append(url)
+        return self.responses[url]
+
+
+# The stand-in server is on loopback, so allowed
+@override_settings(LINK_CHECK={
+    'HOST_DELAY': 0, 'TIMEOUT': 5, 'ALLOWED_NETWORKS': ['127.0.0.1/32'],
+})
+class LinkCheckerTests(TestCase):
+
+    def setUp(self):
+        self.server = StandInHTTPServer()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        self.user = User.objects.create_user('alice', 'pw')
+
+    def _link(self, path):
+        return Link.objects.create(owner=self.user, url=self.server.url(path))
+
+    def _recheck(self):
+        LinkCheck.objects.update(next_check=utcnow())
+        return LinkChecker().check_batch()
+
+    def test_saving_link_enrolls_url(self):
+        self._link('/a')
+        self._link('/a')
+        self.assertEqual(LinkCheck.objects.count(), 1)
+        LinkCheck.objects.all().delete()
+        self.assertEqual(enroll_links(), (1, 0))
+        Link.objects.all().delete()
+        self.assertEqual(enroll_links(), (0, 1))
+
+    def test_conditional_requests_and_interval(self):
+        self.server.routes['/a'] = (_etag_route('"v1"'), None)
+        self._link('/a')
+        self.assertEqual(self._recheck(), {LinkCheck.OK: 1})
+        check = LinkCheck.objects.get()
+        self.assertEqual(check.etag, '"v1"')
+        first = check.interval
+
+        self.assertEqual(self._recheck(), {LinkCheck.OK: 1})
+        method, _, headers = self.server.requests[-1]
+        self.assertEqual(method, 'HEAD')
+        self.assertEqual(headers['If-None-Match'], '"v1"')
+        check.refresh_from_db()
+        self.assertEqual(check.status, 304)
+        self.assertEqual(check.interval, 2 * first)
+        self.assertGreater(
+            check.next_check, utcnow() + datetime.timedelta(days=1)
+        )
+
+    def test_head_refused_falls_back_to_get(self):
+        self.server.refuse_head = True
+        self.server.routes['/a'] = (200, {})
+        self._link('/a')
+        self.assertEqual(self._recheck(), {LinkCheck.OK: 1})
+        self.assertEqual(
+            [method for method, _, _ in self.server.requests],
+            ['HEAD', 'GET'],
+        )
+        self.assertTrue(LinkCheck.objects.get().use_get)
+        self._recheck()
+        self.assertEqual(self.server.requests[-1][0], 'GET')
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_dead_after_failures(self):
+        link = self._link('/gone')
+        for state in (LinkCheck.FAILING, LinkCheck.FAILING):
+            self.assertEqual(self._recheck(), {state: 1})
+        link.refresh_from_db()
+        self.assertIsNone(link.dead_since)
+
+        seq = Change.objects.order_by('-seq').values_list('seq').first()[0]
+        self.assertEqual(self._recheck(), {LinkCheck.DEAD: 1})
+        link.refresh_from_db()
+        self.assertIsNotNone(link.dead_since)
+        self.assertTrue(
+            Change.objects.filter(seq__gt=seq, object_id=link.pk).exists()
+        )
+        # Links saved later to a dead URL start out dead
+        self.assertEqual(self._link('/gone').dead_since, link.dead_since)
+
+        check = LinkCheck.objects.get()
+        self.assertEqual(unpack_history(check.history)[0][2:], (404, 3))
+        self.server.routes['/gone'] = (200, {})
+        self.assertEqual(self._recheck(), {LinkCheck.OK: 1})
+        link.refresh_from_db()
+        self.assertIsNone(link.dead_since)
+
+    def test_redirect_followed(self):
+        self.server.routes['/old'] = (301, {'Location': '/new'})
+        self.server.routes['/new'] = (200, {'ETag': '"n"'})
+        self._link('/old')
+        self._recheck()
+        check = LinkCheck.objects.get()
+        self.assertEqual(check.state, LinkCheck.OK)
+        self.assertEqual(check.redirect, self.server.url('/new'))
+        self._recheck()
+        self.assertNotIn('If-None-Match', self.server.requests[-2][2])
+        self.assertEqual(self.server.requests[-1][2]['If-None-Match'], '"n"')
+
+    def test_throttled_host_deferred(self):
+        self.server.routes['/a'] = (429, {'Retry-After': '7200'})
+        self.server.routes['/b'] = (200, {})
+        self._link('/a')
+        self._link('/b')
+        LinkCheck.objects.filter(url=self.server.url('/b')).update(
+            next_check=utcnow() + datetime.timedelta(seconds=1)
+        )
+        self.assertEqual(self._recheck(), {'deferred': 2})
+        self.assertEqual(len(self.server.requests), 1)
+        for check in LinkCheck.objects.all():
+            self.assertEqual(check.failures, 0)
+            self.assertGreater(
+                check.next_check, utcnow() + datetime.timedelta(hours=1)
+            )
+
+    def test_host_batch_uses_one_connection(self):
+        for i in range(5):
+            path = '/{0}'.format(i)
+            self.server.routes[path] = (200, {})
+            self._link(path)
+        self.assertEqual(self._recheck(), {LinkCheck.OK: 5})
+        self.assertEqual(len(self.server.requests), 5)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_connection_refused(self):
+        Link.objects.create(owner=self.user, url='http://127.0.0.1:1/')
+        self.assertEqual(self._recheck(), {LinkCheck.FAILING: 1})
+        check = LinkCheck.objects.get()
+        self.assertIsNone(check.status)
+        self.assertIn('Connection', check.error)
+
+    def test_refused_addresses(self):
+        session = StandInSession({
+            'http://8.8.8.8/': (302, {'Location': 'http://127.0.0.1:8000/'}),
+        })
+        with self.settings(LINK_CHECK={}):
+            result = check_url(session, 'http://8.8.8.8/')
+            self.assertEqual(session.requested, ['http://8.8.8.8/'])
+            self.assertEqual(
+                (result.status, result.error, result.url),
+                (None, 'Refused address 127.0.0.1', 'http://127.0.0.1:8000/'),
+            )
+            for url in ('http://169.254.169.254/latest/', 'http://[::1]/',
+                        'https://10.0.0.1/', 'http://localhost:8000/'):
+                self.assertTrue(
+                    check_url(session, url).error.startswith('Refused')
+                )
+            self.assertEqual(len(session.requested), 1)
+
+            self.server.routes['/a'] = (200, {})
+            self._link('/a')
+            self.assertEqual(self._recheck(), {LinkCheck.FAILING: 1})
+        self.assertEqual(self.server.requests, [])
+        self.assertEqual(
+            LinkCheck.objects.get().error, 'Refused address 127.0.0.1'
+        )
+
+    def test_history_runs(self):
+        now = utcnow()
+        history = b''
+        for status in (200, 200, 304, None, None, 200):
+            history = record_history(history, status, now)
+        self.assertEqual(
+            [run[2:] for run in unpack_history(history)],
+            [(200, 2), (304, 1), (0, 2), (200, 1)],
+        )
+        self.assertEqual(len(history), 4 * 12)
+        for status in range(100, 140):
+            history = record_history(history, status, now)
+        runs = unpack_history(history)
+        self.assertEqual(len(runs), 16)
+        self.assertEqual(runs[-1][2], 139)
+
+
+class TagCountTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice', 'pw')
+        self.other = User.objects.create_user('bob', 'pw')
+        self.links = [
+            Link.objects.create(
+                owner=self.user, url='http://example.com/{0}'.format(i)
+            )
+            for i in range(3)
+        ]
+
+    def counts(self, owner=None):
+        return dict(
+            Tag.objects.filter(owner=owner or self.user)
+            .values_list('name', 'link_count')
+        )
+
+    def test_add(self):
+        first, second, _ = self.links
+        self.assertEqual(len(add_tags(first, ['News', ' news', 'tech'])), 2)
+        add_tags(second, ['news'])
+        # Already tagged, so not counted twice
+        self.assertEqual(add_tags(second, ['NEWS']), [])
+        self.assertEqual(self.counts(), {'news': 2, 'tech': 1})
+
+        # Tags are per owner
+        link = Link.objects.create(
+            owner=self.other, url='http://example.com/bob'
+        )
+        add_tags(link, ['news'])
+        self.assertEqual(self.counts(self.other), {'news': 1})
+        self.assertEqual(self.counts(), {'news': 2, 'tech': 1})
+
+    def test_remove(self):
+        first, second, _ = self.links
+        add_tags(first, ['news', 'tech'])
+        add_tags(second, ['news'])
+        self.assertEqual(remove_tags(first, ['news', 'missing']), 1)
+        self.assertEqual(remove_tags(first, ['news']), 0)
+        self.assertEqual(self.counts(), {'news': 1, 'tech': 1})
+
+        set_tags(second, ['tech', 'misc'])
+        self.assertEqual(self.counts(), {'news': 0, 'tech': 2, 'misc': 1})
+
+    def test_link_delete(self):
+        first, second, third = self.links
+        for link in self.links:
+            add_tags(link, ['news'])
+        add_tags(first, ['tech'])
+        first.delete()
+        self.assertEqual(self.counts(), {'news': 2, 'tech': 0})
+        Link.objects.filter(pk__in=[second.pk, third.pk]).delete()
+        self.assertEqual(self.counts(), {'news': 0, 'tech': 0})
+
+    def test_recount(self):
+        for link in self.links:
+            add_tags(link, ['news'])
+        Tag.objects.update(link_count=7)
+        self.assertEqual(recount_tags(owner=self.user), 1)
+        self.assertEqual(self.counts(), {'news': 3})
+
+
+class LinkActivityTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice', 'pw')
+        self.links = [
+            Link.objects.create(
+                owner=self.user, url='http://example.com/{0}'.format(i)
+            )
+            for i in range(3)
+        ]
+        self.t0 = utcnow()
+        self.t1 = self.t0 + datetime.timedelta(seconds=1)
+
+    def _flushed(self, buffer):
+        flushed = {}
+        def apply(pending):
+            flushed.update(pending)
+            return len(pending)
+        buffer.flush(apply)
+        return flushed
+
+    def test_buffer_merges(self):
+        buffer = LocMemActivityBuffer()
+        buffer.add('a', Pending(1, self.t0, 0.2, self.t0))
+        buffer.add('a', Pending(0, None, 0.1, self.t1))
+        buffer.add('a', Pending(1, self.t1, None, None))
+        # Reported late, superseded by the later report
+        buffer.add('a', Pending(0, None, 0.9, self.t0))
+        self.assertEqual(
+            self._flushed(buffer), {'a': Pending(2, self.t1, 0.1, self.t1)}
+        )
+        self.assertEqual(self._flushed(buffer), {})
+
+    def test_failed_flush_kept(self):
+        buffer = LocMemActivityBuffer()
+        buffer.add('a', Pending(1, self.t0, None, None))
+        def fail(pending):
+            raise RuntimeError
+        with self.assertRaises(RuntimeError):
+            buffer.flush(fail)
+        buffer.add('a', Pending(1, self.t1, None, None))
+        self.assertEqual(
+            self._flushed(buffer), {'a': Pending(2, self.t1, None, None)}
+        )
+
+    def test_flush_updates_links(self):
+        first, second, third = self.links
+        first.visit_count = 5
+        first.save()
+        recorder = LinkActivityRecorder(LocMemActivityBuffer(), 3600)
+        recorder.record_visit(first.pk)
+        recorder.record_visit(first.pk)
+        recorder.record_progress(second.pk, 0.5)
+        # Not written until flushed
+        first.refresh_from_db()
+        self.assertEqual(first.visit_count, 5)
+
+        Change.objects.all().delete()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(recorder.flush(), 2)
+        # One UPDATE for the chunk
+        self.assertEqual(
+            sum(q['sql'].startswith('UPDATE')
+                for q in queries.captured_queries),
+            1,
+        )
+        first.refresh_from_db()
+        second.refresh_from_db()
+        third.refresh_from_db()
+        self.assertEqual(first.visit_count, 7)
+        self.assertIsNotNone(first.last_visited)
+        self.assertEqual(second.visit_count, 0)
+        self.assertIsNone(second.last_visited)
+        self.assertEqual(second.read_progress, 0.5)
+        self.assertEqual(third.visit_count, 0)
+        # Reported to syncing clients
+        self.assertEqual(
+            set(Change.objects.values_list('kind', 'object_id')),
+            {('link', first.pk), ('link', second.pk)},
+        )
+
+    def test_chunked(self):
+        pending = {
+            str(link.pk): Pending(1, self.t0, None, None)
+            for link in self.links
+        }
+        self.assertEqual(apply_activity(pending, chunk_size=2), 3)
+        self.assertEqual(
+            list(Link.objects.values_list('visit_count', flat=True)),
+            [1, 1, 1],
+        )
+
+    def test_sqlite_buffer_shared(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'activity.sqlite3')
+        # As two worker processes would each open it
+        one, two = SQLiteActivityBuffer(path), SQLiteActivityBuffer(path)
+        one.add('a', Pending(1, self.t0, 0.2, self.t0))
+        two.add('a', Pending(2, self.t1, 0.4, self.t1))
+        two.add('b', Pending(0, None, 0.3, self.t0))
+        def fail(pending):
+            raise RuntimeError
+        with self.assertRaises(RuntimeError):
+            two.flush(fail)
+        self.assertEqual(self._flushed(one), {
+            'a': Pending(3, self.t1, 0.4, self.t1),
+            'b': Pending(0, None, 0.3, self.t0),
+        })
+        self.assertEqual(self._flushed(two), {})
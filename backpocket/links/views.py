@@ -1,3 +1,116 @@
-from django.shortcuts import render
+from django.db.models import Count
+from rest_framework import serializers, status, viewsets
+from rest_framework.decorators import detail_route, list_route
+from rest_framework.response import Response
+from backpocket.links.activity import activity
+from backpocket.links.filters import LinkTagFilter
+from backpocket.links.models import Link, LinkTag, Tag
+from backpocket.links.permissions import (
+    LinkObjectPermissions, LinkObjectPermissionFilter
+)
+from backpocket.links.serializers import LinkSerializer
+from backpocket.pages.simhash import possible_duplicates
+from backpocket.timing import RequestTimingMixin
 
-# Create your views here.
+
+class LinkViewSet(RequestTimingMixin, viewsets.ModelViewSet):
+    """
+    Viewset for viewing, editing, and adding links in the
+    requesting user's library.
+    """
+    permission_classes = [LinkObjectPermissions]
+    filter_backends = [LinkObjectPermissionFilter, LinkTagFilter]
+    queryset = Link.objects.all()
+    serializer_class = LinkSerializer
+
+    def get_queryset(self):
+        return (
+            super().get_queryset()
+            .filter(owner_id=self.request.user.id)
+            .prefetch_related('tags')
+        )
+
+    def create(self, request, *args, **kwargs):
+        # As ModelViewSet's, adding links this one may duplicate
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        data = serializer.data
+        data['possible_duplicates'] = [
+            link_id for _, link_id in possible_duplicates(serializer.instance)
+        ]
+        return Response(
+            data, status=status.HTTP_201_CREATED,
+            headers=self.get_success_headers(data),
+        )
+
+    @list_route(methods=['get'])
+    def facets(self, request):
+        """
+        Tag counts for the links matching the current filter.
+        """
+        if LinkTagFilter().get_tags(request):
+            # Filtered: one aggregate over the matching links
+            links = self.filter_queryset(self.get_queryset())
+            counts = (
+                LinkTag.objects
+                .filter(link__in=links.order_by().values('pk'))
+                .values_list('tag__name')
+                .annotate(count=Count('link'))
+                .order_by('-count', 'tag__name')
+            )
+        else:
+            # Unfiltered: read denormalized counts directly
+            counts = (
+                Tag.objects
+                .filter(owner_id=request.user.id, link_count__gt=0)
+                .values_list('name', 'link_count')
+                .order_by('-link_count', 'name')
+            )
+
+        return Response([
+            {'tag': name, 'count': count} for name, count in counts
+        ])
+
+    def _get_progress(self, request, required):
+        field = serializers.FloatField(
+            min_value=0, max_value=1, required=required
+        )
+        value = request.data.get('progress')
+        if value is None and not required:
+            return None
+        try:
+            return field.run_validation(value)
+        except serializers.ValidationError as e:
+            raise serializers.ValidationError({'progress': e.detail})
+
+    @detail_route(methods=['post'])
+    def visit(self, request, pk=None):
+        """
+        Records a visit, optionally with read progress (0 to 1).
+        Counts are written behind, so may take a few seconds to show.
+        """
+        link = self.get_object()
+        activity.record_visit(link.pk, self._get_progress(request, False))
+        return Response(status=status.HTTP_202_ACCEPTED)
+
+    @detail_route(methods=['post'])
+    def progress(self, request, pk=None):
+        """
+        Records read progress (0 to 1).
+        """
+        link = self.get_object()
+        activity.record_progress(link.pk, self._get_progress(request, True))
+        return Response(status=status.HTTP_202_ACCEPTED)
+
+    @detail_route(methods=['get'])
+    def duplicates(self, request, pk=None):
+        """
+        Links in the library whose archived pages nearly match this
+        link's, closest first, with the number of differing bits.
+        """
+        link = self.get_object()
+        return Response([
+            {'link': link_id, 'distance': d}
+            for d, link_id in possible_duplicates(link)
+        ])
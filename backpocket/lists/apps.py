@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ListsConfig(AppConfig):
     name = 'backpocket.lists'
     label = 'bp_lists'
+
+    def ready(self):
+        from backpocket.lists.signals import connect_signals
+        connect_signals()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 14:27
+from __future__ import unicode_literals
+
+import backpocket.utils
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('bp_links', '0002_tags'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='List',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, verbose_name='list ID')),
+                ('name', models.CharField(max_length=150, verbose_name='name')),
+                ('description', models.TextField(blank=True, verbose_name='description')),
+                ('date_created', models.DateTimeField(default=backpocket.utils.utcnow, verbose_name='date created')),
+                ('date_modified', models.DateTimeField(default=backpocket.utils.utcnow, verbose_name='date modified')),
+            ],
+            options={
+                'verbose_name': 'list',
+                'verbose_name_plural': 'lists',
+                'db_table': 'bp_list',
+                'permissions': (('view_list', 'Can view list'),),
+                'default_related_name': 'lists',
+            },
+        ),
+        migrations.CreateModel(
+            name='ListItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.IntegerField(default=0, verbose_name='position')),
+                ('date_added', models.DateTimeField(default=backpocket.utils.utcnow, verbose_name='date added')),
+                ('link', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='bp_links.Link')),
+                ('list', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='bp_lists.List')),
+            ],
+            options={
+                'verbose_name': 'list item',
+                'verbose_name_plural': 'list items',
+                'db_table': 'bp_list_item',
+                'ordering': ('list', 'position'),
+            },
+        ),
+        migrations.AddField(
+            model_name='list',
+            name='links',
+            field=models.ManyToManyField(blank=True, related_name='lists', through='bp_lists.ListItem', to='bp_links.Link', verbose_name='links'),
+        ),
+        migrations.AddField(
+            model_name='list',
+            name='owner',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lists', to=settings.AUTH_USER_MODEL, verbose_name='owner'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='listitem',
+            unique_together=set([('list', 'link')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='listitem',
+            index_together=set([('list', 'position')]),
+        ),
+    ]
@@ -1,3 +1,94 @@
+from django.conf import settings
 from django.db import models
+from backpocket.owned import (
+    OwnedObjectPermissions, OwnedObjectPermissionFilters
+)
+from backpocket.sharing.models import CHANGE, DELETE
+from backpocket.utils import utcnow, uuid7
 
-# Create your models here.
+
+class ListObjectPermissions(OwnedObjectPermissions):
+
+    def add_list(self, user, obj):
+        return False
+
+    def change_list(self, user, obj):
+        return self._is_owner_or_shared(user, obj, CHANGE)
+
+    def delete_list(self, user, obj):
+        return self._is_owner_or_shared(user, obj, DELETE)
+
+    def view_list(self, user, obj):
+        return self._is_admin_owner_or_shared(user, obj)
+
+
+class ListObjectPermissionFilters(OwnedObjectPermissionFilters):
+
+    def view_list(self, user, queryset):
+        return self._admin_all_user_own_or_shared(user, queryset)
+
+
+class List(models.Model):
+    """
+    Named, ordered reading list of links.
+    """
+
+    class Meta:
+        verbose_name = 'list'
+        verbose_name_plural = 'lists'
+        default_related_name = 'lists'
+        db_table = 'bp_list'
+        permissions = (
+            ('view_list', 'Can view list'),
+        )
+
+    ObjectPermissions = ListObjectPermissions()
+
+    ObjectPermissionFilters = ListObjectPermissionFilters()
+
+    id = models.UUIDField(
+        'list ID', primary_key=True, default=uuid7, editable=False
+    )
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        verbose_name='owner',
+    )
+    name = models.CharField('name', max_length=150)
+    description = models.TextField('description', blank=True)
+    date_created = models.DateTimeField('date created', default=utcnow)
+    date_modified = models.DateTimeField('date modified', default=utcnow)
+    links = models.ManyToManyField(
+        'bp_links.Link',
+        through='ListItem',
+        related_name='lists',
+        blank=True,
+        verbose_name='links',
+    )
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        self.date_modified = utcnow()
+        super().save(*args, **kwargs)
+
+
+class ListItem(models.Model):
+
+    class Meta:
+        verbose_name = 'list item'
+        verbose_name_plural = 'list items'
+        db_table = 'bp_list_item'
+        unique_together = (('list', 'link'),)
+        index_together = (('list', 'position'),)
+        ordering = ('list', 'position')
+
+    list = models.ForeignKey(
+        List, on_delete=models.CASCADE, related_name='items'
+    )
+    link = models.ForeignKey(
+        'bp_links.Link', on_delete=models.CASCADE, related_name='+'
+    )
+    position = models.IntegerField('position', default=0)
+    date_added = models.DateTimeField('date added', default=utcnow)
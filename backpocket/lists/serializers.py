@@ -0,0 +1,21 @@
+from rest_framework import serializers
+from backpocket.lists.models import List
+
+
+class ListSerializer(serializers.ModelSerializer):
+    """
+    General list model serializer. Items are given as an
+    ordered list of link IDs.
+    """
+    items = serializers.SerializerMethodField()
+
+    class Meta:
+        model = List
+        fields = (
+            'id', 'owner', 'name', 'description', 'items',
+            'date_created', 'date_modified',
+        )
+        read_only_fields = ('owner', 'date_created', 'date_modified')
+
+    def get_items(self, obj):
+        return [item.link_id for item in obj.items.all()]
@@ -0,0 +1,44 @@
+# Keep a list's modification time current when its items change,
+# since it also serves as the version for cached list renderings
+
+from django.db.models.signals import post_save, post_delete
+from backpocket.links.models import Link
+from backpocket.links.signals import tags_changed
+from backpocket.lists.models import List, ListItem
+from backpocket.utils import utcnow
+
+
+def _touch_list(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    try:
+        lst = List.objects.get(pk=instance.list_id)
+    except List.DoesNotExist:
+        # List itself is being deleted
+        return
+    lst.save(update_fields=['date_modified'])
+
+
+def _touch_link_lists(sender, instance=None, raw=False, link=None,
+                      **kwargs):
+    # Link edits change how lists render, but not the lists themselves,
+    # so bump times in bulk without recording list changes
+    if raw:
+        return
+    link = instance if link is None else link
+    List.objects.filter(items__link=link).update(date_modified=utcnow())
+
+
+def connect_signals():
+    post_save.connect(
+        _touch_list, sender=ListItem, dispatch_uid='bp_lists_touch_save'
+    )
+    post_delete.connect(
+        _touch_list, sender=ListItem, dispatch_uid='bp_lists_touch_delete'
+    )
+    post_save.connect(
+        _touch_link_lists, sender=Link, dispatch_uid='bp_lists_touch_link'
+    )
+    tags_changed.connect(
+        _touch_link_lists, sender=Link, dispatch_uid='bp_lists_touch_tags'
+    )
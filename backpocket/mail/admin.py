@@ -0,0 +1,11 @@
+from django.contrib import admin
+from backpocket.mail.models import QueuedMessage
+
+
+@admin.register(QueuedMessage)
+class QueuedMessageAdmin(admin.ModelAdmin):
+    list_display = (
+        'subject', 'to', 'status', 'attempts', 'next_attempt', 'date_sent'
+    )
+    list_filter = ('status',)
+    readonly_fields = ('id', 'date_queued', 'date_sent', 'last_error')
@@ -0,0 +1,7 @@
+from django.apps import AppConfig
+
+
+class MailConfig(AppConfig):
+    name = 'backpocket.mail'
+    label = 'bp_mail'
+    verbose_name = 'Mail'
@@ -0,0 +1,17 @@
+from django.core.mail.backends.base import BaseEmailBackend
+from backpocket.mail.models import QueuedMessage
+
+
+class OutboxEmailBackend(BaseEmailBackend):
+    """
+    Email backend which writes messages to the outbox table, in the
+    caller's transaction, for the send_queued_mail worker to deliver.
+    """
+
+    def send_messages(self, email_messages):
+        queued = [
+            QueuedMessage.from_email_message(message)
+            for message in email_messages if message.recipients()
+        ]
+        QueuedMessage.objects.bulk_create(queued)
+        return len(queued)
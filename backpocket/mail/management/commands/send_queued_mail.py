@@ -0,0 +1,54 @@
+import datetime
+from django.core.management.base import BaseCommand
+from backpocket.mail.outbox import OutboxWorker, purge_sent
+
+
+class Command(BaseCommand):
+    help = 'Delivers queued outgoing mail.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Deliver what is currently due, then exit.',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=None,
+            help='Seconds to wait when the queue is empty.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Messages to claim per batch.',
+        )
+        parser.add_argument(
+            '--purge-days', type=int, default=None,
+            help='First delete sent and failed messages older than this.',
+        )
+
+    def handle(self, *args, **options):
+        if options['purge_days'] is not None:
+            count = purge_sent(
+                datetime.timedelta(days=options['purge_days'])
+            )
+            self.stdout.write('Purged {0} message(s)'.format(count))
+
+        worker = OutboxWorker(batch_size=options['batch_size'])
+
+        if not options['once']:
+            worker.run(interval=options['interval'])
+            return
+
+        total_sent = total_failed = 0
+        try:
+            while True:
+                sent, failed = worker.deliver_batch()
+                if not sent and not failed:
+                    break
+                total_sent += sent
+                total_failed += failed
+        finally:
+            worker.close()
+        self.stdout.write(
+            'Sent {0} message(s), {1} failed or deferred'.format(
+                total_sent, total_failed
+            )
+        )
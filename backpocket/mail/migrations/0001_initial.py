@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 14:39
+from __future__ import unicode_literals
+
+import backpocket.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedMessage',
+            fields=[
+                ('id', models.UUIDField(default=backpocket.utils.uuid7, editable=False, primary_key=True, serialize=False, verbose_name='message ID')),
+                ('subject', models.TextField(blank=True, verbose_name='subject')),
+                ('body', models.TextField(blank=True, verbose_name='body')),
+                ('html_body', models.TextField(blank=True, verbose_name='HTML body')),
+                ('from_email', models.CharField(max_length=254, verbose_name='from')),
+                ('to', models.TextField(blank=True, verbose_name='to')),
+                ('cc', models.TextField(blank=True, verbose_name='cc')),
+                ('bcc', models.TextField(blank=True, verbose_name='bcc')),
+                ('reply_to', models.TextField(blank=True, verbose_name='reply to')),
+                ('headers', models.TextField(blank=True, verbose_name='extra headers')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('sent', 'Sent'), ('failed', 'Failed')], default='queued', max_length=16, verbose_name='status')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='attempts')),
+                ('next_attempt', models.DateTimeField(default=backpocket.utils.utcnow, verbose_name='next attempt')),
+                ('claim', models.CharField(blank=True, editable=False, max_length=32)),
+                ('last_error', models.TextField(blank=True, verbose_name='last error')),
+                ('date_queued', models.DateTimeField(default=backpocket.utils.utcnow, verbose_name='date queued')),
+                ('date_sent', models.DateTimeField(blank=True, null=True, verbose_name='date sent')),
+            ],
+            options={
+                'verbose_name': 'queued message',
+                'verbose_name_plural': 'queued messages',
+                'db_table': 'bp_mail_queue',
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='queuedmessage',
+            index_together=set([('status', 'next_attempt')]),
+        ),
+    ]
@@ -0,0 +1,92 @@
+import json
+from django.core.mail import EmailMultiAlternatives
+from django.db import models
+from backpocket.utils import utcnow, uuid7
+
+
+class QueuedMessage(models.Model):
+    """
+    Outgoing email, written by the outbox backend and delivered by the
+    send_queued_mail worker.
+    """
+
+    class Meta:
+        verbose_name = 'queued message'
+        verbose_name_plural = 'queued messages'
+        db_table = 'bp_mail_queue'
+        index_together = (('status', 'next_attempt'),)
+
+    QUEUED = 'queued'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    )
+
+    id = models.UUIDField(
+        'message ID', primary_key=True, default=uuid7, editable=False
+    )
+    subject = models.TextField('subject', blank=True)
+    body = models.TextField('body', blank=True)
+    html_body = models.TextField('HTML body', blank=True)
+    from_email = models.CharField('from', max_length=254)
+    # Address lists are stored one per line
+    to = models.TextField('to', blank=True)
+    cc = models.TextField('cc', blank=True)
+    bcc = models.TextField('bcc', blank=True)
+    reply_to = models.TextField('reply to', blank=True)
+    headers = models.TextField('extra headers', blank=True)
+
+    status = models.CharField(
+        'status', max_length=16, choices=STATUS_CHOICES, default=QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField('attempts', default=0)
+    next_attempt = models.DateTimeField('next attempt', default=utcnow)
+    # Set by the worker delivering the message, until its lease expires
+    claim = models.CharField(max_length=32, blank=True, editable=False)
+    last_error = models.TextField('last error', blank=True)
+    date_queued = models.DateTimeField('date queued', default=utcnow)
+    date_sent = models.DateTimeField('date sent', null=True, blank=True)
+
+    def __str__(self):
+        return self.subject
+
+    @classmethod
+    def from_email_message(cls, message):
+        html_body = ''
+        for content, mimetype in getattr(message, 'alternatives', ()):
+            if mimetype == 'text/html':
+                html_body = content
+        if message.attachments:
+            raise ValueError('Queued messages cannot have attachments')
+        return cls(
+            subject=message.subject,
+            body=message.body,
+            html_body=html_body,
+            from_email=message.from_email,
+            to='\n'.join(message.to),
+            cc='\n'.join(message.cc),
+            bcc='\n'.join(message.bcc),
+            reply_to='\n'.join(message.reply_to),
+            headers=json.dumps(message.extra_headers) if message.extra_headers
+                    else '',
+        )
+
+    def to_email_message(self, connection=None):
+        split = lambda value: value.split('\n') if value else []
+        message = EmailMultiAlternatives(
+            subject=self.subject,
+            body=self.body,
+            from_email=self.from_email,
+            to=split(self.to),
+            cc=split(self.cc),
+            bcc=split(self.bcc),
+            reply_to=split(self.reply_to),
+            headers=json.loads(self.headers) if self.headers else None,
+            connection=connection,
+        )
+        if self.html_body:
+            message.attach_alternative(self.html_body, 'text/html')
+        return message
@@ -0,0 +1,178 @@
+# Outgoing mail queue and delivery
+#
+# Messages are queued as rows, so they commit (or roll back) with the
+# request that produced them and requests never wait on the mail
+# server. A worker claims due messages in batches and sends them over
+# one SMTP connection, kept open between batches while there's work.
+# Failed messages are retried with exponential backoff.
+
+import datetime, random, smtplib, time, uuid
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from backpocket.mail.backends import OutboxEmailBackend
+from backpocket.mail.models import QueuedMessage
+from backpocket.utils import utcnow
+
+
+def _setting(name, default):
+    return getattr(settings, 'MAIL_OUTBOX', {}).get(name, default)
+
+
+def queue_mail(subject, message, recipient_list, from_email=None,
+               html_message=None, **kwargs):
+    '''Queues a message for delivery, like django.core.mail.send_mail()
+    but always through the outbox, whatever EMAIL_BACKEND is.
+    Returns the number of messages queued.
+    '''
+    email = EmailMultiAlternatives(
+        subject, message, from_email or settings.DEFAULT_FROM_EMAIL,
+        recipient_list, **kwargs
+    )
+    if html_message:
+        email.attach_alternative(html_message, 'text/html')
+    return OutboxEmailBackend().send_messages([email])
+
+
+def retry_delay(attempts):
+    '''Backoff before the next attempt, with a little jitter so a
+    failed batch doesn't retry in lockstep.
+    '''
+    base = _setting('RETRY_DELAY', 60)
+    delay = min(base * 2 ** (attempts - 1), _setting('MAX_RETRY_DELAY', 3600))
+    return datetime.timedelta(seconds=delay * random.uniform(1, 1.25))
+
+
+def _is_permanent(exc):
+    # 5xx replies won't get better by retrying
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in exc.recipients.values())
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return exc.smtp_code >= 500
+    return False
+
+
+def _is_connection_error(exc):
+    return isinstance(exc, (smtplib.SMTPServerDisconnected, OSError))
+
+
+class OutboxWorker:
+    """
+    Delivers queued messages in batches over a persistent connection
+    to the delivery backend (SMTP by default).
+    """
+
+    def __init__(self, batch_size=None, backend=None):
+        self.batch_size = batch_size or _setting('BATCH_SIZE', 50)
+        self.backend = backend or _setting(
+            'DELIVERY_BACKEND', 'django.core.mail.backends.smtp.EmailBackend'
+        )
+        self.max_attempts = _setting('MAX_ATTEMPTS', 6)
+        self.lease = datetime.timedelta(seconds=_setting('LEASE', 300))
+        self.idle_timeout = _setting('IDLE_TIMEOUT', 30)
+        self.connection = None
+        self.last_used = 0
+
+    def open(self):
+        if self.connection is None:
+            connection = get_connection(self.backend, fail_silently=False)
+            connection.open()
+            self.connection = connection
+        self.last_used = time.monotonic()
+        return self.connection
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+            self.connection = None
+
+    def close_if_idle(self):
+        if time.monotonic() - self.last_used >= self.idle_timeout:
+            self.close()
+
+    def claim(self, now):
+        '''Claims up to a batch of due messages, so other workers skip
+        them until the lease runs out. Returns the claimed messages.
+        '''
+        ids = list(
+            QueuedMessage.objects
+            .filter(status=QueuedMessage.QUEUED, next_attempt__lte=now)
+            .order_by('next_attempt')
+            .values_list('pk', flat=True)[:self.batch_size]
+        )
+        if not ids:
+            return []
+        token = uuid.uuid4().hex
+        QueuedMessage.objects.filter(
+            pk__in=ids, status=QueuedMessage.QUEUED, next_attempt__lte=now
+        ).update(claim=token, next_attempt=now + self.lease)
+        return list(QueuedMessage.objects.filter(claim=token))
+
+    def _failed(self, message, exc, now):
+        message.attempts += 1
+        message.claim = ''
+        message.last_error = '{0}: {1}'.format(type(exc).__name__, exc)
+        if _is_permanent(exc) or message.attempts >= self.max_attempts:
+            message.status = QueuedMessage.FAILED
+        else:
+            message.next_attempt = now + retry_delay(message.attempts)
+        message.save(update_fields=[
+            'attempts', 'claim', 'last_error', 'status', 'next_attempt'
+        ])
+
+    def deliver_batch(self):
+        '''Sends one batch of due messages. Returns (sent, failed).'''
+        now = utcnow()
+        messages = self.claim(now)
+        if not messages:
+            return 0, 0
+
+        sent, failed = [], 0
+        for message in messages:
+            try:
+                connection = self.open()
+                connection.send_messages([message.to_email_message()])
+            except Exception as exc:
+                if _is_connection_error(exc):
+                    self.close()
+                self._failed(message, exc, now)
+                failed += 1
+            else:
+                sent.append(message.pk)
+
+        if sent:
+            QueuedMessage.objects.filter(pk__in=sent).update(
+                status=QueuedMessage.SENT, claim='', date_sent=utcnow()
+            )
+        self.last_used = time.monotonic()
+        return len(sent), failed
+
+    def run(self, interval=None, stop=None):
+        '''Delivers batches until stop() returns true, waiting interval
+        seconds whenever the queue is empty.
+        '''
+        interval = interval or _setting('POLL_INTERVAL', 5)
+        try:
+            while not (stop and stop()):
+                sent, failed = self.deliver_batch()
+                if not sent and not failed:
+                    self.close_if_idle()
+                    time.sleep(interval)
+        finally:
+            self.close()
+
+
+def purge_sent(age):
+    '''Deletes sent and failed messages older than age (timedelta).
+    Returns the number deleted.
+    '''
+    cutoff = utcnow() - age
+    with transaction.atomic():
+        count, _ = QueuedMessage.objects.filter(
+            status__in=(QueuedMessage.SENT, QueuedMessage.FAILED),
+            date_queued__lt=cutoff,
+        ).delete()
+    return count
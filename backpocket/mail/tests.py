@@ -0,0 +1,136 @@
+import asyncore, smtpd, socket, threading
+from django.core import mail
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from backpocket.mail.models import QueuedMessage
+from backpocket.mail.outbox import OutboxWorker, queue_mail
+from backpocket.users.models import User
+from backpocket.utils import utcnow
+
+
+class StandInSMTPServer(smtpd.SMTPServer):
+    """
+    Local SMTP server recording messages and connection count.
+    """
+
+    def __init__(self):
+        self.socket_map = {}
+        super().__init__(
+            ('127.0.0.1', 0), None, map=self.socket_map, decode_data=True
+        )
+        self.port = self.socket.getsockname()[1]
+        self.messages = []
+        self.connections = 0
+        self.refuse = set()
+
+    def handle_accepted(self, conn, addr):
+        self.connections += 1
+        super().handle_accepted(conn, addr)
+
+    def process_message(self, peer, mailfrom, rcpttos, data, **kwargs):
+        if self.refuse.intersection(rcpttos):
+            return '550 No such user'
+        self.messages.append((mailfrom, rcpttos, data))
+
+    def start(self):
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        while not self.stopped.is_set():
+            asyncore.loop(timeout=0.05, count=1, map=self.socket_map)
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        asyncore.close_all(map=self.socket_map)
+
+
+def unused_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class OutboxTests(TestCase):
+
+    def setUp(self):
+        self.server = StandInSMTPServer()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        self.settings = override_settings(
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=self.server.port,
+        )
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+
+    def test_queue_does_not_send(self):
+        queue_mail('Hi', 'Body', ['a@example.com'])
+        self.assertEqual(QueuedMessage.objects.count(), 1)
+        self.assertEqual(self.server.messages, [])
+
+    def test_batch_uses_one_connection(self):
+        for i in range(5):
+            queue_mail('Hi {0}'.format(i), 'Body', ['a@example.com'])
+        worker = OutboxWorker(batch_size=3)
+        self.assertEqual(worker.deliver_batch(), (3, 0))
+        self.assertEqual(worker.deliver_batch(), (2, 0))
+        self.assertEqual(worker.deliver_batch(), (0, 0))
+        worker.close()
+        self.assertEqual(len(self.server.messages), 5)
+        self.assertEqual(self.server.connections, 1)
+        self.assertFalse(
+            QueuedMessage.objects.exclude(status=QueuedMessage.SENT).exists()
+        )
+
+    def test_retry_with_backoff(self):
+        queue_mail('Hi', 'Body', ['a@example.com'])
+        with override_settings(EMAIL_PORT=unused_port()):
+            worker = OutboxWorker()
+            self.assertEqual(worker.deliver_batch(), (0, 1))
+            # Not due again yet
+            self.assertEqual(worker.deliver_batch(), (0, 0))
+        message = QueuedMessage.objects.get()
+        self.assertEqual(message.status, QueuedMessage.QUEUED)
+        self.assertEqual(message.attempts, 1)
+        self.assertGreater(message.next_attempt, utcnow())
+
+        QueuedMessage.objects.update(next_attempt=utcnow())
+        worker = OutboxWorker()
+        self.assertEqual(worker.deliver_batch(), (1, 0))
+        worker.close()
+        self.assertEqual(len(self.server.messages), 1)
+
+    def test_permanent_failure(self):
+        self.server.refuse.add('nobody@example.com')
+        queue_mail('Hi', 'Body', ['nobody@example.com'])
+        queue_mail('Hi', 'Body', ['a@example.com'])
+        worker = OutboxWorker()
+        self.assertEqual(worker.deliver_batch(), (1, 1))
+        worker.close()
+        failed = QueuedMessage.objects.get(to='nobody@example.com')
+        self.assertEqual(failed.status, QueuedMessage.FAILED)
+        self.assertIn('550', failed.last_error)
+
+    def test_outbox_backend(self):
+        with override_settings(
+                EMAIL_BACKEND='backpocket.mail.backends.OutboxEmailBackend'):
+            mail.send_mail('Hi', 'Body', None, ['a@example.com'])
+        self.assertEqual(QueuedMessage.objects.count(), 1)
+        self.assertEqual(self.server.messages, [])
+
+    def test_reset_password_queues_link(self):
+        user = User.objects.create_user(
+            'alice', 'pw', email='alice@example.com'
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post(
+            '/api/users/{0}/reset_password/'.format(user.pk)
+        )
+        self.assertEqual(response.status_code, 202)
+        message = QueuedMessage.objects.get()
+        self.assertEqual(message.to, 'alice@example.com')
+        self.assertIn('/reset/', message.body)
+
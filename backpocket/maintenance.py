@@ -0,0 +1,184 @@
+"""
+Online SQLite backup and compaction.
+
+Both run on their own connections to the database file, alongside the
+running server, in small steps that each hold a lock only briefly:
+
+- backup() copies the database with SQLite's online backup API a few
+  hundred pages at a time, pausing between steps. In WAL mode it
+  reads from one snapshot, so writers are never blocked and the copy
+  never restarts. Otherwise each step holds a shared lock only while
+  it runs, but any write from another connection restarts the copy
+  from the start; after max_restarts it gives up (BackupRestarted)
+  rather than chasing a busy database forever.
+- incremental_vacuum() returns free pages to the filesystem a slice
+  at a time, within a time budget, backing off whenever the database
+  is busy. It needs auto_vacuum = INCREMENTAL, which
+  enable_incremental() switches on with one blocking VACUUM.
+
+Neither depends on Django, so both can be run from cron against a copy
+of the database as well.
+"""
+import contextlib, gzip, os, shutil, sqlite3, time
+
+
+class BackupRestarted(Exception):
+    """
+    Raised when writes keep restarting a backup outside WAL mode.
+    """
+    pass
+
+
+class VacuumNotIncremental(Exception):
+    """
+    Raised when the database isn't in incremental auto-vacuum mode.
+    """
+    pass
+
+
+def _connect(path, timeout=5.0):
+    # Autocommit, so each statement is its own short transaction
+    return sqlite3.connect(path, timeout=timeout, isolation_level=None)
+
+
+def backup(source, dest, pages=256, pause=0.01, compress=False,
+           progress=None, max_restarts=10):
+    '''Copies database file source to dest, pages at a time with a
+    pause after each step. With compress, dest is gzipped. progress,
+    if given, is called with (remaining, total) pages after each step.
+    The copy is written next to dest and renamed into place once
+    complete. Returns dict of timings and sizes.
+    '''
+    partial = dest + '.partial'
+    if os.path.exists(partial):
+        os.remove(partial)
+    start = time.perf_counter()
+    steps = restarts = 0
+    last_remaining = None
+
+    def on_step(status, remaining, total):
+        nonlocal steps, restarts, last_remaining
+        steps += 1
+        # Each step copies pages, so anything but fewer remaining
+        # means the copy started over
+        if last_remaining is not None and remaining >= last_remaining:
+            restarts += 1
+            if restarts > max_restarts:
+                raise BackupRestarted(restarts)
+        last_remaining = remaining
+        if progress is not None:
+            progress(remaining, total)
+        # Outside WAL mode, the source lock is released between steps
+        time.sleep(pause)
+
+    with contextlib.closing(_connect(source)) as src:
+        wal = src.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        page_size = src.execute('PRAGMA page_size').fetchone()[0]
+        with contextlib.closing(_connect(partial)) as dst:
+            if wal and hasattr(src, 'backup'):
+                # Pin a snapshot; WAL readers don't block writers
+                src.execute('BEGIN')
+                src.execute('SELECT 1 FROM sqlite_master LIMIT 1')
+            try:
+                if hasattr(src, 'backup'):
+                    src.backup(dst, pages=pages, progress=on_step)
+                else:
+                    # No backup API before Python 3.7: one read
+                    # transaction for the whole copy, which outside WAL
+                    # mode blocks writers throughout
+                    dst.close()
+                    os.remove(partial)
+                    src.execute('VACUUM INTO ?', (partial,))
+                    steps = 1
+            except BaseException:
+                dst.close()
+                if os.path.exists(partial):
+                    os.remove(partial)
+                raise
+            finally:
+                if src.in_transaction:
+                    src.execute('COMMIT')
+    copied = time.perf_counter() - start
+
+    if compress:
+        compressed = partial + '.gz'
+        with open(partial, 'rb') as infile:
+            with gzip.open(compressed, 'wb', compresslevel=6) as outfile:
+                shutil.copyfileobj(infile, outfile, 1 << 20)
+        os.remove(partial)
+        partial = compressed
+
+    os.replace(partial, dest)
+    return {
+        'steps': steps,
+        'restarts': restarts,
+        'wal': wal,
+        'page_size': page_size,
+        'copy_seconds': copied,
+        'total_seconds': time.perf_counter() - start,
+        'source_bytes': os.path.getsize(source),
+        'dest_bytes': os.path.getsize(dest),
+    }
+
+
+def enable_incremental(path):
+    '''Switches the database to incremental auto-vacuum. Takes effect
+    only after a full VACUUM, which this runs, locking the database
+    for its duration; needed once.
+    '''
+    with contextlib.closing(_connect(path)) as conn:
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+
+
+def incremental_vacuum(path, slice_pages=256, max_seconds=60.0,
+                       pause=0.05, busy_timeout=0.1):
+    '''Frees up to slice_pages free pages per write transaction, until
+    no free pages remain or max_seconds have passed. If another
+    connection holds the database for more than busy_timeout, that
+    slice is skipped and retried after a longer pause, so writers
+    always win. Returns dict of pages freed, slices, busy retries and
+    elapsed seconds. Raises VacuumNotIncremental if the database isn't
+    in incremental mode.
+    '''
+    start = time.perf_counter()
+    freed = slices = busy = 0
+
+    with contextlib.closing(_connect(path, timeout=busy_timeout)) as conn:
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            raise VacuumNotIncremental(path)
+
+        while time.perf_counter() - start < max_seconds:
+            free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            if not free:
+                break
+            slice_start = time.perf_counter()
+            try:
+                # Frees one page per step; execute() would stop after
+                # the first, as the pragma returns no columns
+                conn.executescript(
+                    'PRAGMA incremental_vacuum({0:d});'.format(slice_pages)
+                )
+            except sqlite3.OperationalError as e:
+                if 'locked' not in str(e) and 'busy' not in str(e):
+                    raise
+                busy += 1
+                time.sleep(pause * 10)
+                continue
+            freed += free - conn.execute(
+                'PRAGMA freelist_count'
+            ).fetchone()[0]
+            slices += 1
+            # At least as long as the slice took, so writers waiting on
+            # the busy handler's backoff get in
+            time.sleep(max(pause, time.perf_counter() - slice_start))
+
+        remaining = conn.execute('PRAGMA freelist_count').fetchone()[0]
+
+    return {
+        'freed_pages': freed,
+        'remaining_pages': remaining,
+        'slices': slices,
+        'busy': busy,
+        'seconds': time.perf_counter() - start,
+    }
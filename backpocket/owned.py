@@ -0,0 +1,64 @@
+# Object permission helpers for models belonging to a single user
+
+from backpocket.sharing.access import has_access, accessible
+from backpocket.sharing.models import VIEW
+from backpocket.users.hierarchy import is_ancestor, subusers
+
+
+class OwnedObjectPermissions:
+    """
+    Base for ObjectPermissions on models with an 'owner' foreign key.
+    Subclasses map their codenames onto the helpers below.
+    """
+
+    def _is_owner(self, user, obj):
+        return getattr(obj, 'owner_id', None) == user.id
+
+    def _is_parent_of_owner(self, user, obj):
+        return is_ancestor(user.id, getattr(obj, 'owner_id', None))
+
+    def _is_admin_or_owner(self, user, obj):
+        return (
+            user.is_staff or self._is_owner(user, obj) or
+            self._is_parent_of_owner(user, obj)
+        )
+
+    def _is_owner_or_shared(self, user, obj, bit=VIEW):
+        return self._is_owner(user, obj) or has_access(user, obj, bit)
+
+    def _is_admin_owner_or_shared(self, user, obj, bit=VIEW):
+        return (
+            self._is_admin_or_owner(user, obj) or
+            has_access(user, obj, bit)
+        )
+
+
+class OwnedObjectPermissionFilters:
+    """
+    Base for ObjectPermissionFilters on models with an 'owner'
+    foreign key. Subclasses map their codenames onto the helpers below.
+    """
+
+    def _user_own(self, user, queryset):
+        if not user or not user.is_authenticated:
+            return queryset.none()
+        return queryset.filter(owner_id=user.id)
+
+    def _user_subusers_own(self, user, queryset):
+        if not user or not user.is_authenticated:
+            return queryset.none()
+        return queryset.filter(owner_id=user.id) | queryset.filter(
+            owner_id__in=subusers(user.id)
+        )
+
+    def _admin_all_user_own(self, user, queryset):
+        if user and user.is_authenticated and user.is_staff:
+            return queryset
+        return self._user_subusers_own(user, queryset)
+
+    def _admin_all_user_own_or_shared(self, user, queryset, bit=VIEW):
+        if user and user.is_authenticated and user.is_staff:
+            return queryset
+        return self._user_subusers_own(user, queryset) | queryset.filter(
+            pk__in=accessible(user, queryset.model, bit)
+        )
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PagesConfig(AppConfig):
     name = 'backpocket.pages'
     label = 'bp_pages'
+
+    def ready(self):
+        from backpocket.pages.simhash import connect_signals
+        connect_signals()
@@ -0,0 +1,68 @@
+"""
+Content-addressed storage for raw archived HTML.
+
+Each blob is a file named by the SHA-256 of its contents, under a
+two-character fan-out directory, so identical documents are stored
+once and a page needs only the hash to find its HTML again. Blobs are
+written to a temporary file and renamed into place, so readers never
+see a partial one.
+"""
+import hashlib, os, tempfile
+from django.conf import settings
+
+
+CHUNK_SIZE = 1 << 16
+
+
+def _setting(name, default):
+    return getattr(settings, 'PAGE_ARCHIVE', {}).get(name, default)
+
+
+class BlobStore:
+    """
+    Directory of immutable blobs keyed by content hash.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, content_hash):
+        return os.path.join(self.root, content_hash[:2], content_hash)
+
+    def exists(self, content_hash):
+        return os.path.exists(self.path(content_hash))
+
+    def open(self, content_hash):
+        return open(self.path(content_hash), 'rb')
+
+    def put(self, data):
+        '''Stores data, either bytes or a binary file object read in
+        chunks, and returns its hash.
+        '''
+        os.makedirs(self.root, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=self.root, suffix='.partial')
+        try:
+            with os.fdopen(fd, 'wb') as temp:
+                if isinstance(data, bytes):
+                    digest.update(data)
+                    temp.write(data)
+                else:
+                    for chunk in iter(lambda: data.read(CHUNK_SIZE), b''):
+                        digest.update(chunk)
+                        temp.write(chunk)
+            content_hash = digest.hexdigest()
+            path = self.path(content_hash)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return content_hash
+
+
+def get_blob_store():
+    return BlobStore(_setting(
+        'BLOB_DIR', os.path.join(settings.BASE_DIR, 'data', 'blobs')
+    ))
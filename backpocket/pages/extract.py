@@ -0,0 +1,374 @@
+"""
+Article text extraction for archived pages.
+
+Parsing HTML is CPU-bound, so it runs in a pool of worker processes,
+never in a web worker. Workers are handed a blob's path rather than
+its contents and stream the file through an incremental parser, so
+only the extracted text is pickled back. At most queue_depth documents
+are in flight, bounding memory however many pages are queued. Results
+are stored by content hash (PageExtract), so a document archived as
+several pages is extracted once, and again only if EXTRACTOR_VERSION
+changes.
+"""
+import codecs, collections, concurrent.futures, logging, os, re, statistics
+import time
+from html.parser import HTMLParser
+from django.conf import settings
+from django.db import transaction
+from backpocket.pages.blobs import get_blob_store
+from backpocket.pages.models import PageExtract
+from backpocket.pages.simhash import simhash, to_signed, to_unsigned
+
+
+logger = logging.getLogger('backpocket.pages')
+
+
+# Bump when extraction changes, to redo stored extracts
+EXTRACTOR_VERSION = 1
+
+CHUNK_SIZE = 1 << 16
+# As browsers, look for a charset declaration this far in
+SNIFF_BYTES = 1024
+
+# Elements whose content is never article text
+SKIP_TAGS = {
+    'script', 'style', 'noscript', 'template', 'svg', 'canvas', 'iframe',
+    'nav', 'header', 'footer', 'aside', 'form', 'button', 'select',
+}
+BLOCK_TAGS = {
+    'address', 'article', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt',
+    'figcaption', 'figure', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr',
+    'li', 'main', 'ol', 'p', 'pre', 'section', 'table', 'td', 'th', 'tr',
+    'ul',
+}
+ARTICLE_TAGS = {'article', 'main'}
+# Elements with no end tag, which mustn't count towards nesting
+VOID_TAGS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+    'meta', 'param', 'source', 'track', 'wbr',
+}
+# An article or main element is preferred over the whole body only if
+# it holds at least this share of the body's text
+ARTICLE_SHARE = 0.25
+
+_CHARSET_RE = re.compile(
+    rb'<meta[^>]+charset\s*=\s*["\']?([a-zA-Z0-9_:.-]+)', re.IGNORECASE
+)
+_SPACE_RE = re.compile(r'\s+')
+
+
+def _setting(name, default):
+    return getattr(settings, 'PAGE_ARCHIVE', {}).get(name, default)
+
+
+class ArticleParser(HTMLParser):
+    """
+    Collects a document's title and text, by block, leaving out
+    scripts, navigation and other page furniture. Feed it text in any
+    number of pieces, then call close() and result().
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = []
+        self.body = ['']
+        self.article = ['']
+        self._skip = 0
+        self._article = 0
+        self._in_title = False
+
+    def _break(self):
+        if self.body[-1]:
+            self.body.append('')
+        if self._article and self.article[-1]:
+            self.article.append('')
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_TAGS:
+            if tag in BLOCK_TAGS:
+                self._break()
+        elif tag in SKIP_TAGS:
+            self._skip += 1
+        elif tag == 'title':
+            self._in_title = True
+        elif tag in BLOCK_TAGS:
+            if tag in ARTICLE_TAGS:
+                self._article += 1
+            self._break()
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self._break()
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip = max(self._skip - 1, 0)
+        elif tag == 'title':
+            self._in_title = False
+        elif tag in BLOCK_TAGS:
+            self._break()
+            if tag in ARTICLE_TAGS:
+                self._article = max(self._article - 1, 0)
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title.append(data)
+        elif not self._skip:
+            self.body[-1] += data
+            if self._article:
+                self.article[-1] += data
+
+    def result(self):
+        '''Returns (title, text), text being paragraphs separated by
+        blank lines.
+        '''
+        body = _paragraphs(self.body)
+        article = _paragraphs(self.article)
+        if sum(map(len, article)) >= ARTICLE_SHARE * sum(map(len, body)):
+            body = article or body
+        title = _SPACE_RE.sub(' ', ''.join(self.title)).strip()
+        return title[:500], '\n\n'.join(body)
+
+
+def _paragraphs(blocks):
+    return [
+        text for text in (_SPACE_RE.sub(' ', block).strip()
+                          for block in blocks)
+        if text
+    ]
+
+
+def _charset(head):
+    match = _CHARSET_RE.search(head)
+    if match:
+        try:
+            return codecs.lookup(match.group(1).decode('ascii')).name
+        except LookupError:
+            pass
+    return 'utf-8'
+
+
+def extract_stream(stream, chunk_size=CHUNK_SIZE):
+    '''Extracts (title, text, bytes read) from a binary file object,
+    reading and parsing it a chunk at a time. The charset comes from a
+    meta tag near the start, defaulting to UTF-8.
+    '''
+    parser = ArticleParser()
+    chunk = stream.read(max(chunk_size, SNIFF_BYTES))
+    decoder = codecs.getincrementaldecoder(_charset(chunk))('replace')
+    size = 0
+    while chunk:
+        size += len(chunk)
+        parser.feed(decoder.decode(chunk))
+        chunk = stream.read(chunk_size)
+    parser.feed(decoder.decode(b'', final=True))
+    parser.close()
+    title, text = parser.result()
+    return title, text, size
+
+
+def extract_file(path):
+    '''Worker task: returns (title, text, SimHash, bytes, seconds) for
+    the HTML file at path. The SimHash is computed here too, to keep
+    it out of the process saving pages.
+    '''
+    start = time.perf_counter()
+    with open(path, 'rb') as stream:
+        title, text, size = extract_stream(stream)
+    h = simhash(text)
+    return title, text, h, size, time.perf_counter() - start
+
+
+class ExtractionStats:
+    """
+    Counts and per-document timings from one pipeline run.
+    """
+
+    def __init__(self):
+        self.pages = 0
+        self.cached = 0
+        self.failed = 0
+        self.html_bytes = 0
+        # Time in the worker, and from submission to result
+        self.extract_seconds = []
+        self.latency_seconds = []
+        self.start = time.perf_counter()
+        self.elapsed = 0.0
+
+    def report(self):
+        extracted = len(self.extract_seconds)
+        lines = [
+            '{0} page(s): {1} extracted, {2} from cache, {3} failed, in '
+            '{4:.1f}s'.format(
+                self.pages, extracted, self.cached, self.failed,
+                self.elapsed,
+            )
+        ]
+        if extracted:
+            lines.append(
+                'Throughput: {0:.0f} documents/s, {1:.1f} MB/s'.format(
+                    extracted / self.elapsed,
+                    self.html_bytes / self.elapsed / 1e6,
+                )
+            )
+            for label, timings in (('Extract', self.extract_seconds),
+                                   ('Latency', self.latency_seconds)):
+                timings = sorted(timings)
+                lines.append(
+                    '{0}: median {1:.1f}ms, p95 {2:.1f}ms, max {3:.1f}ms'
+                    .format(
+                        label, statistics.median(timings) * 1000,
+                        timings[int(len(timings) * 0.95)] * 1000,
+                        timings[-1] * 1000,
+                    )
+                )
+        return '\n'.join(lines)
+
+
+class ExtractionPipeline:
+    """
+    Extracts text for pages with stored HTML in a process pool, and
+    saves it to them (so their search entries and fingerprints are
+    updated too). Saves are grouped into transactions of up to
+    save_batch pages, rather than a commit each. Use as a context
+    manager, or call close().
+    """
+
+    def __init__(self, processes=None, queue_depth=None, store=None,
+                 save_batch=100):
+        self.processes = processes or _setting(
+            'EXTRACT_PROCESSES', os.cpu_count()
+        )
+        self.queue_depth = queue_depth or _setting(
+            'EXTRACT_QUEUE_DEPTH', 2 * self.processes
+        )
+        self.store = store or get_blob_store()
+        self.save_batch = save_batch
+        self._pool = concurrent.futures.ProcessPoolExecutor(self.processes)
+        # Future -> (content hash, submitted at); hash -> waiting pages
+        self._pending = {}
+        self._waiting = collections.defaultdict(list)
+        # New PageExtracts by hash, and (page, extract) pairs, not yet
+        # saved; and hashes of those saved already
+        self._extracts = {}
+        self._updates = []
+        self._saved = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._pool.shutdown()
+
+    def run(self, pages, batch_size=500):
+        '''Extracts text for each page in queryset pages with a
+        html_hash, replacing its text, and its title if blank. Returns
+        ExtractionStats.
+        '''
+        stats = ExtractionStats()
+        pages = pages.exclude(html_hash='').order_by('pk')
+        last_pk = None
+        while True:
+            batch = pages
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            batch = list(batch[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            stats.pages += len(batch)
+
+            cached = PageExtract.objects.filter(
+                content_hash__in={page.html_hash for page in batch},
+                version=EXTRACTOR_VERSION,
+            ).in_bulk()
+            for page in batch:
+                extract = self._extracted(page.html_hash, cached)
+                if extract is not None:
+                    stats.cached += 1
+                    self._update(page, extract)
+                else:
+                    self._submit(page, stats)
+
+        while self._pending:
+            self._collect(stats)
+        self._save()
+        stats.elapsed = time.perf_counter() - stats.start
+        return stats
+
+    def _extracted(self, content_hash, cached):
+        # Extracts from earlier in this run may not be saved yet, or
+        # saved since cached was fetched
+        extract = cached.get(content_hash) or self._extracts.get(
+            content_hash
+        )
+        if extract is None and content_hash in self._saved:
+            extract = PageExtract.objects.get(
+                content_hash=content_hash, version=EXTRACTOR_VERSION
+            )
+        return extract
+
+    def _submit(self, page, stats):
+        waiting = self._waiting[page.html_hash]
+        waiting.append(page)
+        if len(waiting) > 1:
+            # Already in flight; saved to every waiting page on return
+            return
+        while len(self._pending) >= self.queue_depth:
+            self._collect(stats)
+        future = self._pool.submit(
+            extract_file, self.store.path(page.html_hash)
+        )
+        self._pending[future] = (page.html_hash, time.perf_counter())
+
+    def _collect(self, stats):
+        done, _ = concurrent.futures.wait(
+            self._pending, return_when=concurrent.futures.FIRST_COMPLETED
+        )
+        for future in done:
+            content_hash, submitted = self._pending.pop(future)
+            pages = self._waiting.pop(content_hash)
+            try:
+                title, text, h, size, seconds = future.result()
+            except Exception as e:
+                # Missing or unreadable blob, or markup the parser gave
+                # up on; others carry on
+                stats.failed += len(pages)
+                logger.warning('Extracting %s failed: %s', content_hash, e)
+                continue
+            stats.extract_seconds.append(seconds)
+            stats.latency_seconds.append(time.perf_counter() - submitted)
+            stats.html_bytes += size
+            extract = PageExtract(
+                content_hash=content_hash, version=EXTRACTOR_VERSION,
+                title=title, text=text, html_bytes=size, seconds=seconds,
+                simhash=None if h is None else to_signed(h),
+            )
+            self._extracts[content_hash] = extract
+            for page in pages:
+                self._update(page, extract)
+
+    def _update(self, page, extract):
+        self._updates.append((page, extract))
+        if len(self._updates) >= self.save_batch:
+            self._save()
+
+    def _save(self):
+        with transaction.atomic():
+            for extract in self._extracts.values():
+                extract.save()
+            for page, extract in self._updates:
+                update_fields = ['text']
+                page.text = extract.text
+                if extract.simhash is not None:
+                    page._simhash = to_unsigned(extract.simhash)
+                if not page.title and extract.title:
+                    page.title = extract.title
+                    update_fields.append('title')
+                page.save(update_fields=update_fields)
+        self._saved.update(self._extracts)
+        self._extracts = {}
+        self._updates = []
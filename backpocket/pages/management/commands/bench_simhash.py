@@ -0,0 +1,216 @@
+import os, random, sqlite3, statistics, tempfile, time
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand
+from backpocket.pages.simhash import (
+    BANDS, BITS, MAX_DISTANCE, simhash, bands, distance, to_signed,
+    to_unsigned, group_bands,
+)
+
+
+BAND_COLUMNS = ['band{0}'.format(i) for i in range(BANDS)]
+
+# Same layout and indexes as bp_page_fingerprint
+FINGERPRINTS_CREATE = (
+    'CREATE TABLE fingerprints ('
+    'page_id INTEGER PRIMARY KEY, owner_id INTEGER, simhash INTEGER, '
+    '{0})'.format(', '.join(c + ' INTEGER' for c in BAND_COLUMNS))
+)
+FINGERPRINTS_INDEXES = [
+    'CREATE INDEX fingerprints_owner_{0} ON fingerprints '
+    '(owner_id, {0})'.format(c) for c in BAND_COLUMNS
+]
+FINGERPRINTS_INSERT = 'INSERT INTO fingerprints VALUES ({0})'.format(
+    ', '.join('?' * (BANDS + 3))
+)
+# As near_duplicates()
+CANDIDATES = (
+    'SELECT page_id, simhash FROM fingerprints '
+    'WHERE owner_id = ? AND ({0})'.format(
+        ' OR '.join(c + ' = ?' for c in BAND_COLUMNS)
+    )
+)
+BAND_SCAN = (
+    'SELECT owner_id, {0}, page_id, simhash FROM fingerprints '
+    'ORDER BY owner_id, {0}'
+)
+
+
+def _simhashes(texts):
+    return [simhash(text) for text in texts]
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks page fingerprinting, near-duplicate lookup and '
+        'corpus-wide grouping against synthetic fingerprints in a '
+        'scratch database (does not touch project data).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=1000000)
+        parser.add_argument('--owners', type=int, default=1000)
+        parser.add_argument(
+            '--duplicate-rate', type=float, default=0.02,
+            help='Fraction of pages that are near-copies of another.',
+        )
+        parser.add_argument(
+            '--texts', type=int, default=2000,
+            help='Synthetic pages to time fingerprinting on.',
+        )
+        parser.add_argument('--words', type=int, default=800)
+        parser.add_argument('--processes', type=int, default=os.cpu_count())
+        parser.add_argument('--lookups', type=int, default=1000)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--path', default=None,
+            help='Scratch database path (default: temporary file).',
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        self._bench_fingerprinting(rng, options)
+
+        if options['path']:
+            path, cleanup = options['path'], False
+        else:
+            fd, path = tempfile.mkstemp(suffix='.sqlite3')
+            os.close(fd)
+            cleanup = True
+        try:
+            conn = sqlite3.connect(path, isolation_level=None)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
+            conn.execute(FINGERPRINTS_CREATE)
+            for sql in FINGERPRINTS_INDEXES:
+                conn.execute(sql)
+            copies = self._bench_insert(conn, rng, options)
+            self._bench_lookups(conn, rng, options)
+            self._bench_groups(conn, copies)
+            conn.close()
+        finally:
+            if cleanup:
+                for suffix in ('', '-wal', '-shm'):
+                    if os.path.exists(path + suffix):
+                        os.remove(path + suffix)
+
+    def _report(self, label, count, elapsed, unit):
+        self.stdout.write('{0}: {1} {2} in {3:.2f}s ({4:.0f}/s)'.format(
+            label, count, unit, elapsed, count / elapsed if elapsed else 0
+        ))
+
+    def _bench_fingerprinting(self, rng, options):
+        vocab = ['w{0:x}'.format(i) for i in range(50000)]
+        texts = [
+            ' '.join(rng.choices(vocab, k=options['words']))
+            for _ in range(options['texts'])
+        ]
+
+        start = time.perf_counter()
+        _simhashes(texts)
+        elapsed = time.perf_counter() - start
+        self._report('Fingerprint, 1 process', len(texts), elapsed, 'pages')
+        summary = '  1M {0}-word pages: {1:.0f}s on one core'.format(
+            options['words'], elapsed / len(texts) * 1000000
+        )
+
+        processes = options['processes']
+        if processes > 1:
+            size = -(-len(texts) // (processes * 4))
+            with ProcessPoolExecutor(processes) as pool:
+                # Start the workers before timing
+                list(pool.map(_simhashes, [[]] * processes))
+                start = time.perf_counter()
+                list(pool.map(_simhashes, (
+                    texts[i:i + size] for i in range(0, len(texts), size)
+                )))
+                elapsed = time.perf_counter() - start
+            self._report(
+                'Fingerprint, {0} processes'.format(processes),
+                len(texts), elapsed, 'pages',
+            )
+            summary += ', {0:.0f}s with {1}'.format(
+                elapsed / len(texts) * 1000000, processes
+            )
+        self.stdout.write(summary)
+
+    def _flip(self, rng, h):
+        for bit in rng.sample(range(BITS), rng.randint(1, MAX_DISTANCE)):
+            h ^= 1 << bit
+        return h
+
+    def _bench_insert(self, conn, rng, options):
+        total = options['pages']
+        owners = options['owners']
+        batch_size = options['batch_size']
+        # (owner, SimHash) by page ID
+        pages = []
+        # Page IDs of the near-copies, and of their originals
+        copies = set()
+
+        start = time.perf_counter()
+        for offset in range(0, total, batch_size):
+            rows = []
+            for page_id in range(offset, min(offset + batch_size, total)):
+                if pages and rng.random() < options['duplicate_rate']:
+                    original = rng.randrange(len(pages))
+                    owner, h = pages[original]
+                    h = self._flip(rng, h)
+                    copies.update((original, page_id))
+                else:
+                    owner, h = rng.randrange(owners), rng.getrandbits(BITS)
+                pages.append((owner, h))
+                rows.append((page_id, owner, to_signed(h)) + bands(h))
+            conn.execute('BEGIN')
+            conn.executemany(FINGERPRINTS_INSERT, rows)
+            conn.execute('COMMIT')
+        self._report(
+            'Insert', total, time.perf_counter() - start, 'fingerprints'
+        )
+        return copies
+
+    def _bench_lookups(self, conn, rng, options):
+        timings = []
+        candidates = 0
+        for _ in range(options['lookups']):
+            owner, h = conn.execute(
+                'SELECT owner_id, simhash FROM fingerprints '
+                'WHERE page_id = ?', (rng.randrange(options['pages']),)
+            ).fetchone()
+            h = to_unsigned(h)
+            start = time.perf_counter()
+            rows = conn.execute(CANDIDATES, (owner,) + bands(h)).fetchall()
+            [page_id for page_id, other in rows
+             if distance(h, to_unsigned(other)) <= MAX_DISTANCE]
+            timings.append(time.perf_counter() - start)
+            candidates += len(rows)
+        timings.sort()
+        self.stdout.write(
+            'Lookup: median {0:.2f}ms, p95 {1:.2f}ms, {2:.1f} candidates '
+            'per lookup'.format(
+                statistics.median(timings) * 1000,
+                timings[int(len(timings) * 0.95)] * 1000,
+                candidates / len(timings),
+            )
+        )
+
+    def _bench_groups(self, conn, copies):
+        start = time.perf_counter()
+        groups = group_bands(
+            (
+                ((owner, value, page_id, to_unsigned(h))
+                 for owner, value, page_id, h
+                 in conn.execute(BAND_SCAN.format(column)))
+                for column in BAND_COLUMNS
+            ),
+            MAX_DISTANCE,
+        )
+        elapsed = time.perf_counter() - start
+        grouped = set().union(*groups) if groups else set()
+        self.stdout.write(
+            'Groups: {0} group(s), {1} page(s) in {2:.2f}s; {3} of {4} '
+            'planted near-copies found'.format(
+                len(groups), len(grouped), elapsed,
+                len(grouped & copies), len(copies),
+            )
+        )
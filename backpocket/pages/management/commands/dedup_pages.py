@@ -0,0 +1,136 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from backpocket.pages.models import Page, PageFingerprint
+from backpocket.pages.simhash import (
+    MAX_DISTANCE, simhash, make_fingerprint, duplicate_groups
+)
+from backpocket.users.models import User
+
+
+def _simhashes(texts):
+    return [simhash(text) for text in texts]
+
+
+class Command(BaseCommand):
+    help = (
+        'Fingerprints archived pages that have no fingerprint yet, then '
+        'reports groups of near-duplicate pages in each library.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', help='Only this username\'s pages.')
+        parser.add_argument(
+            '--distance', type=int, default=MAX_DISTANCE,
+            help='Most differing bits to count as duplicates (default '
+                 'and maximum {0}).'.format(MAX_DISTANCE),
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='Worker processes for fingerprinting (default 1).',
+        )
+        parser.add_argument(
+            '--refresh', action='store_true',
+            help='Recompute existing fingerprints too.',
+        )
+
+    def handle(self, *args, **options):
+        if not 0 <= options['distance'] <= MAX_DISTANCE:
+            raise CommandError(
+                '--distance must be 0 to {0}'.format(MAX_DISTANCE)
+            )
+        owner_id = None
+        if options['owner']:
+            try:
+                owner_id = User.objects.get(username=options['owner']).pk
+            except User.DoesNotExist:
+                raise CommandError('No such user')
+
+        pages = Page.objects.all()
+        if owner_id is not None:
+            pages = pages.filter(owner_id=owner_id)
+        if not options['refresh']:
+            pages = pages.filter(fingerprint__isnull=True)
+
+        processes = options['processes']
+        pool = ProcessPoolExecutor(processes) if processes > 1 else None
+        try:
+            count, elapsed = self._fingerprint(
+                pages, options['batch_size'], pool, processes,
+                options['refresh'],
+            )
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        self.stdout.write(
+            'Fingerprinted {0} page(s) in {1:.1f}s ({2:.0f} pages/s)'.format(
+                count, elapsed, count / elapsed if elapsed else 0
+            )
+        )
+
+        start = time.perf_counter()
+        groups = duplicate_groups(owner_id, options['distance'])
+        elapsed = time.perf_counter() - start
+
+        for group in groups:
+            rows = (
+                Page.objects.filter(pk__in=group)
+                .order_by('date_archived')
+                .values_list('owner__username', 'link_id', 'url')
+            )
+            self.stdout.write('')
+            for username, link_id, url in rows:
+                self.stdout.write('{0}\t{1}\t{2}'.format(
+                    username, link_id, url
+                ))
+        self.stdout.write(
+            '{0} group(s) of near-duplicates, {1} page(s), found in '
+            '{2:.1f}s'.format(
+                len(groups), sum(len(group) for group in groups), elapsed
+            )
+        )
+
+    def _fingerprint(self, pages, batch_size, pool, processes, refresh):
+        start = time.perf_counter()
+        count = 0
+        last_pk = None
+        while True:
+            batch = pages.order_by('pk')
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            rows = list(
+                batch.values_list('pk', 'owner_id', 'text')[:batch_size]
+            )
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+
+            texts = [text for _, _, text in rows]
+            if pool is None:
+                hashes = _simhashes(texts)
+            else:
+                # One task per worker, to keep pickling overhead down
+                size = -(-len(texts) // processes)
+                hashes = [
+                    h for chunk in pool.map(_simhashes, (
+                        texts[i:i + size]
+                        for i in range(0, len(texts), size)
+                    ))
+                    for h in chunk
+                ]
+
+            fingerprints = [
+                make_fingerprint(pk, owner_id, h)
+                for (pk, owner_id, _), h in zip(rows, hashes)
+                if h is not None
+            ]
+            with transaction.atomic():
+                if refresh:
+                    PageFingerprint.objects.filter(
+                        page_id__in=[pk for pk, _, _ in rows]
+                    ).delete()
+                PageFingerprint.objects.bulk_create(fingerprints)
+            count += len(rows)
+        return count, time.perf_counter() - start
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from backpocket.pages.extract import ExtractionPipeline
+from backpocket.pages.models import Page
+from backpocket.users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Extracts article text from archived HTML for pages that have '
+        'none yet, in a pool of worker processes, and reports throughput '
+        'and per-document latency.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', help='Only this username\'s pages.')
+        parser.add_argument(
+            '--processes', type=int, default=None,
+            help='Worker processes (default PAGE_ARCHIVE setting).',
+        )
+        parser.add_argument(
+            '--queue-depth', type=int, default=None,
+            help='Most documents in flight at once.',
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--refresh', action='store_true',
+            help='Also update pages that already have text.',
+        )
+
+    def handle(self, *args, **options):
+        pages = Page.objects.all()
+        if options['owner']:
+            try:
+                owner = User.objects.get(username=options['owner'])
+            except User.DoesNotExist:
+                raise CommandError('No such user')
+            pages = pages.filter(owner=owner)
+        if not options['refresh']:
+            pages = pages.filter(text='')
+
+        with ExtractionPipeline(
+                processes=options['processes'],
+                queue_depth=options['queue_depth']) as pipeline:
+            stats = pipeline.run(pages, batch_size=options['batch_size'])
+        self.stdout.write(stats.report())
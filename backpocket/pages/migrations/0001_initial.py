@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 14:23
+from __future__ import unicode_literals
+
+import backpocket.utils
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('bp_links', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Page',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, verbose_name='page ID')),
+                ('url', models.URLField(max_length=2048, verbose_name='URL')),
+                ('title', models.CharField(blank=True, max_length=500, verbose_name='title')),
+                ('text', models.TextField(blank=True, verbose_name='text')),
+                ('date_archived', models.DateTimeField(default=backpocket.utils.utcnow, verbose_name='date archived')),
+                ('link', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pages', to='bp_links.Link', verbose_name='link')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pages', to=settings.AUTH_USER_MODEL, verbose_name='owner')),
+            ],
+            options={
+                'verbose_name': 'page',
+                'verbose_name_plural': 'pages',
+                'db_table': 'bp_page',
+                'permissions': (('view_page', 'Can view page'),),
+                'default_related_name': 'pages',
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 15:06
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('bp_pages', '0002_uuid7'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageFingerprint',
+            fields=[
+                ('page', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fingerprint', serialize=False, to='bp_pages.Page', verbose_name='page')),
+                ('simhash', models.BigIntegerField(verbose_name='SimHash')),
+                ('band0', models.IntegerField(verbose_name='band 0')),
+                ('band1', models.IntegerField(verbose_name='band 1')),
+                ('band2', models.IntegerField(verbose_name='band 2')),
+                ('band3', models.IntegerField(verbose_name='band 3')),
+                ('band4', models.IntegerField(verbose_name='band 4')),
+                ('band5', models.IntegerField(verbose_name='band 5')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='owner')),
+            ],
+            options={
+                'verbose_name': 'page fingerprint',
+                'verbose_name_plural': 'page fingerprints',
+                'db_table': 'bp_page_fingerprint',
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='pagefingerprint',
+            index_together=set([('owner', 'band2'), ('owner', 'band5'), ('owner', 'band3'), ('owner', 'band1'), ('owner', 'band4'), ('owner', 'band0')]),
+        ),
+    ]
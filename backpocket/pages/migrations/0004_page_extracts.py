@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 15:13
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bp_pages', '0003_page_fingerprints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageExtract',
+            fields=[
+                ('content_hash', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='content hash')),
+                ('version', models.PositiveSmallIntegerField(verbose_name='extractor version')),
+                ('title', models.CharField(blank=True, max_length=500, verbose_name='title')),
+                ('text', models.TextField(blank=True, verbose_name='text')),
+                ('simhash', models.BigIntegerField(null=True, verbose_name='SimHash')),
+                ('html_bytes', models.PositiveIntegerField(verbose_name='HTML size')),
+                ('seconds', models.FloatField(verbose_name='extraction time')),
+            ],
+            options={
+                'verbose_name': 'page extract',
+                'verbose_name_plural': 'page extracts',
+                'db_table': 'bp_page_extract',
+            },
+        ),
+        migrations.AddField(
+            model_name='page',
+            name='html_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64, verbose_name='HTML hash'),
+        ),
+    ]
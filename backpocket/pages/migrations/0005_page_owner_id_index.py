@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 15:23
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('bp_pages', '0004_page_extracts'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='page',
+            index_together=set([('owner', 'id')]),
+        ),
+    ]
@@ -1,3 +1,157 @@
+from django.conf import settings
 from django.db import models
+from backpocket.owned import (
+    OwnedObjectPermissions, OwnedObjectPermissionFilters
+)
+from backpocket.sharing.models import DELETE
+from backpocket.utils import utcnow, uuid7
 
-# Create your models here.
+
+class PageObjectPermissions(OwnedObjectPermissions):
+
+    def add_page(self, user, obj):
+        return False
+
+    def change_page(self, user, obj):
+        return False
+
+    def delete_page(self, user, obj):
+        return self._is_owner_or_shared(user, obj, DELETE)
+
+    def view_page(self, user, obj):
+        return self._is_admin_owner_or_shared(user, obj)
+
+
+class PageObjectPermissionFilters(OwnedObjectPermissionFilters):
+
+    def view_page(self, user, queryset):
+        return self._admin_all_user_own_or_shared(user, queryset)
+
+
+class PageSearchIndex:
+    """
+    Search document definition for archived pages.
+    """
+    kind = 'page'
+
+    def get_document(self, obj):
+        return {
+            'title': obj.title,
+            'url': obj.url,
+            'body': obj.text,
+        }
+
+
+class Page(models.Model):
+    """
+    Archived snapshot of a link's target page.
+    """
+
+    class Meta:
+        verbose_name = 'page'
+        verbose_name_plural = 'pages'
+        default_related_name = 'pages'
+        db_table = 'bp_page'
+        # Walking a library in key order (export)
+        index_together = (('owner', 'id'),)
+        permissions = (
+            ('view_page', 'Can view page'),
+        )
+
+    ObjectPermissions = PageObjectPermissions()
+
+    ObjectPermissionFilters = PageObjectPermissionFilters()
+
+    SearchIndex = PageSearchIndex()
+
+    id = models.UUIDField(
+        'page ID', primary_key=True, default=uuid7, editable=False
+    )
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        verbose_name='owner',
+    )
+    link = models.ForeignKey(
+        'bp_links.Link',
+        on_delete=models.CASCADE,
+        verbose_name='link',
+    )
+    url = models.URLField('URL', max_length=2048)
+    title = models.CharField('title', max_length=500, blank=True)
+    text = models.TextField('text', blank=True)
+    # Raw HTML in the blob store (see backpocket.pages.blobs), if kept
+    html_hash = models.CharField(
+        'HTML hash', max_length=64, blank=True, db_index=True
+    )
+    date_archived = models.DateTimeField('date archived', default=utcnow)
+
+    def __str__(self):
+        return self.title or self.url
+
+
+class PageExtract(models.Model):
+    """
+    Article text extracted from one HTML blob, so identical documents
+    archived as several pages are extracted once. Version is the
+    extractor's, so a changed extractor redoes old results.
+    """
+
+    class Meta:
+        verbose_name = 'page extract'
+        verbose_name_plural = 'page extracts'
+        db_table = 'bp_page_extract'
+
+    content_hash = models.CharField(
+        'content hash', max_length=64, primary_key=True
+    )
+    version = models.PositiveSmallIntegerField('extractor version')
+    title = models.CharField('title', max_length=500, blank=True)
+    text = models.TextField('text', blank=True)
+    # Signed, as PageFingerprint's; null if the text has no words
+    simhash = models.BigIntegerField('SimHash', null=True)
+    html_bytes = models.PositiveIntegerField('HTML size')
+    seconds = models.FloatField('extraction time')
+
+
+class PageFingerprint(models.Model):
+    """
+    SimHash of a page's text, split into bands for near-duplicate
+    lookup (see backpocket.pages.simhash). Owner is denormalized so
+    lookups within a library need no join.
+    """
+
+    class Meta:
+        verbose_name = 'page fingerprint'
+        verbose_name_plural = 'page fingerprints'
+        db_table = 'bp_page_fingerprint'
+        index_together = (
+            ('owner', 'band0'),
+            ('owner', 'band1'),
+            ('owner', 'band2'),
+            ('owner', 'band3'),
+            ('owner', 'band4'),
+            ('owner', 'band5'),
+        )
+
+    page = models.OneToOneField(
+        Page,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='fingerprint',
+        verbose_name='page',
+    )
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='owner',
+    )
+    # Signed, to fit SQLite's 64-bit integers
+    simhash = models.BigIntegerField('SimHash')
+    band0 = models.IntegerField('band 0')
+    band1 = models.IntegerField('band 1')
+    band2 = models.IntegerField('band 2')
+    band3 = models.IntegerField('band 3')
+    band4 = models.IntegerField('band 4')
+    band5 = models.IntegerField('band 5')
@@ -0,0 +1,15 @@
+from rest_framework import serializers
+from backpocket.pages.models import Page
+
+
+class PageSerializer(serializers.ModelSerializer):
+    """
+    General page model serializer.
+    """
+
+    class Meta:
+        model = Page
+        fields = (
+            'id', 'owner', 'link', 'url', 'title', 'text', 'date_archived',
+        )
+        read_only_fields = fields
@@ -0,0 +1,258 @@
+# Near-duplicate detection for archived pages
+#
+# Each page's text is reduced to a 64-bit SimHash over word 3-shingles:
+# pages sharing most of their text, such as mirrors, syndicated copies
+# and AMP versions, get fingerprints differing in only a few bits. The
+# fingerprint is split into six bands of 10 or 11 bits. Two fingerprints
+# within Hamming distance 5 must agree exactly on at least one band, so
+# candidates come from six indexed equality lookups, and only those are
+# compared bit by bit. A one-word edit to a 400-word page typically
+# moves 2-5 bits, hence six bands rather than the coarser four.
+
+import collections, functools, hashlib, re
+from django.db.models import Q
+from django.db.models.signals import post_save
+from backpocket.pages.models import Page, PageFingerprint
+
+
+BITS = 64
+BANDS = 6
+# Bit offset of each band, and one past the last
+_BAND_EDGES = [i * BITS // BANDS for i in range(BANDS + 1)]
+# Largest distance the banding is guaranteed to find
+MAX_DISTANCE = BANDS - 1
+SHINGLE_WORDS = 3
+
+_MASK = (1 << BITS) - 1
+_WORD_RE = re.compile(r'\w+')
+
+# Per-bit counters are kept as lanes of one big integer, so adding a
+# feature's bits is eight table lookups and additions rather than 64
+_LANE_BITS = 24
+_LANE_MASK = (1 << _LANE_BITS) - 1
+_SPREAD = [
+    [
+        sum(1 << ((8 * byte + bit) * _LANE_BITS)
+            for bit in range(8) if value >> bit & 1)
+        for value in range(256)
+    ]
+    for byte in range(BITS // 8)
+]
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def _word_hash(word):
+    return int.from_bytes(
+        hashlib.blake2b(word.encode(), digest_size=8).digest(), 'little'
+    )
+
+
+def _mix(h):
+    # splitmix64 finalizer: spreads combined word hashes over all bits
+    h = ((h ^ (h >> 30)) * 0xbf58476d1ce4e5b9) & _MASK
+    h = ((h ^ (h >> 27)) * 0x94d049bb133111eb) & _MASK
+    return h ^ (h >> 31)
+
+
+def features(text):
+    '''Returns list of 64-bit hashes of the lowercased word shingles
+    in text, repeats included.
+    '''
+    words = [_word_hash(w) for w in _WORD_RE.findall(text.lower())]
+    if len(words) < SHINGLE_WORDS:
+        return words
+    return [
+        _mix((a * 0x9e3779b97f4a7c15 + b * 0xc2b2ae3d27d4eb4f + c) & _MASK)
+        for a, b, c in zip(words, words[1:], words[2:])
+    ]
+
+
+def simhash(text):
+    '''Returns text's 64-bit SimHash as an unsigned integer, or None
+    if it has no words.
+    '''
+    hashes = features(text)
+    if not hashes:
+        return None
+
+    s0, s1, s2, s3, s4, s5, s6, s7 = _SPREAD
+    lanes = sum(
+        s0[f & 0xff] + s1[f >> 8 & 0xff] + s2[f >> 16 & 0xff] +
+        s3[f >> 24 & 0xff] + s4[f >> 32 & 0xff] + s5[f >> 40 & 0xff] +
+        s6[f >> 48 & 0xff] + s7[f >> 56]
+        for f in hashes
+    )
+
+    # A bit is set if more than half the shingles set it
+    half = len(hashes) / 2
+    result = 0
+    for bit in range(BITS):
+        if (lanes >> (bit * _LANE_BITS) & _LANE_MASK) > half:
+            result |= 1 << bit
+    return result
+
+
+def distance(a, b):
+    return bin((a ^ b) & _MASK).count('1')
+
+
+def to_signed(h):
+    return h - (1 << BITS) if h >> (BITS - 1) else h
+
+
+def to_unsigned(h):
+    return h & _MASK
+
+
+def bands(h):
+    return tuple(
+        h >> start & ((1 << (end - start)) - 1)
+        for start, end in zip(_BAND_EDGES, _BAND_EDGES[1:])
+    )
+
+
+def make_fingerprint(page_id, owner_id, h):
+    '''Returns unsaved PageFingerprint for a page with SimHash h.'''
+    fields = {
+        'band{0}'.format(i): value for i, value in enumerate(bands(h))
+    }
+    return PageFingerprint(
+        page_id=page_id, owner_id=owner_id, simhash=to_signed(h), **fields
+    )
+
+
+def fingerprint_page(page, h=None):
+    '''Computes and stores page's fingerprint, replacing any previous
+    one. Returns it, or None if the page has no text. h, if given, is
+    the text's SimHash, already computed.
+    '''
+    if h is None:
+        h = simhash(page.text)
+    if h is None:
+        PageFingerprint.objects.filter(page_id=page.pk).delete()
+        return None
+    fingerprint = make_fingerprint(page.pk, page.owner_id, h)
+    fingerprint.save()
+    return fingerprint
+
+
+def near_duplicates(owner_id, h, max_distance=MAX_DISTANCE,
+                    exclude_pages=()):
+    '''Returns list of (distance, page ID, link ID) for owner's pages
+    whose fingerprints are within max_distance of SimHash h (unsigned),
+    closest first. Distances above MAX_DISTANCE may be missed.
+    '''
+    band_values = bands(h)
+    candidates = (
+        PageFingerprint.objects
+        .filter(owner_id=owner_id)
+        .filter(functools.reduce(
+            lambda q, i: q | Q(**{'band{0}'.format(i): band_values[i]}),
+            range(1, BANDS), Q(band0=band_values[0])
+        ))
+        .exclude(page_id__in=list(exclude_pages))
+        .values_list('page_id', 'page__link_id', 'simhash')
+    )
+    found = []
+    for page_id, link_id, other in candidates:
+        d = distance(h, to_unsigned(other))
+        if d <= max_distance:
+            found.append((d, page_id, link_id))
+    return sorted(found)
+
+
+def possible_duplicates(link, max_distance=MAX_DISTANCE):
+    '''Returns list of (distance, link ID) for other links in link's
+    owner's library whose pages nearly match link's own archived
+    pages, closest first. Links with nothing archived yet are matched
+    by the owner's most recent archive of the same URL, if any.
+    '''
+    fingerprints = list(
+        PageFingerprint.objects.filter(page__link=link)
+        .values_list('simhash', flat=True)
+    )
+    if not fingerprints:
+        fingerprints = list(
+            PageFingerprint.objects
+            .filter(owner_id=link.owner_id, page__url=link.url)
+            .order_by('-page__date_archived')
+            .values_list('simhash', flat=True)[:1]
+        )
+
+    closest = {}
+    for h in fingerprints:
+        for d, _, link_id in near_duplicates(
+                link.owner_id, to_unsigned(h), max_distance):
+            if link_id != link.pk and d < closest.get(link_id, BITS + 1):
+                closest[link_id] = d
+    return sorted((d, link_id) for link_id, d in closest.items())
+
+
+def group_bands(band_rows, max_distance=MAX_DISTANCE):
+    '''Groups near-duplicates given, for each band, an iterable of
+    (owner ID, band value, page ID, unsigned SimHash) ordered by owner
+    and band value. Returns list of sets of page IDs.
+    '''
+    parent = {}
+
+    def find(page_id):
+        root = page_id
+        while parent.get(root, root) != root:
+            root = parent[root]
+        parent[page_id] = root
+        return root
+
+    for rows in band_rows:
+        run, run_key = [], None
+        for owner, value, page_id, h in rows:
+            if (owner, value) != run_key:
+                run, run_key = [], (owner, value)
+            for other_id, other in run:
+                if distance(h, other) <= max_distance:
+                    parent[find(page_id)] = find(other_id)
+            run.append((page_id, h))
+
+    groups = collections.defaultdict(set)
+    for page_id in list(parent):
+        groups[find(page_id)].add(page_id)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def duplicate_groups(owner_id=None, max_distance=MAX_DISTANCE):
+    '''Finds groups of near-duplicate pages across the whole corpus, or
+    one owner's library. Returns list of sets of page IDs, each with
+    pages owned by one user. Reads each band's index in order once,
+    comparing only pages sharing a band value.
+    '''
+    fingerprints = PageFingerprint.objects.all()
+    if owner_id is not None:
+        fingerprints = fingerprints.filter(owner_id=owner_id)
+
+    def band_rows(band):
+        rows = (
+            fingerprints.order_by('owner_id', band)
+            .values_list('owner_id', band, 'page_id', 'simhash')
+            .iterator()
+        )
+        for owner, value, page_id, h in rows:
+            yield owner, value, page_id, to_unsigned(h)
+
+    return group_bands(
+        (band_rows('band{0}'.format(i)) for i in range(BANDS)),
+        max_distance,
+    )
+
+
+def _handle_page_save(sender, instance, raw=False, update_fields=None,
+                      **kwargs):
+    if raw or (update_fields is not None and 'text' not in update_fields):
+        return
+    # Set by callers that computed it elsewhere, e.g. text extraction;
+    # good for this save only
+    fingerprint_page(instance, instance.__dict__.pop('_simhash', None))
+
+
+def connect_signals():
+    post_save.connect(
+        _handle_page_save, sender=Page, dispatch_uid='bp_pages_simhash'
+    )
@@ -1,3 +1,195 @@
+import io, random, shutil, tempfile
 from django.test import TestCase
+from backpocket.links.models import Link
+from backpocket.pages.blobs import BlobStore
+from backpocket.pages.extract import ExtractionPipeline, extract_stream
+from backpocket.pages.models import Page, PageExtract
+from backpocket.pages.simhash import (
+    MAX_DISTANCE, simhash, distance, duplicate_groups, possible_duplicates
+)
+from backpocket.users.models import User
 
-# Create your tests here.
+
+def _text(seed, words=400):
+    rng = random.Random(seed)
+    return ' '.join(
+        'word{0}'.format(rng.randrange(5000)) for _ in range(words)
+    )
+
+
+def _edit(text, changes, seed=0):
+    rng = random.Random(seed)
+    words = text.split()
+    for _ in range(changes):
+        words[rng.randrange(len(words))] = 'changed'
+    return ' '.join(words)
+
+
+class SimHashTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user', 'pw')
+        cls.other = User.objects.create_user('other', 'pw')
+
+    def _archive(self, owner, url, text):
+        link = Link.objects.create(owner=owner, url=url)
+        Page.objects.create(owner=owner, link=link, url=url, text=text)
+        return link
+
+    def test_distance(self):
+        text = _text(1)
+        self.assertLessEqual(
+            distance(simhash(text), simhash(_edit(text, 1))), MAX_DISTANCE
+        )
+        self.assertGreater(distance(simhash(text), simhash(_text(2))), 10)
+        self.assertIsNone(simhash(''))
+
+    def test_possible_duplicates(self):
+        text = _text(1)
+        original = self._archive(self.user, 'http://example.com/a', text)
+        copy = self._archive(
+            self.user, 'http://mirror.example.com/a', _edit(text, 1)
+        )
+        self._archive(self.user, 'http://example.com/b', _text(2))
+        self._archive(self.other, 'http://example.com/a', text)
+
+        self.assertEqual(
+            [link_id for _, link_id in possible_duplicates(original)],
+            [copy.pk],
+        )
+        # Nothing archived yet: matched by the same URL's latest archive
+        link = Link.objects.create(
+            owner=self.user, url='http://mirror.example.com/a'
+        )
+        self.assertEqual(
+            sorted(link_id for _, link_id in possible_duplicates(link)),
+            sorted([original.pk, copy.pk]),
+        )
+        # Nor by another user's archive of it
+        self._archive(self.other, 'http://example.com/c', text)
+        link = Link.objects.create(owner=self.user, url='http://example.com/c')
+        self.assertEqual(possible_duplicates(link), [])
+
+    def test_duplicate_groups(self):
+        text = _text(1)
+        links = [
+            self._archive(self.user, 'http://example.com/{0}'.format(i),
+                          _edit(text, min(i, 1), seed=i))
+            for i in range(3)
+        ]
+        self._archive(self.user, 'http://example.com/other', _text(2))
+        self._archive(self.other, 'http://example.com/0', text)
+
+        # The two edited copies are grouped through the original
+        groups = duplicate_groups()
+        self.assertEqual(len(groups), 1)
+        self.assertEqual(
+            groups[0],
+            set(Page.objects.filter(link__in=links)
+                .values_list('pk', flat=True)),
+        )
+        self.assertEqual(duplicate_groups(owner_id=self.other.pk), [])
+
+
+ARTICLE_HTML = '''<!DOCTYPE html>
+<html><head><meta charset="windows-1252"><title>An
+  article</title><script>var x = "<p>no</p>";</script></head>
+<body><nav><a href="/">Home</a></nav>
+<article><h1>Heading</h1><p>First paragraph,<br>continued.</p>
+<p>Second &amp; last caf\xe9 paragraph.</p></article>
+<footer>Copyright</footer></body></html>'''.encode('windows-1252')
+
+
+class ExtractionTests(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.store = BlobStore(self.root)
+
+    def test_extract_stream(self):
+        title, text, size = extract_stream(
+            io.BytesIO(ARTICLE_HTML), chunk_size=16
+        )
+        self.assertEqual(title, 'An article')
+        self.assertEqual(text, (
+            'Heading\n\nFirst paragraph,\n\ncontinued.\n\n'
+            'Second & last caf\xe9 paragraph.'
+        ))
+        self.assertEqual(size, len(ARTICLE_HTML))
+
+    def test_pipeline_extracts_each_document_once(self):
+        user = User.objects.create_user('user', 'pw')
+        content_hash = self.store.put(io.BytesIO(ARTICLE_HTML))
+        self.assertEqual(self.store.put(ARTICLE_HTML), content_hash)
+        pages = []
+        for i in range(3):
+            url = 'http://example.com/{0}'.format(i)
+            link = Link.objects.create(owner=user, url=url)
+            pages.append(Page.objects.create(
+                owner=user, link=link, url=url, html_hash=content_hash,
+                title='Kept' if i == 0 else '',
+            ).pk)
+
+        with ExtractionPipeline(1, store=self.store) as pipeline:
+            stats = pipeline.run(Page.objects.filter(pk__in=pages[:2]))
+            self.assertEqual((stats.pages, len(stats.extract_seconds)), (2, 1))
+            stats = pipeline.run(Page.objects.filter(pk=pages[2]))
+            self.assertEqual((stats.pages, stats.cached), (1, 1))
+
+        self.assertEqual(PageExtract.objects.count(), 1)
+        self.assertEqual(
+            list(Page.objects.filter(pk__in=pages).order_by('url')
+                 .values_list('title', flat=True)),
+            ['Kept', 'An article', 'An article'],
+        )
+        self.assertFalse(Page.objects.filter(text='').exists())
+
+    def _pages(self, *contents):
+        user = User.objects.create_user('user', 'pw')
+        pages = []
+        for i, content in enumerate(contents):
+            url = 'http://example.com/{0}'.format(i)
+            link = Link.objects.create(owner=user, url=url)
+            pages.append(Page.objects.create(
+                owner=user, link=link, url=url,
+                html_hash=self.store.put(content),
+            ))
+        return pages
+
+    def test_pipeline_skips_failures(self):
+        # Markup the stdlib parser raises on, rather than recovers from
+        bad, good = self._pages(
+            b'<html><body><p>hi</p><![foo bar]></body></html>', ARTICLE_HTML
+        )
+        with ExtractionPipeline(1, store=self.store, save_batch=1) as p:
+            with self.assertLogs('backpocket.pages', 'WARNING') as logs:
+                stats = p.run(Page.objects.all())
+        self.assertEqual((stats.pages, stats.failed), (2, 1))
+        self.assertIn(bad.html_hash, logs.output[0])
+        self.assertEqual(Page.objects.get(pk=good.pk).title, 'An article')
+        self.assertEqual(Page.objects.get(pk=bad.pk).text, '')
+
+    def test_pipeline_reuses_unsaved_extracts(self):
+        # With one document in flight, the first is collected (but not
+        # saved) before the third page, sharing its hash, comes up
+        other = ARTICLE_HTML.replace(b'Heading', b'Other heading')
+        pages = self._pages(ARTICLE_HTML, other, ARTICLE_HTML)
+        with ExtractionPipeline(1, queue_depth=1, store=self.store) as p:
+            stats = p.run(Page.objects.all(), batch_size=1)
+        self.assertEqual(len(stats.extract_seconds), 2)
+        self.assertEqual(PageExtract.objects.count(), 2)
+        self.assertEqual(
+            Page.objects.get(pk=pages[2].pk).title, 'An article'
+        )
+
+    def test_pipeline_reuses_saved_extracts(self):
+        # As above, but saved in the meantime
+        other = ARTICLE_HTML.replace(b'Heading', b'Other heading')
+        pages = self._pages(ARTICLE_HTML, other, ARTICLE_HTML)
+        with ExtractionPipeline(
+                1, queue_depth=1, store=self.store, save_batch=1) as p:
+            stats = p.run(Page.objects.all(), batch_size=3)
+        self.assertEqual(len(stats.extract_seconds), 2)
+        self.assertEqual(PageExtract.objects.count(), 2)
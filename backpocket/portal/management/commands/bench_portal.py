@@ -0,0 +1,79 @@
+import statistics, time
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from backpocket.links.models import Link
+from backpocket.lists.models import List, ListItem
+from backpocket.portal.views import ListDetailView
+from backpocket.users.models import User
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures list page render time with a cold and warm fragment '
+        'cache. Benchmark data is created in a rolled-back transaction.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options['items'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _render(self, view, request, pk):
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request, pk=pk)
+            response.render()
+        return time.perf_counter() - start, len(queries), len(response.content)
+
+    def _run(self, count, repeat):
+        user = User.objects.create_user(
+            'bench-portal', commit=False, email='bench@example.com'
+        )
+        user.save()
+        # Bulk inserts skip signals, which are irrelevant to rendering
+        links = [
+            Link(owner=user, url='https://example.com/{0}'.format(i),
+                 title='Article number {0}'.format(i))
+            for i in range(count)
+        ]
+        Link.objects.bulk_create(links, batch_size=500)
+        lst = List.objects.create(owner=user, name='Benchmark')
+        ListItem.objects.bulk_create(
+            (ListItem(list=lst, link=link, position=i)
+             for i, link in enumerate(links)),
+            batch_size=500,
+        )
+
+        view = ListDetailView.as_view()
+        request = RequestFactory().get('/lists/{0}/'.format(lst.pk))
+        request.user = user
+
+        cold = []
+        for _ in range(repeat):
+            cache.clear()
+            cold.append(self._render(view, request, lst.pk))
+        warm = [self._render(view, request, lst.pk) for _ in range(repeat)]
+
+        for label, runs in (('cold', cold), ('warm', warm)):
+            self.stdout.write(
+                '{0}: {1} items, median {2:.2f}ms, {3} queries, '
+                '{4} bytes'.format(
+                    label, count,
+                    statistics.median(run[0] for run in runs) * 1000,
+                    runs[-1][1], runs[-1][2],
+                )
+            )
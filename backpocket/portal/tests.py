@@ -1,3 +1,128 @@
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from backpocket.links.models import Link
+from backpocket.links.tags import add_tags, remove_tags
+from backpocket.lists.models import List, ListItem
+from backpocket.sharing.access import grant
+from backpocket.sharing.models import VIEW
+from backpocket.users.models import User
 
-# Create your tests here.
+
+class PortalTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', 'pw')
+        cls.other = User.objects.create_user('bob', 'pw')
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.list = List.objects.create(owner=self.user, name='Reading')
+        self.first = Link.objects.create(
+            owner=self.user, url='http://example.com/first', title='First'
+        )
+        self.second = Link.objects.create(
+            owner=self.user, url='http://example.com/second'
+        )
+        ListItem.objects.create(list=self.list, link=self.first, position=1)
+        add_tags(self.first, ['news'])
+        self.url = reverse('portal:list-detail', args=[self.list.pk])
+        self.client.force_login(self.user)
+
+    def get(self, url=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url or self.url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_list_index(self):
+        List.objects.create(owner=self.other, name='Elsewhere')
+        response, _ = self.get(reverse('portal:list-index'))
+        self.assertContains(response, 'Reading')
+        self.assertContains(response, self.url)
+        self.assertNotContains(response, 'Elsewhere')
+
+    def test_list_detail(self):
+        response, _ = self.get()
+        self.assertContains(response, 'First')
+        self.assertContains(response, '<span class="tag">news</span>')
+        self.assertNotContains(response, 'http://example.com/second')
+
+    def test_login_required(self):
+        self.client.logout()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_not_visible(self):
+        self.client.force_login(self.other)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 404)
+
+    def test_malformed_pk(self):
+        for pk in ('abc', '---', str(self.list.pk)[:-1]):
+            response = self.client.get('/lists/{0}/'.format(pk))
+            self.assertEqual(response.status_code, 404)
+
+    def test_cached_fragment(self):
+        _, cold = self.get()
+        response, warm = self.get()
+        self.assertContains(response, 'First')
+        # Items and tags are only queried on a miss
+        self.assertEqual(cold - warm, 2)
+
+        # Changes behind the cache's back aren't seen
+        Link.objects.filter(pk=self.first.pk).update(title='Hidden')
+        response, _ = self.get()
+        self.assertNotContains(response, 'Hidden')
+
+    def test_item_added_and_removed(self):
+        self.get()
+        item = ListItem.objects.create(
+            list=self.list, link=self.second, position=2
+        )
+        response, _ = self.get()
+        self.assertContains(response, 'http://example.com/second')
+
+        item.delete()
+        response, _ = self.get()
+        self.assertNotContains(response, 'http://example.com/second')
+
+    def test_link_changed(self):
+        self.get()
+        self.first.title = 'Renamed'
+        self.first.save()
+        response, _ = self.get()
+        self.assertContains(response, 'Renamed')
+
+    def test_tags_changed(self):
+        self.get()
+        add_tags(self.first, ['later'])
+        response, _ = self.get()
+        self.assertContains(response, '<span class="tag">later</span>')
+
+        remove_tags(self.first, ['news'])
+        response, _ = self.get()
+        self.assertNotContains(response, '<span class="tag">news</span>')
+
+    def test_unlisted_link_changed(self):
+        before = List.objects.get(pk=self.list.pk).date_modified
+        self.second.title = 'Renamed'
+        self.second.save()
+        add_tags(self.second, ['news'])
+        self.assertEqual(
+            List.objects.get(pk=self.list.pk).date_modified, before
+        )
+
+    def test_per_user(self):
+        grant(self.list, VIEW, user=self.other)
+        _, cold = self.get()
+        self.client.force_login(self.other)
+        # Another user's rendering isn't reused
+        response, other_cold = self.get()
+        self.assertContains(response, 'First')
+        _, other_warm = self.get()
+        self.assertEqual(other_cold - other_warm, 2)
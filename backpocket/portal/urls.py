@@ -0,0 +1,32 @@
+from django.conf.urls import url
+from django.contrib.auth import views as auth_views
+from django.urls import reverse_lazy
+from backpocket.portal import views
+
+app_name = 'portal'
+
+urlpatterns = [
+    url(r'^$', views.ListIndexView.as_view(), name='list-index'),
+    url(
+        r'^lists/(?P<pk>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-'
+        r'[0-9a-f]{12})/$',
+        views.ListDetailView.as_view(),
+        name='list-detail'
+    ),
+    url(
+        r'^reset/(?P<uidb64>[0-9A-Za-z_\-]+)/'
+        r'(?P<token>[0-9A-Za-z]{1,13}-[0-9A-Za-z]{1,20})/$',
+        auth_views.PasswordResetConfirmView.as_view(
+            template_name='portal/password_reset_confirm.html',
+            success_url=reverse_lazy('portal:password-reset-complete'),
+        ),
+        name='password-reset-confirm'
+    ),
+    url(
+        r'^reset/done/$',
+        auth_views.PasswordResetCompleteView.as_view(
+            template_name='portal/password_reset_complete.html',
+        ),
+        name='password-reset-complete'
+    ),
+]
@@ -1,3 +1,86 @@
-from django.shortcuts import render
+import collections
+from django.conf import settings
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import Http404
+from django.views.generic import TemplateView
+from obj_perms.filters import filter_queryset
+from backpocket.links.models import LinkTag
+from backpocket.lists.models import List, ListItem
 
-# Create your views here.
+
+class ListItemRows:
+    """
+    Lazy iterable of display rows for a list's items. Queries run on
+    first iteration only, so a cached fragment never touches them.
+    Plain rows rather than model instances keep large lists cheap.
+    """
+
+    def __init__(self, lst):
+        self.list = lst
+
+    def __iter__(self):
+        items = ListItem.objects.filter(list=self.list)
+        tags = collections.defaultdict(list)
+        for link_id, name in (
+                LinkTag.objects
+                .filter(link_id__in=items.values('link_id'))
+                .order_by('tag__name')
+                .values_list('link_id', 'tag__name')):
+            tags[link_id].append(name)
+
+        for link_id, url, title in (
+                items.order_by('position')
+                .values_list('link_id', 'link__url', 'link__title')):
+            yield {
+                'url': url,
+                'title': title,
+                'tags': tags.get(link_id, ()),
+            }
+
+
+class PortalMixin(LoginRequiredMixin):
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['cache_timeout'] = getattr(
+            settings, 'PORTAL_CACHE_TIMEOUT', 3600
+        )
+        return context
+
+
+class ListIndexView(PortalMixin, TemplateView):
+    """
+    The requesting user's reading lists.
+    """
+    template_name = 'portal/list_index.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        user = self.request.user
+        context['lists'] = filter_queryset(
+            user, 'bp_lists.view_list', List.objects.filter(owner=user)
+        ).order_by('name')
+        return context
+
+
+class ListDetailView(PortalMixin, TemplateView):
+    """
+    A single reading list. Items are rendered inside a cached
+    fragment keyed by the list's modification time, so the items
+    query only runs when the list (or one of its links) changes.
+    """
+    template_name = 'portal/list_detail.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        lists = filter_queryset(
+            self.request.user, 'bp_lists.view_list', List.objects.all()
+        )
+        try:
+            lst = lists.get(pk=kwargs['pk'])
+        except List.DoesNotExist:
+            raise Http404
+
+        context['list'] = lst
+        context['items'] = ListItemRows(lst)
+        return context
@@ -0,0 +1,166 @@
+"""
+Repeated-query (N+1) detection.
+
+QueryAnalyzer records each executed statement under a fingerprint,
+its SQL with literals and IN lists normalized away, along with where
+in project code it came from. Statements repeated more than a
+threshold within one request usually mean a per-row query that
+should be a join, prefetch or annotation.
+
+QueryAnalysisMiddleware logs those per request, for staging;
+assert_query_budget() in backpocket.testing uses the same analyzer
+to lock in query counts in tests.
+"""
+import collections, functools, logging, os, re, traceback
+
+from django.conf import settings
+from django.db.backends.utils import CursorWrapper
+from backpocket.timing import wrap_cursors
+
+
+logger = logging.getLogger('backpocket.queries')
+
+
+def _setting(name, default):
+    return getattr(settings, 'QUERY_ANALYSIS', {}).get(name, default)
+
+
+_FINGERPRINT_SUBS = (
+    # Quoted strings, then numbers (not inside identifiers)
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    # Any length of IN list, including subquery-free literal lists
+    (re.compile(r'\bIN \((?:\?, )*\?\)', re.IGNORECASE), 'IN (...)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+
+def fingerprint(sql):
+    '''Normalizes SQL so statements differing only in parameters
+    compare equal.
+    '''
+    for pattern, replacement in _FINGERPRINT_SUBS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Cursor wrapping machinery, not where queries come from
+_SKIP_FILES = {
+    os.path.join(_PROJECT_ROOT, 'backpocket', name)
+    for name in ('queries.py', 'timing.py')
+}
+
+
+def project_stack(limit=None):
+    '''Returns the current stack as (file, line, function) tuples,
+    innermost last, keeping only project frames.
+    '''
+    limit = limit or _setting('STACK_DEPTH', 8)
+    frames = [
+        (os.path.relpath(frame.filename, _PROJECT_ROOT),
+         frame.lineno, frame.name)
+        for frame in traceback.extract_stack()
+        if frame.filename.startswith(_PROJECT_ROOT) and
+        'site-packages' not in frame.filename and
+        os.path.abspath(frame.filename) not in _SKIP_FILES
+    ]
+    return frames[-limit:]
+
+
+Repeat = collections.namedtuple('Repeat', ('fingerprint', 'count', 'stack'))
+
+
+class QueryAnalyzer:
+    """
+    Collects executed statements grouped by fingerprint.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.groups = collections.OrderedDict()
+
+    def record(self, sql):
+        self.count += 1
+        key = fingerprint(sql)
+        group = self.groups.get(key)
+        if group is None:
+            self.groups[key] = [1, project_stack()]
+        else:
+            group[0] += 1
+
+    def repeated(self, threshold=None):
+        '''Returns Repeat tuples for fingerprints executed more than
+        threshold times, most repeated first, each with the stack of
+        its first execution.
+        '''
+        if threshold is None:
+            threshold = _setting('THRESHOLD', 3)
+        repeats = [
+            Repeat(key, count, stack)
+            for key, (count, stack) in self.groups.items()
+            if count > threshold
+        ]
+        return sorted(repeats, key=lambda r: -r.count)
+
+    def report(self, threshold=None):
+        lines = []
+        for repeat in self.repeated(threshold):
+            lines.append('{0}x {1}'.format(repeat.count, repeat.fingerprint))
+            lines.extend(
+                '    {0}:{1} in {2}'.format(*frame) for frame in repeat.stack
+            )
+        return '\n'.join(lines)
+
+    def capture(self):
+        '''Context manager recording statements executed within it.'''
+        return wrap_cursors(functools.partial(
+            AnalyzingCursorWrapper, analyzer=self
+        ))
+
+
+class AnalyzingCursorWrapper(CursorWrapper):
+    """
+    Cursor wrapper recording statements into a QueryAnalyzer.
+    """
+
+    def __init__(self, cursor, db, analyzer):
+        super().__init__(cursor, db)
+        self.analyzer = analyzer
+
+    def execute(self, sql, params=None):
+        self.analyzer.record(sql)
+        return super().execute(sql, params)
+
+    def executemany(self, sql, param_list):
+        self.analyzer.record(sql)
+        return super().executemany(sql, param_list)
+
+
+class QueryAnalysisMiddleware:
+    """
+    Logs statements repeated more than QUERY_ANALYSIS['THRESHOLD']
+    times in one request, with where they came from.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = _setting('ENABLED', False)
+        self.threshold = _setting('THRESHOLD', 3)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        analyzer = QueryAnalyzer()
+        with analyzer.capture():
+            response = self.get_response(request)
+
+        if analyzer.repeated(self.threshold):
+            logger.warning(
+                'Repeated queries in %s %s (%d total):\n%s',
+                request.method, request.path, analyzer.count,
+                analyzer.report(self.threshold)
+            )
+        return response
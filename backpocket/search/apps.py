@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class SearchConfig(AppConfig):
+    name = 'backpocket.search'
+    label = 'bp_search'
+    verbose_name = 'Full-Text Search'
+
+    def ready(self):
+        from backpocket.search.index import connect_signals
+        connect_signals()
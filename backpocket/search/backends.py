@@ -0,0 +1,229 @@
+# Full-text search backends
+#
+# A backend stores one document (title, url, body) per SearchEntry,
+# keyed by the entry's id, and answers ranked queries restricted to
+# a queryset of permitted entries.
+
+import base64, collections, html, re
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, DEFAULT_DB_ALIAS
+
+
+SearchResult = collections.namedtuple(
+    'SearchResult', ('entry_id', 'kind', 'object_id', 'score', 'snippet')
+)
+
+
+def encode_cursor(score, entry_id):
+    raw = '{0!r}:{1}'.format(score, entry_id).encode('ascii')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    '''Returns (score, entry_id) tuple from an opaque cursor string.
+    Raises ValueError if cursor is malformed.
+    '''
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii'))
+        score, entry_id = raw.decode('ascii').split(':', 1)
+        return float(score), int(entry_id)
+    except (TypeError, UnicodeError, base64.binascii.Error) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+class BaseSearchBackend:
+    """
+    Interface for search backends. A PostgreSQL backend would keep a
+    tsvector column keyed the same way and implement these methods.
+    """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+
+    @property
+    def connection(self):
+        return connections[self.using]
+
+    def create_index(self, schema_editor):
+        raise NotImplementedError
+
+    def drop_index(self, schema_editor):
+        raise NotImplementedError
+
+    def index_document(self, entry_id, document):
+        raise NotImplementedError
+
+    def remove_document(self, entry_id):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def search(self, terms, entries, limit=20, after=None):
+        """
+        Return up to limit SearchResults matching terms, restricted to
+        the given SearchEntry queryset, best match first. If after is
+        a (score, entry_id) tuple, return results following it.
+        """
+        raise NotImplementedError
+
+
+# SQLite FTS5 statements, shared with the benchmark command
+FTS_TABLE = 'bp_search_fts'
+
+FTS_CREATE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+    "title, url, body, tokenize = 'unicode61 remove_diacritics 2')"
+).format(table=FTS_TABLE)
+
+FTS_DROP = 'DROP TABLE IF EXISTS {table}'.format(table=FTS_TABLE)
+
+FTS_DELETE = 'DELETE FROM {table} WHERE rowid = %s'.format(table=FTS_TABLE)
+
+FTS_INSERT = (
+    'INSERT INTO {table} (rowid, title, url, body) VALUES (%s, %s, %s, %s)'
+).format(table=FTS_TABLE)
+
+# Column weights for title, url and body respectively
+FTS_RANK = 'bm25({table}, 10.0, 2.0, 1.0)'.format(table=FTS_TABLE)
+
+FTS_SEARCH = (
+    'SELECT e.id, e.kind, e.object_id, m.score FROM ('
+    'SELECT rowid AS rid, {rank} AS score FROM {table} '
+    'WHERE {table} MATCH %s'
+    ') AS m INNER JOIN {entries} AS e ON e.id = m.rid '
+    'WHERE e.id IN ({permitted}){after} '
+    'ORDER BY m.score, e.id LIMIT %s'
+)
+
+FTS_AFTER = ' AND (m.score > %s OR (m.score = %s AND e.id > %s))'
+
+# Matches are delimited by control characters rather than markup, as
+# the indexed text is raw; render_snippet() escapes it and marks them
+SNIPPET_START, SNIPPET_END = '\x02', '\x03'
+
+FTS_SNIPPETS = (
+    "SELECT rowid, snippet({table}, -1, char(2), char(3), '…', 16) "
+    'FROM {table} WHERE {table} MATCH %s AND rowid IN ({rowids})'
+)
+
+_MARKERS_RE = re.compile('[{0}{1}]'.format(SNIPPET_START, SNIPPET_END))
+
+
+def clean_text(text):
+    '''Removes snippet delimiters from text to be indexed.'''
+    return _MARKERS_RE.sub('', text or '')
+
+
+def render_snippet(snippet):
+    '''Returns an FTS snippet as HTML: the text escaped, with matches
+    wrapped in <mark> elements.
+    '''
+    return (
+        html.escape(snippet)
+        .replace(SNIPPET_START, '<mark>')
+        .replace(SNIPPET_END, '</mark>')
+    )
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_query(terms):
+    '''Converts free-form user input into an FTS5 query string.
+    Each word is quoted (so FTS5 syntax characters are inert), and
+    the final word is treated as a prefix. Returns None if no words.
+    '''
+    words = _TERM_RE.findall(terms)
+    if not words:
+        return None
+    quoted = ['"{0}"'.format(word) for word in words]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """
+    Search backend using an SQLite FTS5 virtual table.
+    """
+
+    def create_index(self, schema_editor):
+        schema_editor.execute(FTS_CREATE)
+
+    def drop_index(self, schema_editor):
+        schema_editor.execute(FTS_DROP)
+
+    def index_document(self, entry_id, document):
+        with self.connection.cursor() as cursor:
+            cursor.execute(FTS_DELETE, [entry_id])
+            cursor.execute(FTS_INSERT, [
+                entry_id,
+                clean_text(document.get('title')),
+                clean_text(document.get('url')),
+                clean_text(document.get('body')),
+            ])
+
+    def remove_document(self, entry_id):
+        with self.connection.cursor() as cursor:
+            cursor.execute(FTS_DELETE, [entry_id])
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {0}'.format(FTS_TABLE))
+
+    def search(self, terms, entries, limit=20, after=None):
+        match = fts_query(terms)
+        if match is None:
+            return []
+
+        # Permission-filtered entries become a subquery, so filtering
+        # happens inside the ranked query rather than after it
+        try:
+            permitted, permitted_params = (
+                entries.values('id').query.sql_with_params()
+            )
+        except EmptyResultSet:
+            return []
+        params = [match, *permitted_params]
+        after_sql = ''
+        if after is not None:
+            score, entry_id = after
+            after_sql = FTS_AFTER
+            params.extend((score, score, entry_id))
+        params.append(limit)
+
+        sql = FTS_SEARCH.format(
+            rank=FTS_RANK,
+            table=FTS_TABLE,
+            entries=entries.model._meta.db_table,
+            permitted=permitted,
+            after=after_sql,
+        )
+
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+
+            # Only build snippets for the page actually returned
+            snippets = {}
+            if rows:
+                rowids = ', '.join(['%s'] * len(rows))
+                cursor.execute(
+                    FTS_SNIPPETS.format(table=FTS_TABLE, rowids=rowids),
+                    [match, *(row[0] for row in rows)]
+                )
+                snippets = {
+                    rowid: render_snippet(snippet)
+                    for rowid, snippet in cursor.fetchall()
+                }
+
+        object_id_field = entries.model._meta.get_field('object_id')
+        return [
+            SearchResult(
+                entry_id=entry_id,
+                kind=kind,
+                object_id=object_id_field.to_python(object_id),
+                score=score,
+                snippet=snippets.get(entry_id, ''),
+            )
+            for entry_id, kind, object_id, score in rows
+        ]
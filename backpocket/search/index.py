@@ -0,0 +1,118 @@
+# Search index maintenance and querying
+#
+# Models opt in by defining a 'SearchIndex' attribute with a 'kind'
+# string and a 'get_document(obj)' method, in the same manner as
+# 'ObjectPermissions' and 'ObjectPermissionFilters'.
+
+import functools
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete
+from django.utils.module_loading import import_string
+from obj_perms.filters import filter_queryset
+from backpocket.search.models import SearchEntry
+
+
+DEFAULT_ATTR = 'SearchIndex'
+
+DEFAULT_BACKEND = 'backpocket.search.backends.SQLiteSearchBackend'
+
+
+@functools.lru_cache(maxsize=None)
+def get_backend(using=DEFAULT_DB_ALIAS):
+    backend_cls = import_string(
+        getattr(settings, 'SEARCH_BACKEND', DEFAULT_BACKEND)
+    )
+    return backend_cls(using=using)
+
+
+def indexed_models():
+    '''Returns {kind: model} for all models with a SearchIndex.'''
+    return {
+        model.SearchIndex.kind: model
+        for model in apps.get_models()
+        if hasattr(model, DEFAULT_ATTR)
+    }
+
+
+def index_object(obj, using=DEFAULT_DB_ALIAS):
+    index = getattr(obj, DEFAULT_ATTR)
+    entry, created = SearchEntry.objects.using(using).get_or_create(
+        kind=index.kind,
+        object_id=obj.pk,
+        defaults={'owner_id': obj.owner_id},
+    )
+    if not created and entry.owner_id != obj.owner_id:
+        entry.owner_id = obj.owner_id
+        entry.save(update_fields=['owner'])
+
+    get_backend(using).index_document(entry.id, index.get_document(obj))
+    return entry
+
+
+def unindex_object(obj, using=DEFAULT_DB_ALIAS):
+    index = getattr(obj, DEFAULT_ATTR)
+    entries = SearchEntry.objects.using(using).filter(
+        kind=index.kind, object_id=obj.pk
+    )
+    backend = get_backend(using)
+    for entry_id in entries.values_list('id', flat=True):
+        backend.remove_document(entry_id)
+    entries.delete()
+
+
+def _handle_save(sender, instance, raw=False, using=DEFAULT_DB_ALIAS,
+                 **kwargs):
+    # Skip fixture loading, objects are indexed on rebuild instead
+    if not raw:
+        index_object(instance, using=using)
+
+
+def _handle_delete(sender, instance, using=DEFAULT_DB_ALIAS, **kwargs):
+    unindex_object(instance, using=using)
+
+
+def connect_signals():
+    for model in indexed_models().values():
+        post_save.connect(
+            _handle_save, sender=model, dispatch_uid='bp_search_save'
+        )
+        post_delete.connect(
+            _handle_delete, sender=model, dispatch_uid='bp_search_delete'
+        )
+
+
+def permitted_entries(user, kinds=None, owner=None):
+    '''Returns SearchEntry queryset limited to objects the user may view,
+    using each model's ObjectPermissionFilters. Defaults to the user's
+    own library; pass owner explicitly to search another user's.
+    '''
+    owner = user if owner is None else owner
+    models = indexed_models()
+    condition = Q()
+
+    for kind, model in models.items():
+        if kinds is not None and kind not in kinds:
+            continue
+        perm = '{0}.view_{1}'.format(
+            model._meta.app_label, model._meta.model_name
+        )
+        visible = filter_queryset(
+            user, perm, model._default_manager.filter(owner=owner)
+        )
+        condition |= Q(kind=kind, object_id__in=visible.values('pk'))
+
+    if not condition:
+        return SearchEntry.objects.none()
+
+    return SearchEntry.objects.filter(condition, owner=owner)
+
+
+def search(user, terms, kinds=None, owner=None, limit=20, after=None,
+           using=DEFAULT_DB_ALIAS):
+    entries = permitted_entries(user, kinds=kinds, owner=owner)
+    return get_backend(using).search(
+        terms, entries.using(using), limit=limit, after=after
+    )
@@ -0,0 +1,161 @@
+import itertools, os, random, sqlite3, statistics, tempfile, time
+from django.core.management.base import BaseCommand
+from backpocket.search.backends import (
+    FTS_CREATE, FTS_INSERT, FTS_RANK, FTS_SEARCH, FTS_AFTER, FTS_SNIPPETS,
+    FTS_TABLE, fts_query,
+)
+
+
+# Raw sqlite3 uses qmark placeholders
+def _qmark(sql):
+    return sql.replace('%s', '?')
+
+
+ENTRIES_CREATE = (
+    'CREATE TABLE entries ('
+    'id INTEGER PRIMARY KEY, kind TEXT, object_id TEXT, owner_id INTEGER)'
+)
+ENTRIES_INDEX = 'CREATE INDEX entries_owner ON entries (owner_id, kind)'
+ENTRIES_INSERT = 'INSERT INTO entries VALUES (?, ?, ?, ?)'
+PERMITTED = 'SELECT id FROM entries WHERE owner_id = ?'
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks the SQLite FTS5 search backend against a synthetic '
+        'corpus in a scratch database (does not touch project data).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type=int, default=1000000)
+        parser.add_argument('--owners', type=int, default=1000)
+        parser.add_argument('--vocabulary', type=int, default=50000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--path', default=None,
+            help='Scratch database path (default: temporary file).',
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        vocab = ['w{0:x}'.format(i) for i in range(options['vocabulary'])]
+        # Zipf-like weights so some terms are common and most are rare
+        cum_weights = list(itertools.accumulate(
+            1.0 / (rank + 1) for rank in range(len(vocab))
+        ))
+
+        def words(count):
+            return ' '.join(
+                rng.choices(vocab, cum_weights=cum_weights, k=count)
+            )
+
+        if options['path']:
+            path, cleanup = options['path'], False
+        else:
+            fd, path = tempfile.mkstemp(suffix='.sqlite3')
+            os.close(fd)
+            cleanup = True
+
+        try:
+            conn = sqlite3.connect(path, isolation_level=None)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
+            conn.execute(ENTRIES_CREATE)
+            conn.execute(ENTRIES_INDEX)
+            conn.execute(FTS_CREATE)
+
+            total = options['documents']
+            batch_size = options['batch_size']
+            owners = options['owners']
+            insert_doc = _qmark(FTS_INSERT)
+
+            start = time.perf_counter()
+            for offset in range(0, total, batch_size):
+                conn.execute('BEGIN')
+                for rowid in range(offset + 1,
+                                   min(offset + batch_size, total) + 1):
+                    kind = 'page' if rowid % 4 == 0 else 'link'
+                    conn.execute(ENTRIES_INSERT, (
+                        rowid, kind, '{0:032x}'.format(rowid),
+                        rng.randrange(owners),
+                    ))
+                    body_len = 400 if kind == 'page' else 20
+                    conn.execute(insert_doc, (
+                        rowid, words(8),
+                        'https://example.com/{0}'.format(rowid),
+                        words(body_len),
+                    ))
+                conn.execute('COMMIT')
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                'Indexed {0} documents in {1:.1f}s ({2:.0f} docs/s)'.format(
+                    total, elapsed, total / elapsed if elapsed else 0
+                )
+            )
+
+            conn.execute(
+                "INSERT INTO {0}({0}) VALUES ('optimize')".format(FTS_TABLE)
+            )
+
+            search = _qmark(FTS_SEARCH.format(
+                rank=FTS_RANK, table=FTS_TABLE, entries='entries',
+                permitted=PERMITTED, after='',
+            ))
+            search_after = _qmark(FTS_SEARCH.format(
+                rank=FTS_RANK, table=FTS_TABLE, entries='entries',
+                permitted=PERMITTED, after=FTS_AFTER,
+            ))
+
+            first_page, next_page = [], []
+            for _ in range(options['queries']):
+                # Mid-frequency terms, the realistic worst case
+                terms = ' '.join(rng.choices(vocab[10:2000], k=2))
+                match = fts_query(terms)
+                owner = rng.randrange(owners)
+
+                start = time.perf_counter()
+                rows = conn.execute(search, (match, owner, 20)).fetchall()
+                if rows:
+                    rowids = ', '.join('?' * len(rows))
+                    conn.execute(
+                        _qmark(FTS_SNIPPETS.format(
+                            table=FTS_TABLE, rowids=rowids
+                        )),
+                        [match, *(row[0] for row in rows)]
+                    ).fetchall()
+                first_page.append(time.perf_counter() - start)
+
+                if len(rows) == 20:
+                    last_id, last_score = rows[-1][0], rows[-1][3]
+                    start = time.perf_counter()
+                    conn.execute(search_after, (
+                        match, owner, last_score, last_score, last_id, 20
+                    )).fetchall()
+                    next_page.append(time.perf_counter() - start)
+
+            self._report('first page', first_page)
+            self._report('next page', next_page)
+            conn.close()
+
+        finally:
+            if cleanup:
+                for suffix in ('', '-wal', '-shm'):
+                    try:
+                        os.remove(path + suffix)
+                    except FileNotFoundError:
+                        pass
+
+    def _report(self, label, timings):
+        if not timings:
+            self.stdout.write('{0}: no samples'.format(label))
+            return
+        timings = sorted(timings)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            '{0}: n={1} median={2:.2f}ms p95={3:.2f}ms'.format(
+                label, len(timings),
+                statistics.median(timings) * 1000, p95 * 1000,
+            )
+        )
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction, DEFAULT_DB_ALIAS
+from backpocket.search.index import (
+    get_backend, index_object, indexed_models
+)
+from backpocket.search.models import SearchEntry
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index from scratch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Database alias to rebuild (default "default").',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Objects indexed per transaction (default 1000).',
+        )
+
+    def handle(self, *args, **options):
+        using = options['database']
+        batch_size = options['batch_size']
+
+        with transaction.atomic(using=using):
+            get_backend(using).clear()
+            SearchEntry.objects.using(using).all().delete()
+
+        for kind, model in indexed_models().items():
+            count = 0
+            queryset = model._default_manager.using(using).order_by('pk')
+            objects = queryset.iterator()
+            done = False
+            while not done:
+                with transaction.atomic(using=using):
+                    for _ in range(batch_size):
+                        obj = next(objects, None)
+                        if obj is None:
+                            done = True
+                            break
+                        index_object(obj, using=using)
+                        count += 1
+            self.stdout.write('Indexed {0} {1}(s)'.format(count, kind))
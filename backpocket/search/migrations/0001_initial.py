@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 14:23
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_index(apps, schema_editor):
+    from backpocket.search.index import get_backend
+    get_backend(schema_editor.connection.alias).create_index(schema_editor)
+
+
+def drop_index(apps, schema_editor):
+    from backpocket.search.index import get_backend
+    get_backend(schema_editor.connection.alias).drop_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=16, verbose_name='kind')),
+                ('object_id', models.UUIDField(verbose_name='object ID')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='owner')),
+            ],
+            options={
+                'verbose_name': 'search entry',
+                'verbose_name_plural': 'search entries',
+                'db_table': 'bp_search_entry',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='searchentry',
+            unique_together=set([('kind', 'object_id')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='searchentry',
+            index_together=set([('owner', 'kind')]),
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.db import models
+
+
+class SearchEntry(models.Model):
+    """
+    Maps a searchable object to its row in the full-text index.
+    The entry's integer id doubles as the index rowid, so updates
+    and deletes never have to scan the index itself.
+    """
+
+    class Meta:
+        verbose_name = 'search entry'
+        verbose_name_plural = 'search entries'
+        db_table = 'bp_search_entry'
+        unique_together = (('kind', 'object_id'),)
+        index_together = (('owner', 'kind'),)
+
+    kind = models.CharField('kind', max_length=16)
+    object_id = models.UUIDField('object ID')
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='owner',
+    )
@@ -0,0 +1,88 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+from backpocket.links.models import Link
+from backpocket.search.backends import render_snippet
+from backpocket.search.index import search
+from backpocket.search.models import SearchEntry
+from backpocket.sharing.access import grant
+from backpocket.users.models import User
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user('alice', 'pw')
+        cls.bob = User.objects.create_user('bob', 'pw')
+
+    def _link(self, title='', notes='', owner=None, path=''):
+        return Link.objects.create(
+            owner=owner or self.alice, title=title, notes=notes,
+            url='http://example.com/{0}'.format(path or title),
+        )
+
+    def found(self, terms, user=None, **kwargs):
+        return [
+            result.object_id
+            for result in search(user or self.alice, terms, **kwargs)
+        ]
+
+    def test_indexed_on_save_and_delete(self):
+        link = self._link('Gardening tips', path='tips')
+        self.assertEqual(self.found('gardening'), [link.pk])
+        # Last word matches as a prefix
+        self.assertEqual(self.found('garden'), [link.pk])
+
+        link.title = 'Cooking tips'
+        link.save()
+        self.assertEqual(self.found('gardening'), [])
+        self.assertEqual(self.found('cooking'), [link.pk])
+
+        link.delete()
+        self.assertEqual(self.found('cooking'), [])
+        self.assertFalse(SearchEntry.objects.exists())
+
+    def test_ranking(self):
+        in_notes = self._link('Elsewhere', notes='about lighthouses')
+        in_title = self._link('Lighthouses', path='lights')
+        self.assertEqual(self.found('lighthouses'), [in_title.pk, in_notes.pk])
+
+    def test_permission_filtering(self):
+        shared = self._link('Shared lighthouse')
+        self._link('Private lighthouse')
+        self._link('Bob lighthouse', owner=self.bob)
+        self.assertEqual(len(self.found('lighthouse')), 2)
+        # Own library by default; others' only as shared
+        self.assertEqual(len(self.found('lighthouse', user=self.bob)), 1)
+        self.assertEqual(
+            self.found('lighthouse', user=self.bob, owner=self.alice), []
+        )
+        grant(shared, user=self.bob)
+        self.assertEqual(
+            self.found('lighthouse', user=self.bob, owner=self.alice),
+            [shared.pk],
+        )
+
+    def test_snippet_escaped(self):
+        self._link(
+            'Notes', notes='<script>alert(1)</script> the needle & <b>'
+        )
+        result, = search(self.alice, 'needle')
+        self.assertNotIn('<script>', result.snippet)
+        self.assertIn('&lt;script&gt;', result.snippet)
+        self.assertIn('<mark>needle</mark> &amp; &lt;b&gt;', result.snippet)
+        # Marker characters in indexed text can't forge markup
+        self.assertEqual(
+            render_snippet('a \x02b\x03 <c>'), 'a <mark>b</mark> &lt;c&gt;'
+        )
+
+    def test_api(self):
+        link = self._link('Lighthouse', notes='<i>keeper</i>')
+        client = APIClient()
+        client.force_authenticate(self.alice)
+        response = client.get('/api/search/', {'q': 'keeper'})
+        result, = response.data['results']
+        self.assertEqual(result['id'], link.pk)
+        self.assertEqual(
+            result['snippet'], '&lt;i&gt;<mark>keeper</mark>&lt;/i&gt;'
+        )
@@ -0,0 +1,74 @@
+from rest_framework import exceptions, permissions, viewsets
+from rest_framework.response import Response
+from backpocket.search.backends import encode_cursor, decode_cursor
+from backpocket.search.index import indexed_models, search
+from backpocket.timing import RequestTimingMixin
+
+
+class SearchViewSet(RequestTimingMixin, viewsets.ViewSet):
+    """
+    Ranked full-text search over the requesting user's library.
+    Query parameters: 'q' (terms), 'kind' (repeatable, e.g. 'link'),
+    'limit', and 'cursor' (from a previous response's 'next').
+    Each result's 'snippet' is HTML: escaped text, with matching words
+    in <mark> elements.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    default_limit = 20
+    max_limit = 100
+
+    def _get_limit(self, request):
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            raise exceptions.ValidationError({'limit': 'Must be an integer.'})
+        return max(1, min(limit, self.max_limit))
+
+    def list(self, request):
+        params = request.query_params
+        terms = params.get('q', '')
+        kinds = params.getlist('kind') or None
+        limit = self._get_limit(request)
+
+        after = None
+        if params.get('cursor'):
+            try:
+                after = decode_cursor(params['cursor'])
+            except ValueError:
+                raise exceptions.ValidationError({'cursor': 'Invalid cursor.'})
+
+        results = search(
+            request.user, terms, kinds=kinds, limit=limit, after=after
+        )
+
+        # One query per kind to fetch display fields
+        models = indexed_models()
+        by_kind = {}
+        for result in results:
+            by_kind.setdefault(result.kind, []).append(result.object_id)
+        objects = {
+            kind: models[kind]._default_manager.in_bulk(ids)
+            for kind, ids in by_kind.items()
+        }
+
+        data = []
+        for result in results:
+            obj = objects[result.kind].get(result.object_id)
+            if obj is None:
+                continue
+            data.append({
+                'kind': result.kind,
+                'id': result.object_id,
+                'title': obj.title,
+                'url': obj.url,
+                'snippet': result.snippet,
+                'score': result.score,
+            })
+
+        next_cursor = None
+        if len(results) == limit:
+            last = results[-1]
+            next_cursor = encode_cursor(last.score, last.entry_id)
+
+        return Response({'results': data, 'next': next_cursor})
@@ -10,7 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/1.11/ref/settings/
 """
 
-import os
+import importlib.util, os
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -37,6 +37,10 @@ INSTALLED_APPS = [
     'backpocket.pages.apps.PagesConfig',
     'backpocket.links.apps.LinksConfig',
     'backpocket.lists.apps.ListsConfig',
+    'backpocket.search.apps.SearchConfig',
+    'backpocket.sharing.apps.SharingConfig',
+    'backpocket.mail.apps.MailConfig',
+    'backpocket.audit.apps.AuditConfig',
     'obj_perms',
     'drf_obj_perms',
     'rest_framework',
@@ -49,6 +53,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'backpocket.timing.RequestTimingMiddleware',
+    'backpocket.queries.QueryAnalysisMiddleware',
+    'backpocket.tracing.PermissionTraceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -90,6 +97,16 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/1.11/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/1.11/ref/settings/#auth-password-validators
 
@@ -140,6 +157,206 @@ AUTHENTICATION_BACKENDS = [
 ]
 
 
+# REST framework
+# http://www.django-rest-framework.org/api-guide/settings/
+
+# JSON first, as the default for clients accepting anything; MessagePack
+# where the msgpack package is installed; the browsable API only when
+# debugging
+API_RENDERERS = ['backpocket.renderers.JSONRenderer']
+API_PARSERS = [
+    'backpocket.renderers.JSONParser',
+    'rest_framework.parsers.FormParser',
+    'rest_framework.parsers.MultiPartParser',
+]
+if importlib.util.find_spec('msgpack') is not None:
+    API_RENDERERS.append('backpocket.renderers.MessagePackRenderer')
+    API_PARSERS.append('backpocket.renderers.MessagePackParser')
+if DEBUG:
+    API_RENDERERS.append('rest_framework.renderers.BrowsableAPIRenderer')
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': API_RENDERERS,
+    'DEFAULT_PARSER_CLASSES': API_PARSERS,
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'backpocket.users.authentication.APIKeyAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'backpocket.throttling.ActionScopedThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'read': '600/min',
+        'write': '120/min',
+        'bulk': '10/hour',
+    },
+}
+
+# Throttle counters; use SQLiteThrottleStore to share between worker
+# processes on one host, or CacheThrottleStore across hosts
+THROTTLE_STORE = {
+    'BACKEND': 'backpocket.throttling.LocMemThrottleStore',
+    'OPTIONS': {},
+}
+
+
+# API key resolution caching and last-used write batching (seconds)
+API_KEY_AUTH = {
+    'CACHE': 'default',
+    'CACHE_TIMEOUT': 300,
+    'LOCAL_CACHE_SIZE': 1024,
+    'LOCAL_CACHE_TTL': 10,
+    'LAST_USED_INTERVAL': 60,
+}
+
+
+# Email
+# https://docs.djangoproject.com/en/1.11/topics/email/
+
+# Mail is queued in the database and delivered by the send_queued_mail
+# worker over SMTP (EMAIL_HOST etc.); for a local stand-in, run
+# python -m smtpd -n -c DebuggingServer localhost:1025 and set
+# EMAIL_PORT = 1025
+EMAIL_BACKEND = 'backpocket.mail.backends.OutboxEmailBackend'
+DEFAULT_FROM_EMAIL = 'backpocket@localhost'
+EMAIL_HOST = 'localhost'
+EMAIL_PORT = 25
+EMAIL_TIMEOUT = 30
+
+# Worker batching and retry backoff (seconds)
+MAIL_OUTBOX = {
+    'DELIVERY_BACKEND': 'django.core.mail.backends.smtp.EmailBackend',
+    'BATCH_SIZE': 50,
+    'MAX_ATTEMPTS': 6,
+    'RETRY_DELAY': 60,
+    'MAX_RETRY_DELAY': 60 * 60,
+    'LEASE': 5 * 60,
+    'IDLE_TIMEOUT': 30,
+    'POLL_INTERVAL': 5,
+}
+
+
+# Link visit counts and read progress are buffered and written behind;
+# use SQLiteActivityBuffer to share the buffer between worker processes
+# on one host (and keep it through crashes)
+LINK_ACTIVITY = {
+    'BACKEND': 'backpocket.links.activity.LocMemActivityBuffer',
+    'OPTIONS': {},
+    'FLUSH_INTERVAL': 10,
+}
+
+
+# Audit trail of permission-sensitive user actions: buffered per process
+# and bulk-inserted every FLUSH_INTERVAL seconds or MAX_BUFFER events
+# (SYNC writes each at once, in the action's transaction); events older
+# than RETENTION_DAYS are moved to ARCHIVE_DIR by archive_audit_log
+AUDIT_LOG = {
+    'SYNC': False,
+    'FLUSH_INTERVAL': 5,
+    'MAX_BUFFER': 500,
+    'RETENTION_DAYS': 365,
+    'ARCHIVE_DIR': os.path.join(BASE_DIR, 'data', 'audit'),
+}
+
+
+# Dead-link checking (intervals in seconds): stable URLs are re-checked
+# ever less often, from MIN_INTERVAL up to MAX_INTERVAL; failing ones
+# are retried from RETRY_INTERVAL and marked dead after DEAD_AFTER
+# failures in a row. Up to MAX_HOSTS hosts are checked at once, with
+# HOST_DELAY between requests to any one host. URLs on non-global
+# addresses are refused unless in one of ALLOWED_NETWORKS
+LINK_CHECK = {
+    'BATCH_SIZE': 200,
+    'MIN_INTERVAL': 24 * 60 * 60,
+    'MAX_INTERVAL': 60 * 24 * 60 * 60,
+    'RETRY_INTERVAL': 60 * 60,
+    'DEAD_AFTER': 3,
+    'MAX_HOSTS': 8,
+    'HOST_DELAY': 1,
+    'TIMEOUT': 15,
+    'MAX_REDIRECTS': 5,
+    'LEASE': 15 * 60,
+    'POLL_INTERVAL': 60,
+    'USER_AGENT': 'backpocket-link-checker',
+    'ALLOWED_NETWORKS': [],
+}
+
+
+# Request timing: Server-Timing header and log lines for requests slower
+# than SLOW_THRESHOLD (seconds), plus a SAMPLE_RATE fraction of others
+REQUEST_TIMING = {
+    'ENABLED': DEBUG,
+    'HEADER': DEBUG,
+    'SLOW_THRESHOLD': 1.0,
+    'SAMPLE_RATE': 0.0,
+}
+
+# Logs statements repeated more than THRESHOLD times in one request,
+# with the code they came from (for development and staging)
+QUERY_ANALYSIS = {
+    'ENABLED': DEBUG,
+    'THRESHOLD': 3,
+    'STACK_DEPTH': 8,
+}
+
+# Traces permission checks for a SAMPLE_RATE fraction of requests,
+# keeping the latest MAX_DECISIONS per request, and logs how each check
+# was denied for requests answered with 403 or 404
+PERMISSION_TRACE = {
+    'ENABLED': True,
+    'SAMPLE_RATE': 0.01,
+    'MAX_DECISIONS': 100,
+}
+
+# Worker warm-up from backpocket.wsgi; turn CONNECT off if the server
+# loads the application before forking workers
+WARM_UP = {
+    'ENABLED': True,
+    'CONNECT': True,
+}
+
+# Archived HTML and article text extraction; extraction runs in
+# EXTRACT_PROCESSES worker processes with at most EXTRACT_QUEUE_DEPTH
+# documents in flight
+PAGE_ARCHIVE = {
+    'BLOB_DIR': os.path.join(BASE_DIR, 'data', 'blobs'),
+    'EXTRACT_PROCESSES': os.cpu_count(),
+    'EXTRACT_QUEUE_DEPTH': 2 * os.cpu_count(),
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'backpocket.timing': {'handlers': ['console'], 'level': 'INFO'},
+        'backpocket.queries': {'handlers': ['console'], 'level': 'INFO'},
+        'backpocket.warmup': {'handlers': ['console'], 'level': 'INFO'},
+        'backpocket.pages': {'handlers': ['console'], 'level': 'INFO'},
+        'backpocket.permissions': {
+            'handlers': ['console'], 'level': 'INFO',
+        },
+    },
+}
+
+
+# Portal
+
+LOGIN_URL = 'rest_framework:login'
+
+# Fragments are keyed by list modification time, so this only bounds
+# how long stale entries linger
+PORTAL_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+# Search
+
+SEARCH_BACKEND = 'backpocket.search.backends.SQLiteSearchBackend'
+
+
 # Admin
 
 ENABLE_ADMIN = True
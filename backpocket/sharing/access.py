@@ -0,0 +1,237 @@
+# Grant management and the materialized access index
+#
+# Grants are the source of truth; Access rows hold each user's combined
+# permission bits per object and are recomputed for just the affected
+# users and objects whenever grants or group memberships change.
+
+import collections
+from django.apps import apps
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.signals import m2m_changed, pre_delete, post_delete
+from backpocket.sharing.models import Grant, Access, VIEW
+
+
+# Models whose objects can be shared
+SHAREABLE_MODELS = (
+    'bp_users.user',
+    'bp_links.link',
+    'bp_lists.list',
+    'bp_pages.page',
+)
+
+# Keeps IN lists within SQLite's bound parameter limit
+CHUNK_SIZE = 500
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def get_kind(obj_or_model):
+    return obj_or_model._meta.label_lower
+
+
+def refresh_access(user_ids, kind, object_ids):
+    '''Recomputes Access rows for the given users on the given objects
+    of one kind. Pass user_ids=None to recompute public access.
+    '''
+    object_ids = list(object_ids)
+    if not object_ids:
+        return
+
+    with transaction.atomic():
+        if user_ids is None:
+            for oids in _chunks(object_ids):
+                bits = collections.defaultdict(int)
+                for object_id, perms in (
+                        Grant.objects.filter(
+                            kind=kind, object_id__in=oids,
+                            user__isnull=True, group__isnull=True,
+                        ).values_list('object_id', 'perms')):
+                    bits[object_id] |= perms
+                Access.objects.filter(
+                    user__isnull=True, kind=kind, object_id__in=oids
+                ).delete()
+                Access.objects.bulk_create(
+                    Access(user=None, kind=kind, object_id=oid, perms=perms)
+                    for oid, perms in bits.items() if perms
+                )
+            return
+
+        for uids in _chunks(user_ids):
+            for oids in _chunks(object_ids, CHUNK_SIZE // 2):
+                grants = Grant.objects.filter(kind=kind, object_id__in=oids)
+                bits = collections.defaultdict(int)
+                for user_id, object_id, perms in (
+                        grants.filter(user_id__in=uids)
+                        .values_list('user_id', 'object_id', 'perms')):
+                    bits[(user_id, object_id)] |= perms
+                for user_id, object_id, perms in (
+                        grants.filter(group__user__in=uids)
+                        .values_list('group__user', 'object_id', 'perms')):
+                    bits[(user_id, object_id)] |= perms
+
+                Access.objects.filter(
+                    user_id__in=uids, kind=kind, object_id__in=oids
+                ).delete()
+                Access.objects.bulk_create(
+                    Access(
+                        user_id=user_id, kind=kind,
+                        object_id=object_id, perms=perms,
+                    )
+                    for (user_id, object_id), perms in bits.items() if perms
+                )
+
+
+def _refresh_grant_target(kind, object_id, user=None, group=None):
+    if user is not None:
+        refresh_access([user.pk], kind, [object_id])
+    elif group is not None:
+        members = group.user_set.values_list('pk', flat=True)
+        refresh_access(members, kind, [object_id])
+    else:
+        refresh_access(None, kind, [object_id])
+
+
+def grant(obj, perms=VIEW, user=None, group=None):
+    '''Grants permission bits on obj to a user, a group, or everyone
+    if neither is given, replacing any previous grant to the same
+    grantee. Returns the Grant.
+    '''
+    kind = get_kind(obj)
+    with transaction.atomic():
+        grant, _ = Grant.objects.update_or_create(
+            kind=kind, object_id=obj.pk, user=user, group=group,
+            defaults={'perms': perms},
+        )
+        _refresh_grant_target(kind, obj.pk, user=user, group=group)
+    return grant
+
+
+def revoke(obj, user=None, group=None):
+    '''Removes the grant on obj to a user, a group, or everyone.'''
+    kind = get_kind(obj)
+    with transaction.atomic():
+        Grant.objects.filter(
+            kind=kind, object_id=obj.pk, user=user, group=group
+        ).delete()
+        _refresh_grant_target(kind, obj.pk, user=user, group=group)
+
+
+def _refresh_group_grants(user_ids, group_ids):
+    # Refresh users' access to everything granted to these groups
+    by_kind = collections.defaultdict(set)
+    for kind, object_id in (
+            Grant.objects.filter(group_id__in=group_ids)
+            .values_list('kind', 'object_id')):
+        by_kind[kind].add(object_id)
+    for kind, object_ids in by_kind.items():
+        refresh_access(user_ids, kind, object_ids)
+
+
+def _access_filter(user, kind, bit):
+    # Rows for this user, plus public rows, with the bit set
+    return (
+        Access.objects
+        .filter(Q(user_id=user.pk) | Q(user__isnull=True), kind=kind)
+        .annotate(granted=F('perms').bitand(bit))
+        .filter(granted=bit)
+    )
+
+
+def has_access(user, obj, bit=VIEW):
+    '''Checks whether user has been granted the bit on obj, directly,
+    through a group, or publicly.
+    '''
+    if not user or not user.is_authenticated:
+        return False
+    return _access_filter(user, get_kind(obj), bit).filter(
+        object_id=obj.pk
+    ).exists()
+
+
+def accessible(user, model, bit=VIEW):
+    '''Returns values queryset of primary keys of model objects user
+    has been granted the bit on, for use as a subquery.
+    '''
+    return _access_filter(user, get_kind(model), bit).values('object_id')
+
+
+def _handle_membership(sender, instance, action, reverse, model, pk_set,
+                       **kwargs):
+    if action == 'pre_clear':
+        # Remember what's about to go, pk_set is None on clear
+        if reverse:
+            instance._bp_cleared = list(
+                instance.user_set.values_list('pk', flat=True)
+            )
+        else:
+            instance._bp_cleared = list(
+                instance.groups.values_list('pk', flat=True)
+            )
+        return
+
+    if action == 'post_clear':
+        pk_set = getattr(instance, '_bp_cleared', ())
+    elif action not in ('post_add', 'post_remove'):
+        return
+
+    if not pk_set:
+        return
+
+    if reverse:
+        # group.user_set changed: pk_set holds users
+        _refresh_group_grants(pk_set, [instance.pk])
+    else:
+        # user.groups changed: pk_set holds groups
+        _refresh_group_grants([instance.pk], pk_set)
+
+
+def _handle_group_pre_delete(sender, instance, **kwargs):
+    instance._bp_members = list(
+        instance.user_set.values_list('pk', flat=True)
+    )
+    instance._bp_granted = list(
+        Grant.objects.filter(group=instance)
+        .values_list('kind', 'object_id')
+    )
+
+
+def _handle_group_post_delete(sender, instance, **kwargs):
+    # Grants went with the group, recompute what members had
+    by_kind = collections.defaultdict(set)
+    for kind, object_id in getattr(instance, '_bp_granted', ()):
+        by_kind[kind].add(object_id)
+    for kind, object_ids in by_kind.items():
+        refresh_access(getattr(instance, '_bp_members', ()), kind, object_ids)
+
+
+def _handle_object_delete(sender, instance, **kwargs):
+    kind = get_kind(instance)
+    Grant.objects.filter(kind=kind, object_id=instance.pk).delete()
+    Access.objects.filter(kind=kind, object_id=instance.pk).delete()
+
+
+def connect_signals():
+    User = apps.get_model('bp_users', 'User')
+    m2m_changed.connect(
+        _handle_membership, sender=User.groups.through,
+        dispatch_uid='bp_sharing_membership'
+    )
+    pre_delete.connect(
+        _handle_group_pre_delete, sender=Group,
+        dispatch_uid='bp_sharing_group_pre_delete'
+    )
+    post_delete.connect(
+        _handle_group_post_delete, sender=Group,
+        dispatch_uid='bp_sharing_group_post_delete'
+    )
+    for label in SHAREABLE_MODELS:
+        post_delete.connect(
+            _handle_object_delete, sender=apps.get_model(label),
+            dispatch_uid='bp_sharing_object_delete'
+        )
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class SharingConfig(AppConfig):
+    name = 'backpocket.sharing'
+    label = 'bp_sharing'
+    verbose_name = 'Sharing'
+
+    def ready(self):
+        from backpocket.sharing.access import connect_signals
+        connect_signals()
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 14:35
+from __future__ import unicode_literals
+
+import backpocket.utils
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0008_alter_user_username_max_length'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Access',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=64, verbose_name='kind')),
+                ('object_id', models.UUIDField(verbose_name='object ID')),
+                ('perms', models.PositiveSmallIntegerField(default=0, verbose_name='permissions')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='user')),
+            ],
+            options={
+                'verbose_name': 'access entry',
+                'verbose_name_plural': 'access entries',
+                'db_table': 'bp_access',
+            },
+        ),
+        migrations.CreateModel(
+            name='Grant',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=64, verbose_name='kind')),
+                ('object_id', models.UUIDField(verbose_name='object ID')),
+                ('perms', models.PositiveSmallIntegerField(default=1, verbose_name='permissions')),
+                ('date_granted', models.DateTimeField(default=backpocket.utils.utcnow, verbose_name='date granted')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='auth.Group', verbose_name='group')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='user')),
+            ],
+            options={
+                'verbose_name': 'grant',
+                'verbose_name_plural': 'grants',
+                'db_table': 'bp_grant',
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='grant',
+            index_together=set([('kind', 'object_id')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='access',
+            index_together=set([('kind', 'object_id'), ('user', 'kind', 'object_id')]),
+        ),
+    ]
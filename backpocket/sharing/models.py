@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.db import models
+from backpocket.utils import utcnow
+
+
+# Permission bits for grants and access entries
+VIEW = 1
+CHANGE = 2
+DELETE = 4
+
+
+class Grant(models.Model):
+    """
+    Grant of permission bits on an object to a user, a group, or
+    everyone (public, when neither user nor group is set). Objects are
+    identified by model label (e.g. 'bp_lists.list') and primary key.
+    Edit through backpocket.sharing.access, which keeps Access in step.
+    """
+
+    class Meta:
+        verbose_name = 'grant'
+        verbose_name_plural = 'grants'
+        db_table = 'bp_grant'
+        index_together = (('kind', 'object_id'),)
+
+    kind = models.CharField('kind', max_length=64)
+    object_id = models.UUIDField('object ID')
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='user',
+    )
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='group',
+    )
+    perms = models.PositiveSmallIntegerField('permissions', default=VIEW)
+    date_granted = models.DateTimeField('date granted', default=utcnow)
+
+
+class Access(models.Model):
+    """
+    Materialized effective permission bits per (user, object), combining
+    direct and group grants. Public access is a single row without a
+    user. Rebuilt incrementally on grant and membership changes, so
+    permission filters need one indexed lookup instead of walking
+    grants and group memberships.
+    """
+
+    class Meta:
+        verbose_name = 'access entry'
+        verbose_name_plural = 'access entries'
+        db_table = 'bp_access'
+        index_together = (
+            ('user', 'kind', 'object_id'),
+            ('kind', 'object_id'),
+        )
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        related_name='+',
+        verbose_name='user',
+    )
+    kind = models.CharField('kind', max_length=64)
+    object_id = models.UUIDField('object ID')
+    perms = models.PositiveSmallIntegerField('permissions', default=0)
@@ -0,0 +1,109 @@
+from django.contrib.auth.models import AnonymousUser, Group
+from django.test import TestCase
+from backpocket.links.models import Link
+from backpocket.sharing.access import accessible, grant, has_access, revoke
+from backpocket.sharing.models import CHANGE, DELETE, VIEW, Access, Grant
+from backpocket.users.models import User
+
+
+class AccessTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'pw')
+        cls.alice = User.objects.create_user('alice', 'pw')
+        cls.bob = User.objects.create_user('bob', 'pw')
+
+    def setUp(self):
+        # Per test, as one test deletes it
+        self.link = Link.objects.create(
+            owner=self.owner, url='http://example.com/shared'
+        )
+        self.other = Link.objects.create(
+            owner=self.owner, url='http://example.com/private'
+        )
+
+    def accessible_links(self, user, bit=VIEW):
+        return set(Link.objects.filter(pk__in=accessible(user, Link, bit)))
+
+    def test_user_grant_and_revoke(self):
+        grant(self.link, VIEW | CHANGE, user=self.alice)
+        self.assertTrue(has_access(self.alice, self.link))
+        self.assertTrue(has_access(self.alice, self.link, CHANGE))
+        self.assertFalse(has_access(self.alice, self.link, DELETE))
+        self.assertFalse(has_access(self.alice, self.other))
+        self.assertFalse(has_access(self.bob, self.link))
+        self.assertEqual(self.accessible_links(self.alice), {self.link})
+        self.assertEqual(self.accessible_links(self.alice, DELETE), set())
+
+        # Replaces the previous grant
+        grant(self.link, VIEW, user=self.alice)
+        self.assertFalse(has_access(self.alice, self.link, CHANGE))
+        self.assertEqual(Grant.objects.count(), 1)
+
+        revoke(self.link, user=self.alice)
+        self.assertFalse(has_access(self.alice, self.link))
+        self.assertEqual(self.accessible_links(self.alice), set())
+        self.assertFalse(Access.objects.exists())
+
+    def test_public_grant(self):
+        grant(self.link)
+        self.assertTrue(has_access(self.alice, self.link))
+        self.assertEqual(self.accessible_links(self.bob), {self.link})
+        self.assertFalse(has_access(AnonymousUser(), self.link))
+        revoke(self.link)
+        self.assertFalse(has_access(self.alice, self.link))
+
+    def test_group_membership(self):
+        group = Group.objects.create(name='readers')
+        group.user_set.add(self.alice)
+        grant(self.link, VIEW, group=group)
+        self.assertTrue(has_access(self.alice, self.link))
+        self.assertFalse(has_access(self.bob, self.link))
+
+        # Either side of the relation
+        self.bob.groups.add(group)
+        self.assertTrue(has_access(self.bob, self.link))
+        group.user_set.remove(self.alice)
+        self.assertFalse(has_access(self.alice, self.link))
+        self.bob.groups.remove(group)
+        self.assertFalse(has_access(self.bob, self.link))
+
+    def test_group_clear(self):
+        group = Group.objects.create(name='readers')
+        group.user_set.add(self.alice, self.bob)
+        grant(self.link, VIEW, group=group)
+        self.alice.groups.clear()
+        self.assertFalse(has_access(self.alice, self.link))
+        self.assertTrue(has_access(self.bob, self.link))
+        group.user_set.clear()
+        self.assertFalse(has_access(self.bob, self.link))
+
+    def test_group_delete(self):
+        group = Group.objects.create(name='readers')
+        group.user_set.add(self.alice, self.bob)
+        grant(self.link, VIEW | CHANGE, group=group)
+        # A direct grant outlives the group's
+        grant(self.link, VIEW, user=self.alice)
+        group.delete()
+        self.assertTrue(has_access(self.alice, self.link))
+        self.assertFalse(has_access(self.alice, self.link, CHANGE))
+        self.assertFalse(has_access(self.bob, self.link))
+
+    def test_combined_bits(self):
+        group = Group.objects.create(name='editors')
+        group.user_set.add(self.alice)
+        grant(self.link, CHANGE, group=group)
+        self.assertFalse(has_access(self.alice, self.link))
+        grant(self.link, VIEW, user=self.alice)
+        self.assertTrue(has_access(self.alice, self.link, VIEW | CHANGE))
+        self.assertEqual(
+            Access.objects.get(user=self.alice).perms, VIEW | CHANGE
+        )
+
+    def test_object_delete(self):
+        grant(self.link, VIEW, user=self.alice)
+        grant(self.link)
+        self.link.delete()
+        self.assertFalse(Grant.objects.exists())
+        self.assertFalse(Access.objects.exists())
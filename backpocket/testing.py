@@ -0,0 +1,53 @@
+"""
+Test helpers.
+"""
+from django.urls import reverse
+from rest_framework.test import APIClient
+from backpocket.queries import QueryAnalyzer
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin for locking in the number of queries a view runs.
+    """
+    # Statements repeated more often than this fail the budget
+    repeat_threshold = 2
+
+    def assert_query_budget(self, view, n, method='get', args=None,
+                            kwargs=None, data=None, user=None,
+                            status_code=200):
+        '''Requests the named view and asserts it ran at most n queries,
+        with no statement repeated more than repeat_threshold times.
+        Safe requests are made once beforehand, so process-wide caches
+        (content types and the like) don't count. Returns the response.
+        '''
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        path = reverse(view, args=args, kwargs=kwargs)
+        if method in ('get', 'head', 'options'):
+            getattr(client, method)(path, data, format='json')
+
+        analyzer = QueryAnalyzer()
+        with analyzer.capture():
+            response = getattr(client, method)(path, data, format='json')
+
+        self.assertEqual(
+            response.status_code, status_code,
+            '{0} {1}: {2}'.format(method.upper(), path, response.data)
+        )
+        repeats = analyzer.report(self.repeat_threshold)
+        self.assertFalse(
+            repeats,
+            '{0} {1} repeated queries:\n{2}'.format(
+                method.upper(), path, repeats
+            )
+        )
+        self.assertLessEqual(
+            analyzer.count, n,
+            '{0} {1} ran {2} queries, budget {3}:\n{4}'.format(
+                method.upper(), path, analyzer.count, n,
+                '\n'.join(analyzer.groups)
+            )
+        )
+        return response
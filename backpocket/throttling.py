@@ -0,0 +1,235 @@
+"""
+Per-user API request throttling with pluggable counter stores.
+
+Requests are sorted into 'read', 'write' and 'bulk' scopes, each with
+its own rate in REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']. Counters live
+in the store named by the THROTTLE_STORE setting, so that all workers
+can share them where needed.
+"""
+import math, os, sqlite3, threading, time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+class BaseThrottleStore:
+    """
+    Counter store interface. 'take()' records one request against key
+    if allowed, returning 0, or returns the seconds to wait if not.
+    """
+
+    def take(self, key, limit, period, now):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+def _refill(tokens, updated, limit, period, now):
+    '''Token bucket step: returns (tokens, wait) after refilling a
+    bucket of size limit at limit/period tokens per second and taking
+    one token if available.
+    '''
+    rate = limit / period
+    tokens = min(limit, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0
+    return tokens, (1 - tokens) / rate
+
+
+class LocMemThrottleStore(BaseThrottleStore):
+    """
+    Token buckets in process memory. Only suitable for a single
+    worker process.
+    """
+
+    def __init__(self, **options):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, limit, period, now):
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (limit, now))
+            tokens, wait = _refill(tokens, updated, limit, period, now)
+            self._buckets[key] = (tokens, now)
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteThrottleStore(BaseThrottleStore):
+    """
+    Token buckets in a separate SQLite file shared by all workers on
+    a host. Kept apart from the main database so throttle writes never
+    contend with application writes.
+    """
+
+    def __init__(self, path=None, **options):
+        self.path = path or os.path.join(
+            settings.BASE_DIR, 'data', 'throttle.sqlite3'
+        )
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None
+            )
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = OFF')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS bucket ('
+                'key TEXT PRIMARY KEY, tokens REAL, updated REAL)'
+            )
+            self._local.connection = conn
+        return conn
+
+    def take(self, key, limit, period, now):
+        conn = self.connection
+        # Take the write lock up front so read-modify-write is atomic
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT tokens, updated FROM bucket WHERE key = ?', (key,)
+            ).fetchone()
+            tokens, updated = row if row else (limit, now)
+            tokens, wait = _refill(tokens, updated, limit, period, now)
+            conn.execute(
+                'INSERT OR REPLACE INTO bucket VALUES (?, ?, ?)',
+                (key, tokens, now)
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+    def clear(self):
+        self.connection.execute('DELETE FROM bucket')
+
+
+class CacheThrottleStore(BaseThrottleStore):
+    """
+    Sliding window counters in a Django cache, for workers spread over
+    several hosts. Uses atomic incr() only, so the current window's
+    count is combined with a weighted share of the previous window's.
+    """
+
+    def __init__(self, alias='default', **options):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def take(self, key, limit, period, now):
+        window = int(now // period)
+        elapsed = (now % period) / period
+        current_key = 'throttle:{0}:{1}'.format(key, window)
+        previous_key = 'throttle:{0}:{1}'.format(key, window - 1)
+
+        previous = self.cache.get(previous_key, 0)
+        self.cache.add(current_key, 0, timeout=period * 2)
+        try:
+            current = self.cache.incr(current_key)
+        except ValueError:
+            # Expired between add() and incr()
+            self.cache.set(current_key, 1, timeout=period * 2)
+            current = 1
+
+        estimate = previous * (1 - elapsed) + current
+        if estimate <= limit:
+            return 0
+
+        # Roll back this request's count, it wasn't allowed
+        self.cache.decr(current_key)
+        if previous:
+            # Wait until the previous window's share has decayed enough
+            excess = estimate - limit
+            return max(0.0, excess / previous * period)
+        return (1 - elapsed) * period
+
+    def clear(self):
+        self.cache.clear()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_throttle_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                config = getattr(settings, 'THROTTLE_STORE', {})
+                store_cls = import_string(config.get(
+                    'BACKEND', 'backpocket.throttling.LocMemThrottleStore'
+                ))
+                _store = store_cls(**config.get('OPTIONS', {}))
+    return _store
+
+
+class ActionScopedThrottle(BaseThrottle):
+    """
+    Throttle with separate budgets for reads, writes and bulk actions.
+    Viewsets list their bulk actions in a 'bulk_actions' attribute.
+    Authenticated requests are counted per user, others per client IP.
+    """
+    timer = time.time
+
+    read_scope = 'read'
+    write_scope = 'write'
+    bulk_scope = 'bulk'
+
+    def __init__(self):
+        self._wait = None
+
+    def get_scope(self, request, view):
+        action = getattr(view, 'action', None)
+        if action and action in getattr(view, 'bulk_actions', ()):
+            return self.bulk_scope
+        if request.method in SAFE_METHODS:
+            return self.read_scope
+        return self.write_scope
+
+    def get_rate(self, scope):
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if rate is None:
+            return None
+        num, period = rate.split('/')
+        return int(num), {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+
+    def get_ident(self, request):
+        user = request.user
+        if user and user.is_authenticated:
+            return 'user:{0}'.format(user.pk)
+        return 'anon:{0}'.format(super().get_ident(request))
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(request, view)
+        rate = self.get_rate(scope)
+        if rate is None:
+            return True
+
+        limit, period = rate
+        key = '{0}:{1}'.format(scope, self.get_ident(request))
+        wait = get_throttle_store().take(key, limit, period, self.timer())
+        if wait:
+            self._wait = wait
+            return False
+        return True
+
+    def wait(self):
+        # Whole seconds for the Retry-After header, never zero
+        if self._wait is None:
+            return None
+        return max(1, math.ceil(self._wait))
@@ -0,0 +1,234 @@
+"""
+Per-request cost breakdown.
+
+RequestTimingMiddleware times each request, counts its database
+queries, and collects phase timings recorded by RequestTimingMixin on
+API views: authentication, permission checks, permission filtering
+and serialization, plus rendering. Results go in a Server-Timing
+header, if enabled, and in a log line for slow requests and a sample
+of the rest. With REQUEST_TIMING['ENABLED'] off, the middleware passes
+requests straight through and the hooks cost one attribute lookup.
+"""
+import collections, contextlib, functools, logging, random, threading, time
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.utils import CursorWrapper
+
+
+logger = logging.getLogger('backpocket.timing')
+
+_local = threading.local()
+
+
+def _setting(name, default):
+    return getattr(settings, 'REQUEST_TIMING', {}).get(name, default)
+
+
+class RequestTimer:
+    """
+    Accumulated phase durations (seconds) for one request.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = collections.OrderedDict()
+        self.queries = 0
+        self.query_time = 0.0
+
+    def add(self, name, duration):
+        self.phases[name] = self.phases.get(name, 0.0) + duration
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+
+class TimedCursorWrapper(CursorWrapper):
+    """
+    Cursor wrapper counting queries and their time into a timer.
+    """
+
+    def __init__(self, cursor, db, timer):
+        super().__init__(cursor, db)
+        self.timer = timer
+
+    def execute(self, sql, params=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            self.timer.queries += 1
+            self.timer.query_time += time.perf_counter() - start
+
+    def executemany(self, sql, param_list):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, param_list)
+        finally:
+            self.timer.queries += 1
+            self.timer.query_time += time.perf_counter() - start
+
+
+@contextlib.contextmanager
+def wrap_cursors(wrap):
+    '''Routes cursors created within the block through wrap(cursor,
+    connection), on top of the debug wrapper if queries were being
+    logged anyway. Nests with other uses.
+    '''
+    patched = []
+    for conn in connections.all():
+        make_inner = (
+            conn.make_debug_cursor if conn.queries_logged
+            else conn.make_cursor
+        )
+        patched.append((
+            conn, conn.__dict__.get('make_debug_cursor'),
+            conn.force_debug_cursor,
+        ))
+        conn.make_debug_cursor = (
+            lambda cursor, conn=conn, make_inner=make_inner:
+            wrap(make_inner(cursor), conn)
+        )
+        conn.force_debug_cursor = True
+    try:
+        yield
+    finally:
+        for conn, make_debug_cursor, force_debug_cursor in patched:
+            if make_debug_cursor is None:
+                del conn.make_debug_cursor
+            else:
+                conn.make_debug_cursor = make_debug_cursor
+            conn.force_debug_cursor = force_debug_cursor
+
+
+def current_timer():
+    return getattr(_local, 'timer', None)
+
+
+@contextlib.contextmanager
+def phase(name):
+    '''Adds the time spent in the block to the current request's
+    named phase. Does nothing outside a timed request.
+    '''
+    timer = getattr(_local, 'timer', None)
+    if timer is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, time.perf_counter() - start)
+
+
+def timed(name, func):
+    '''Wraps func so its calls count towards the named phase.'''
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with phase(name):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class RequestTimingMiddleware:
+    """
+    Times requests, adding Server-Timing headers and log lines as
+    configured by the REQUEST_TIMING setting.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = _setting('ENABLED', False)
+        self.header = _setting('HEADER', False)
+        self.slow = _setting('SLOW_THRESHOLD', 1.0)
+        self.sample_rate = _setting('SAMPLE_RATE', 0.0)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        timer = _local.timer = RequestTimer()
+        try:
+            with wrap_cursors(functools.partial(
+                    TimedCursorWrapper, timer=timer)):
+                response = self.get_response(request)
+        finally:
+            _local.timer = None
+
+        total = timer.elapsed()
+        if self.header:
+            response['Server-Timing'] = self.format_header(timer, total)
+        if total >= self.slow or random.random() < self.sample_rate:
+            self.log(request, response, timer, total)
+        return response
+
+    def format_header(self, timer, total):
+        metrics = ['{0};dur={1:.1f}'.format(name, duration * 1000)
+                   for name, duration in timer.phases.items()]
+        metrics.append('db;dur={0:.1f};desc="{1} queries"'.format(
+            timer.query_time * 1000, timer.queries
+        ))
+        metrics.append('total;dur={0:.1f}'.format(total * 1000))
+        return ', '.join(metrics)
+
+    def log(self, request, response, timer, total):
+        user = getattr(request, 'user', None)
+        fields = [
+            ('method', request.method),
+            ('path', request.path),
+            ('status', response.status_code),
+            ('user', user.pk if user and user.is_authenticated else '-'),
+            ('total_ms', '{0:.1f}'.format(total * 1000)),
+            ('db_ms', '{0:.1f}'.format(timer.query_time * 1000)),
+            ('queries', timer.queries),
+        ]
+        fields.extend(
+            ('{0}_ms'.format(name), '{0:.1f}'.format(duration * 1000))
+            for name, duration in timer.phases.items()
+        )
+        logger.log(
+            logging.WARNING if total >= self.slow else logging.INFO,
+            ' '.join('{0}={1}'.format(key, value) for key, value in fields)
+        )
+
+
+class RequestTimingMixin:
+    """
+    APIView mixin recording authentication, permission, filtering,
+    serialization and rendering phases for RequestTimingMiddleware.
+    """
+
+    def perform_authentication(self, request):
+        with phase('auth'):
+            super().perform_authentication(request)
+
+    def check_permissions(self, request):
+        with phase('perms'):
+            super().check_permissions(request)
+
+    def check_object_permissions(self, request, obj):
+        with phase('perms'):
+            super().check_object_permissions(request, obj)
+
+    def filter_queryset(self, queryset):
+        with phase('filter'):
+            return super().filter_queryset(queryset)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if current_timer() is not None:
+            # Representation is built lazily, on first access to .data
+            serializer.to_representation = timed(
+                'serialize', serializer.to_representation
+            )
+        return serializer
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if current_timer() is not None and hasattr(response, 'render'):
+            # Render here rather than in the handler, to time it
+            with phase('render'):
+                response.render()
+        return response
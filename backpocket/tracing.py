@@ -0,0 +1,63 @@
+"""
+Permission decision tracing for requests.
+
+PermissionTraceMiddleware traces the permission checks made by a
+SAMPLE_RATE fraction of requests (see obj_perms.tracing), keeping the
+latest MAX_DECISIONS of them, and attaches the trace to the request as
+permission_trace. Responses refused with 403 or 404 get a log line per
+denied check, saying how it was decided: which backend and checker,
+whether a default was used for want of a checker, and whether general
+permissions were consulted. Untraced requests pay one random() call;
+with PERMISSION_TRACE['ENABLED'] off, none at all.
+"""
+import logging, random
+
+from django.conf import settings
+from obj_perms.tracing import trace_permissions
+
+
+logger = logging.getLogger('backpocket.permissions')
+
+
+def _setting(name, default):
+    return getattr(settings, 'PERMISSION_TRACE', {}).get(name, default)
+
+
+class PermissionTraceMiddleware:
+    """
+    Traces a sample of requests' permission checks, logging denials
+    explained, as configured by the PERMISSION_TRACE setting.
+    """
+    DENIED_STATUSES = (403, 404)
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = _setting('ENABLED', False)
+        self.sample_rate = _setting('SAMPLE_RATE', 0.0)
+        self.max_decisions = _setting('MAX_DECISIONS', 100)
+
+    def __call__(self, request):
+        if not self.enabled or random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        with trace_permissions(self.max_decisions) as trace:
+            request.permission_trace = trace
+            response = self.get_response(request)
+
+        if response.status_code in self.DENIED_STATUSES:
+            self.log(request, response, trace)
+        return response
+
+    def log(self, request, response, trace):
+        denials = trace.denials()
+        if not denials:
+            return
+        prefix = '{0} {1} {2}'.format(
+            request.method, request.path, response.status_code
+        )
+        for decision in denials:
+            logger.warning('%s: %s', prefix, decision.explain())
+        if trace.dropped:
+            logger.warning(
+                '%s: %d earlier decisions not kept', prefix, trace.dropped
+            )
@@ -19,4 +19,5 @@ from django.contrib import admin
 urlpatterns = [
     url(r'^api/', include('backpocket.api.urls')),
     url(r'^admin/', admin.site.urls),
+    url(r'^', include('backpocket.portal.urls')),
 ]
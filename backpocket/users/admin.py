@@ -1,10 +1,15 @@
 from django import forms
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
 from django.contrib.auth.models import Group
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.forms import ReadOnlyPasswordHashField
 from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
 
+from backpocket.audit.log import audit_log
+from . import bulk
+from .filters import search_users
 from .models import User
 
 
@@ -78,6 +83,15 @@ class UserChangeForm(forms.ModelForm):
     #     return self.initial["password"]
 
 
+class UserActionForm(helpers.ActionForm):
+    """
+    Action form with a group choice, for the group membership actions.
+    """
+    group = forms.ModelChoiceField(
+        queryset=Group.objects.order_by('name'), required=False
+    )
+
+
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
     # The forms to add and change user instances
@@ -96,7 +110,7 @@ class UserAdmin(BaseUserAdmin):
         ),
         (
             'Personal info',
-            {'fields': ('username', 'name', 'email',)}
+            {'fields': ('username', 'name', 'email', 'parent',)}
         ),
         (
             'Permissions',
@@ -123,11 +137,17 @@ class UserAdmin(BaseUserAdmin):
     search_fields = ('name', 'username', 'email')
     ordering = ('name', 'username', 'email')
     filter_horizontal = ('user_permissions', 'groups',)
+    raw_id_fields = ('parent',)
 
     readonly_fields = ('id', 'date_joined', 'last_login',)
+    action_form = UserActionForm
+    actions = [
+        'activate_users', 'deactivate_users',
+        'add_to_group', 'remove_from_group', 'delete_selected',
+    ]
     _readonly_field_perms = {
         'set_user_active': ('is_active',),
-        'change_user_groups': ('groups',),
+        'change_user_groups': ('groups', 'parent',),
         'change_user_permissions': ('user_permissions',),
         'change_user': ('username', 'name', 'email',),
     }
@@ -142,6 +162,12 @@ class UserAdmin(BaseUserAdmin):
 
         return readonly
 
+    def get_search_results(self, request, queryset, search_term):
+        # Indexed prefix search instead of icontains over search_fields
+        if not search_term.strip():
+            return queryset, False
+        return search_users(queryset, search_term), False
+
     def get_form(self, request, obj=None, **kwargs):
         getter = super().get_form(request, obj, **kwargs)
         requser = request.user
@@ -155,13 +181,23 @@ class UserAdmin(BaseUserAdmin):
     def save_model(self, request, obj, form, change):
         # Make sure we can add/change given new obj
         if change:
-            if not request.user.has_perm('bp_users.change_user', obj):
-                raise PermissionDenied
+            perm = 'bp_users.change_user'
         else:
-            if not request.user.has_perm('bp_users.add_user', obj):
-                raise PermissionDenied
+            perm = 'bp_users.add_user'
+        if not request.user.has_perm(perm, obj):
+            raise PermissionDenied
 
-        return super().save_model(request, obj, form, change)
+        result = super().save_model(request, obj, form, change)
+        # Field names only; the password fields' values never
+        fields = sorted({
+            'password' if name.startswith('password') else name
+            for name in form.changed_data
+        })
+        audit_log.record(
+            request.user, 'user.change' if change else 'user.add',
+            [obj.pk], permission=perm, fields=fields,
+        )
+        return result
 
     def has_add_permission(self, request):
         return request.user.has_perm('bp_users.add_user')
@@ -172,3 +208,86 @@ class UserAdmin(BaseUserAdmin):
     def has_delete_permission(self, request, obj=None):
         return request.user.has_perm('bp_users.delete_user', obj)
 
+    # Bulk actions, checked and applied per selection rather than
+    # per user (see backpocket.users.bulk)
+
+    def _report(self, request, result, verb):
+        count = len(result.changed)
+        self.message_user(request, '{0} {1} user{2}.'.format(
+            verb.capitalize(), count, '' if count == 1 else 's'
+        ))
+        if result.refused:
+            names = list(
+                User.objects.filter(pk__in=result.refused[:20])
+                .values_list('username', flat=True)
+            )
+            more = len(result.refused) - len(names)
+            self.message_user(request, 'Not permitted for: {0}{1}'.format(
+                ', '.join(names),
+                ' and {0} more'.format(more) if more else '',
+            ), messages.WARNING)
+
+    def _selected_group(self, request):
+        try:
+            group = self.action_form.base_fields['group'].clean(
+                request.POST.get('group')
+            )
+        except forms.ValidationError:
+            group = None
+        if group is None:
+            self.message_user(
+                request, 'Choose a group for this action.', messages.ERROR
+            )
+        return group
+
+    def activate_users(self, request, queryset):
+        result = bulk.set_active(request.user, queryset, True)
+        self._report(request, result, 'activated')
+    activate_users.short_description = 'Activate selected users'
+
+    def deactivate_users(self, request, queryset):
+        result = bulk.set_active(request.user, queryset, False)
+        self._report(request, result, 'deactivated')
+    deactivate_users.short_description = 'Deactivate selected users'
+
+    def add_to_group(self, request, queryset):
+        group = self._selected_group(request)
+        if group is not None:
+            result = bulk.add_to_group(request.user, queryset, group)
+            self._report(request, result, 'added to {0}:'.format(group))
+    add_to_group.short_description = 'Add selected users to group'
+
+    def remove_from_group(self, request, queryset):
+        group = self._selected_group(request)
+        if group is not None:
+            result = bulk.remove_from_group(request.user, queryset, group)
+            self._report(request, result, 'removed from {0}:'.format(group))
+    remove_from_group.short_description = 'Remove selected users from group'
+
+    def delete_selected(self, request, queryset):
+        # Replaces the stock action, which collects and lists every
+        # related object before asking for confirmation
+        if request.POST.get('post'):
+            result = bulk.delete_users(request.user, queryset)
+            self._report(request, result, 'deleted')
+            return None
+
+        allowed, refused = bulk.permitted(
+            request.user, 'bp_users.delete_user', queryset
+        )
+        context = dict(
+            self.admin_site.each_context(request),
+            title='Are you sure?',
+            opts=self.model._meta,
+            queryset=queryset,
+            allowed=len(allowed),
+            refused=len(refused),
+            action_checkbox_name=helpers.ACTION_CHECKBOX_NAME,
+            selected=queryset.values_list('pk', flat=True),
+        )
+        request.current_app = self.admin_site.name
+        return TemplateResponse(
+            request, 'admin/bp_users/user/bulk_delete_confirmation.html',
+            context
+        )
+    delete_selected.short_description = 'Delete selected users'
@@ -5,3 +5,7 @@ class UsersConfig(AppConfig):
     name = 'backpocket.users'
     label = 'bp_users'
     verbose_name = 'User Details and Authorization'
+
+    def ready(self):
+        from backpocket.users.authentication import connect_signals
+        connect_signals()
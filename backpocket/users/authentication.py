@@ -0,0 +1,251 @@
+"""
+API key authentication.
+
+Keys are resolved through a small in-process LRU, then the shared
+cache, then the database. Cache entries hold only the key's ID, user
+ID, scopes and expiry, never the user itself; the user is loaded by
+primary key per request, as session authentication does. Shared cache
+entries are dropped when a key is revoked or its user changes;
+in-process entries expire after a few seconds so other workers pick up
+revocations quickly. Last-used times are collected in memory and
+written in batches.
+"""
+import atexit, collections, threading, time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Case, When, Value
+from django.db.models.signals import post_save, post_delete
+from rest_framework import exceptions
+from rest_framework.authentication import (
+    BaseAuthentication, get_authorization_header
+)
+from rest_framework.permissions import SAFE_METHODS
+from backpocket.users.models import User, APIKey
+from backpocket.users.signals import users_updated
+from backpocket.utils import utcnow
+
+
+def _setting(name, default):
+    return getattr(settings, 'API_KEY_AUTH', {}).get(name, default)
+
+
+CACHE_PREFIX = 'apikey:'
+
+# Cached key details, enough to check a key without the database
+CachedKey = collections.namedtuple(
+    'CachedKey', ('id', 'user_id', 'scopes', 'expires')
+)
+
+
+class LocalKeyCache:
+    """
+    Thread-safe LRU with per-entry expiry.
+    """
+
+    def __init__(self, maxsize=1024, ttl=10):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class LastUsedRecorder:
+    """
+    Collects last-used times per key and writes them in one UPDATE
+    once the flush interval has passed. Times are only as precise as
+    the interval, which is plenty for "last used" display.
+    """
+
+    def __init__(self, interval=60):
+        self.interval = interval
+        self._pending = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, key_id, when):
+        with self._lock:
+            self._pending[key_id] = when
+            due = time.monotonic() - self._last_flush >= self.interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+        return APIKey.objects.filter(pk__in=pending).update(
+            last_used=Case(
+                *(When(pk=pk, then=Value(when))
+                  for pk, when in pending.items()),
+                output_field=APIKey._meta.get_field('last_used')
+            )
+        )
+
+
+local_cache = LocalKeyCache(
+    maxsize=_setting('LOCAL_CACHE_SIZE', 1024),
+    ttl=_setting('LOCAL_CACHE_TTL', 10),
+)
+
+last_used = LastUsedRecorder(interval=_setting('LAST_USED_INTERVAL', 60))
+
+# Best effort on clean shutdown; at worst a minute's worth is lost
+atexit.register(last_used.flush)
+
+
+def shared_cache():
+    return caches[_setting('CACHE', 'default')]
+
+
+def resolve_key(key_hash):
+    '''Returns CachedKey for the given key hash, or None if the key
+    doesn't exist, is revoked, or belongs to an inactive user.
+    '''
+    cached = local_cache.get(key_hash)
+    if cached is not None:
+        return cached
+
+    cache = shared_cache()
+    cached = cache.get(CACHE_PREFIX + key_hash)
+    if cached is None:
+        try:
+            apikey = APIKey.objects.get(
+                key_hash=key_hash, is_revoked=False, user__is_active=True
+            )
+        except APIKey.DoesNotExist:
+            return None
+        cached = CachedKey(
+            id=apikey.id,
+            user_id=apikey.user_id,
+            scopes=apikey.get_scopes(),
+            expires=apikey.expires,
+        )
+        cache.set(
+            CACHE_PREFIX + key_hash, cached,
+            timeout=_setting('CACHE_TIMEOUT', 300)
+        )
+
+    local_cache.set(key_hash, cached)
+    return cached
+
+
+def invalidate_keys(key_hashes):
+    key_hashes = list(key_hashes)
+    for key_hash in key_hashes:
+        local_cache.delete(key_hash)
+    shared_cache().delete_many([CACHE_PREFIX + h for h in key_hashes])
+
+
+def _handle_key_change(sender, instance, **kwargs):
+    invalidate_keys([instance.key_hash])
+
+
+def _handle_user_change(sender, instance, created=False, **kwargs):
+    # Covers deactivation
+    if not created:
+        invalidate_keys(
+            APIKey.objects.filter(user=instance)
+            .values_list('key_hash', flat=True)
+        )
+
+
+def _handle_users_updated(sender, user_ids, **kwargs):
+    invalidate_keys(
+        APIKey.objects.filter(user__in=user_ids)
+        .values_list('key_hash', flat=True)
+    )
+
+
+def connect_signals():
+    post_save.connect(
+        _handle_key_change, sender=APIKey, dispatch_uid='bp_apikey_save'
+    )
+    post_delete.connect(
+        _handle_key_change, sender=APIKey, dispatch_uid='bp_apikey_delete'
+    )
+    post_save.connect(
+        _handle_user_change, sender=User, dispatch_uid='bp_apikey_user'
+    )
+    users_updated.connect(
+        _handle_users_updated, dispatch_uid='bp_apikey_users_updated'
+    )
+
+
+class APIKeyAuthentication(BaseAuthentication):
+    """
+    Authenticate with an 'Authorization: Key <key>' header.
+    Keys with only the 'read' scope may not make unsafe requests.
+    """
+    keyword = 'Key'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed(
+                'Invalid key header. Key must be given without spaces.'
+            )
+
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed('Invalid key.')
+
+        cached = resolve_key(APIKey.hash_key(key))
+        if cached is None:
+            raise exceptions.AuthenticationFailed('Invalid key.')
+
+        now = utcnow()
+        if cached.expires is not None and cached.expires <= now:
+            raise exceptions.AuthenticationFailed('Key has expired.')
+
+        required = 'read' if request.method in SAFE_METHODS else 'write'
+        if required not in cached.scopes:
+            raise exceptions.PermissionDenied(
+                "Key lacks the '{0}' scope.".format(required)
+            )
+
+        try:
+            user = User.objects.get(pk=cached.user_id, is_active=True)
+        except User.DoesNotExist:
+            # Deactivated since the entry was cached
+            raise exceptions.AuthenticationFailed('Invalid key.')
+
+        last_used.record(cached.id, now)
+        return (user, cached)
+
+    def authenticate_header(self, request):
+        return self.keyword
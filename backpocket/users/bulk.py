@@ -0,0 +1,145 @@
+# Set-based changes to many users at once
+#
+# Permission checks for the whole selection are one filtered query
+# through the object permissions backend, rather than a has_perm()
+# call per user; changes are then one UPDATE, bulk insert or delete
+# per chunk. Queryset updates and through-row inserts send no model
+# signals, so the equivalent signals are sent per chunk instead.
+
+import collections
+from django.db import transaction
+from django.db.models.signals import m2m_changed
+from backpocket.audit.log import audit_log
+from backpocket.users.backends import ObjectPermissionsBackend
+from backpocket.users.models import User
+from backpocket.users.signals import users_updated
+
+
+# Keeps IN lists within SQLite's bound parameter limit
+CHUNK_SIZE = 500
+
+BulkResult = collections.namedtuple('BulkResult', ('changed', 'refused'))
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def permitted(user, perm, queryset):
+    '''Splits queryset into primary keys user has perm on and those
+    refused, in two queries regardless of selection size.
+    '''
+    allowed = set(
+        ObjectPermissionsBackend()
+        .filter_queryset(user, perm, queryset)
+        .values_list('pk', flat=True)
+    )
+    selected = list(queryset.values_list('pk', flat=True))
+    return (
+        [pk for pk in selected if pk in allowed],
+        [pk for pk in selected if pk not in allowed],
+    )
+
+
+def set_active(user, queryset, is_active):
+    '''Activates or deactivates the selected users user may change.
+    Returns BulkResult of changed and refused primary keys.
+    '''
+    ids, refused = permitted(user, 'bp_users.set_user_active', queryset)
+    changed = []
+    with transaction.atomic():
+        for chunk in _chunks(ids):
+            rows = User.objects.filter(pk__in=chunk).exclude(
+                is_active=is_active
+            )
+            chunk = list(rows.values_list('pk', flat=True))
+            if chunk:
+                User.objects.filter(pk__in=chunk).update(is_active=is_active)
+                users_updated.send(sender=User, user_ids=chunk)
+                audit_log.record(
+                    user, 'user.activate' if is_active else 'user.deactivate',
+                    chunk, permission='bp_users.set_user_active',
+                )
+                changed.extend(chunk)
+    return BulkResult(changed, refused)
+
+
+def add_to_group(user, queryset, group):
+    '''Adds the selected users user may change to group. Returns
+    BulkResult of newly added and refused primary keys.
+    '''
+    ids, refused = permitted(user, 'bp_users.change_user_groups', queryset)
+    through = User.groups.through
+    changed = []
+    with transaction.atomic():
+        for chunk in _chunks(ids):
+            members = set(
+                through.objects.filter(group=group, user_id__in=chunk)
+                .values_list('user_id', flat=True)
+            )
+            chunk = [pk for pk in chunk if pk not in members]
+            if not chunk:
+                continue
+            through.objects.bulk_create(
+                through(group=group, user_id=pk) for pk in chunk
+            )
+            _membership_changed('post_add', group, chunk)
+            audit_log.record(
+                user, 'user.add_to_group', chunk,
+                permission='bp_users.change_user_groups', group=group.name,
+            )
+            changed.extend(chunk)
+    return BulkResult(changed, refused)
+
+
+def remove_from_group(user, queryset, group):
+    '''Removes the selected users user may change from group. Returns
+    BulkResult of removed and refused primary keys.
+    '''
+    ids, refused = permitted(user, 'bp_users.change_user_groups', queryset)
+    through = User.groups.through
+    changed = []
+    with transaction.atomic():
+        for chunk in _chunks(ids):
+            rows = through.objects.filter(group=group, user_id__in=chunk)
+            chunk = list(rows.values_list('user_id', flat=True))
+            if not chunk:
+                continue
+            through.objects.filter(
+                group=group, user_id__in=chunk
+            ).delete()
+            _membership_changed('post_remove', group, chunk)
+            audit_log.record(
+                user, 'user.remove_from_group', chunk,
+                permission='bp_users.change_user_groups', group=group.name,
+            )
+            changed.extend(chunk)
+    return BulkResult(changed, refused)
+
+
+def _membership_changed(action, group, user_ids):
+    # As group.user_set.add()/remove() would send, for the sharing
+    # access index; group permissions also change is_staff
+    m2m_changed.send(
+        sender=User.groups.through, instance=group, action=action,
+        reverse=True, model=User, pk_set=set(user_ids),
+        using=User.objects.db,
+    )
+    users_updated.send(sender=User, user_ids=user_ids)
+
+
+def delete_users(user, queryset):
+    '''Deletes the selected users user may delete. Returns BulkResult
+    of deleted and refused primary keys.
+    '''
+    ids, refused = permitted(user, 'bp_users.delete_user', queryset)
+    with transaction.atomic():
+        for chunk in _chunks(ids):
+            User.objects.filter(pk__in=chunk).delete()
+            audit_log.record(
+                user, 'user.delete', chunk,
+                permission='bp_users.delete_user',
+            )
+    return BulkResult(ids, refused)
@@ -0,0 +1,65 @@
+# Effective permissions, resolved in bulk
+#
+# ModelBackend answers "what can this user do" with separate queries
+# for direct and group permissions, per user, and the object backend
+# with a check per permission per object. These resolve general
+# permissions for any number of users in one query over both tables,
+# and object permissions for a whole queryset in one query with a
+# subquery per permission.
+
+import collections
+from django.contrib.auth.models import Permission
+from backpocket.users.backends import ObjectPermissionsBackend
+
+
+def general_permissions(users):
+    '''Returns dict of user primary key to set of 'app_label.codename'
+    permissions held directly or through groups. Also fills each
+    user's ModelBackend cache, so later has_perm() calls without an
+    object need no queries.
+    '''
+    users = [user for user in users if user.is_authenticated]
+    perms = collections.defaultdict(set)
+
+    ids = [
+        user.pk for user in users
+        if user.is_active and not user.is_superuser
+    ]
+    if ids:
+        direct = Permission.objects.filter(
+            user__in=ids
+        ).values_list('user', 'content_type__app_label', 'codename')
+        via_groups = Permission.objects.filter(
+            group__user__in=ids
+        ).values_list('group__user', 'content_type__app_label', 'codename')
+        rows = direct.order_by().union(via_groups.order_by())
+        for user_id, app_label, codename in rows:
+            perms[user_id].add('{0}.{1}'.format(app_label, codename))
+
+    if any(user.is_active and user.is_superuser for user in users):
+        every = {
+            '{0}.{1}'.format(app_label, codename)
+            for app_label, codename in Permission.objects.values_list(
+                'content_type__app_label', 'codename'
+            ).order_by()
+        }
+        for user in users:
+            if user.is_active and user.is_superuser:
+                perms[user.pk] = set(every)
+
+    result = {}
+    for user in users:
+        result[user.pk] = perms.get(user.pk, set())
+        user._perm_cache = set(result[user.pk])
+    return result
+
+
+def object_permissions(user, queryset):
+    '''Returns dict of primary key to set of permissions user holds on
+    each object in queryset, general permissions included.
+    '''
+    if not hasattr(user, '_perm_cache'):
+        general_permissions([user])
+    return ObjectPermissionsBackend().get_queryset_permissions(
+        user, queryset
+    )
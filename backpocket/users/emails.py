@@ -0,0 +1,34 @@
+# Account emails, queued through the mail outbox
+
+from django.contrib.auth.tokens import default_token_generator
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+
+def send_password_reset(user, request):
+    '''Queues a password reset link for user, valid until the user's
+    password or last login changes.
+    '''
+    path = reverse('portal:password-reset-confirm', kwargs={
+        'uidb64': urlsafe_base64_encode(force_bytes(user.pk)).decode(),
+        'token': default_token_generator.make_token(user),
+    })
+    user.email_user(
+        'Backpocket password reset',
+        render_to_string('users/email/password_reset.txt', {
+            'user': user,
+            'reset_url': request.build_absolute_uri(path),
+        }),
+    )
+
+
+def send_active_notice(user):
+    '''Queues notice of account activation or deactivation.'''
+    user.email_user(
+        'Backpocket account {0}'.format(
+            'activated' if user.is_active else 'deactivated'
+        ),
+        render_to_string('users/email/account_active.txt', {'user': user}),
+    )
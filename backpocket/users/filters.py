@@ -0,0 +1,37 @@
+from django.db.models import Q
+from rest_framework.filters import BaseFilterBackend
+from backpocket.users.models import User
+
+
+# Sorts after any other character, as the upper bound for a prefix
+_MAX_CHAR = '\U0010ffff'
+
+
+def search_users(queryset, search_term):
+    '''Filters user queryset to users whose name, username or email
+    starts with every word of search_term, case-insensitively.
+    Uses range comparisons on the lowercased search columns so each
+    word is an index range scan rather than a LIKE over every row.
+    '''
+    for word in search_term.lower().split():
+        condition = Q()
+        for search_field in User.SEARCH_FIELDS.values():
+            condition |= Q(**{
+                search_field + '__gte': word,
+                search_field + '__lt': word + _MAX_CHAR,
+            })
+        queryset = queryset.filter(condition)
+    return queryset
+
+
+class UserSearchFilter(BaseFilterBackend):
+    """
+    Prefix search on users via the 'search' query parameter.
+    """
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        search_term = request.query_params.get(self.search_param, '')
+        if not search_term.strip():
+            return queryset
+        return search_users(queryset, search_term)
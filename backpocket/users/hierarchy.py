@@ -0,0 +1,162 @@
+# Sub-user hierarchy, backed by the UserAncestry closure table
+#
+# Each user has at most one parent; the closure table holds every
+# (ancestor, descendant) pair, so ancestry checks are one indexed
+# lookup and "owned by me or my sub-users" is one join. Moving any
+# number of subtrees takes a fixed number of statements, regardless
+# of their size or depth.
+
+from django.apps import apps
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+
+
+def _models():
+    return (
+        apps.get_model('bp_users', 'User'),
+        apps.get_model('bp_users', 'UserAncestry'),
+    )
+
+
+def _pk(user):
+    return getattr(user, 'pk', user)
+
+
+def is_ancestor(ancestor, user):
+    '''Checks whether ancestor is a parent of user, at any depth.
+    Both may be given as users or primary keys.
+    '''
+    ancestor, user = _pk(ancestor), _pk(user)
+    if ancestor is None or user is None:
+        return False
+    _, UserAncestry = _models()
+    return UserAncestry.objects.filter(
+        ancestor_id=ancestor, descendant_id=user
+    ).exists()
+
+
+def subusers(user):
+    '''Returns values queryset of primary keys of all of user's
+    sub-users, at any depth, for use as a subquery.
+    '''
+    _, UserAncestry = _models()
+    return UserAncestry.objects.filter(
+        ancestor_id=_pk(user)
+    ).values('descendant_id')
+
+
+def ancestors(user):
+    '''Returns values queryset of primary keys of user's parent,
+    grandparent and so on, for use as a subquery.
+    '''
+    _, UserAncestry = _models()
+    return UserAncestry.objects.filter(
+        descendant_id=_pk(user)
+    ).values('ancestor_id')
+
+
+def check_reparent(root_ids, parent_id):
+    '''Raises ValidationError if moving the given users under parent
+    would create a cycle.
+    '''
+    if parent_id is None:
+        return
+    root_ids = set(root_ids)
+    _, UserAncestry = _models()
+    if parent_id in root_ids or UserAncestry.objects.filter(
+            ancestor_id__in=root_ids, descendant_id=parent_id).exists():
+        raise ValidationError(
+            'A user cannot be placed under itself or its own sub-users.'
+        )
+
+
+def move_subtrees(root_ids, parent_id):
+    '''Updates the closure table after the given users have been moved
+    under parent (or made top-level, if parent is None), bringing
+    their sub-users along. Parent fields must already be updated.
+    '''
+    User, UserAncestry = _models()
+    root_ids = list(root_ids)
+    if not root_ids:
+        return
+
+    prep = lambda value: User._meta.pk.get_db_prep_value(value, connection)
+    qn = connection.ops.quote_name
+    table = qn(UserAncestry._meta.db_table)
+    user_table = qn(User._meta.db_table)
+    roots = [prep(pk) for pk in root_ids]
+    in_roots = ', '.join(['%s'] * len(roots))
+
+    # Subtrees of the roots, with each node's depth below its root
+    subtree_sql = (
+        'SELECT descendant_id AS node, ancestor_id AS root, depth '
+        'FROM {table} WHERE ancestor_id IN ({in_roots}) '
+        'UNION ALL SELECT id, id, 0 FROM {user_table} '
+        'WHERE id IN ({in_roots})'
+    ).format(table=table, user_table=user_table, in_roots=in_roots)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Cut each root from its old ancestors: drop every pair whose
+        # path runs through a root's old parent link
+        cursor.execute(
+            'DELETE FROM {table} WHERE id IN ('
+            'SELECT x.id FROM {table} x '
+            'JOIN ({subtree}) s ON x.descendant_id = s.node '
+            'JOIN {table} up ON up.descendant_id = s.root '
+            'AND up.ancestor_id = x.ancestor_id'
+            ')'.format(table=table, subtree=subtree_sql),
+            roots + roots
+        )
+        if parent_id is None:
+            return
+
+        # Join each detached subtree to the new parent and its ancestors
+        parent = prep(parent_id)
+        cursor.execute(
+            'INSERT INTO {table} (ancestor_id, descendant_id, depth) '
+            'SELECT a.node, s.node, a.depth + s.depth + 1 FROM ('
+            'SELECT ancestor_id AS node, depth FROM {table} '
+            'WHERE descendant_id = %s '
+            'UNION ALL SELECT %s, 0'
+            ') a, ({subtree}) s'.format(table=table, subtree=subtree_sql),
+            [parent, parent] + roots + roots
+        )
+
+
+def reparent(users, parent):
+    '''Moves the given users, with all their sub-users, under parent
+    (a user, primary key, or None for top-level). Returns the number
+    of users moved.
+    '''
+    User, _ = _models()
+    root_ids = {_pk(user) for user in users}
+    parent_id = _pk(parent)
+    check_reparent(root_ids, parent_id)
+    with transaction.atomic():
+        count = User.objects.filter(pk__in=root_ids).update(
+            parent_id=parent_id
+        )
+        move_subtrees(root_ids, parent_id)
+    return count
+
+
+def rebuild():
+    '''Rebuilds the closure table from users' parent fields.'''
+    User, UserAncestry = _models()
+    qn = connection.ops.quote_name
+    table = qn(UserAncestry._meta.db_table)
+    user_table = qn(User._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('DELETE FROM {0}'.format(table))
+        cursor.execute(
+            'WITH RECURSIVE tree(ancestor_id, descendant_id, depth) AS ('
+            'SELECT parent_id, id, 1 FROM {users} '
+            'WHERE parent_id IS NOT NULL '
+            'UNION ALL SELECT u.parent_id, t.descendant_id, t.depth + 1 '
+            'FROM tree t JOIN {users} u ON u.id = t.ancestor_id '
+            'WHERE u.parent_id IS NOT NULL'
+            ') INSERT INTO {table} (ancestor_id, descendant_id, depth) '
+            'SELECT ancestor_id, descendant_id, depth FROM tree'.format(
+                table=table, users=user_table
+            )
+        )
@@ -0,0 +1,44 @@
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from backpocket.users.models import User, APIKey
+from backpocket.utils import utcnow
+
+
+class Command(BaseCommand):
+    help = 'Creates an API key for a user and prints it once.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--name', default='')
+        parser.add_argument(
+            '--scope', action='append', dest='scopes',
+            choices=APIKey.SCOPES,
+            help='Scope to grant; repeat for several (default "read").',
+        )
+        parser.add_argument(
+            '--expires-days', type=int, default=None,
+            help='Days until the key expires (default never).',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get_by_natural_key(options['username'])
+        except User.DoesNotExist:
+            raise CommandError(
+                "User '{0}' does not exist".format(options['username'])
+            )
+
+        expires = None
+        if options['expires_days'] is not None:
+            expires = utcnow() + datetime.timedelta(
+                days=options['expires_days']
+            )
+
+        apikey, key = APIKey.objects.create_key(
+            user,
+            name=options['name'],
+            scopes=options['scopes'] or ('read',),
+            expires=expires,
+        )
+        self.stdout.write('Key ID: {0}'.format(apikey.id))
+        self.stdout.write('Key: {0}'.format(key))
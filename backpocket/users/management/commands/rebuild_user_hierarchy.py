@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from backpocket.users import hierarchy
+from backpocket.users.models import UserAncestry
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the sub-user closure table from parent fields.'
+
+    def handle(self, *args, **options):
+        hierarchy.rebuild()
+        self.stdout.write(
+            'Rebuilt {0} ancestry row(s)'.format(UserAncestry.objects.count())
+        )
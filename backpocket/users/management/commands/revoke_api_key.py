@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+from backpocket.users.models import APIKey
+
+
+class Command(BaseCommand):
+    help = 'Revokes an API key by its ID.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('key_id')
+
+    def handle(self, *args, **options):
+        try:
+            apikey = APIKey.objects.get(pk=options['key_id'])
+        except (APIKey.DoesNotExist, ValueError):
+            raise CommandError(
+                "API key '{0}' does not exist".format(options['key_id'])
+            )
+        apikey.revoke()
+        self.stdout.write('Revoked key {0}'.format(apikey.id))
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 14:31
+from __future__ import unicode_literals
+
+import backpocket.utils
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bp_users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='APIKey',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, verbose_name='key ID')),
+                ('name', models.CharField(blank=True, max_length=150, verbose_name='name')),
+                ('prefix', models.CharField(editable=False, max_length=8, verbose_name='prefix')),
+                ('key_hash', models.CharField(editable=False, max_length=64, unique=True, verbose_name='key hash')),
+                ('scopes', models.CharField(default='read', max_length=150, verbose_name='scopes')),
+                ('date_created', models.DateTimeField(default=backpocket.utils.utcnow, verbose_name='date created')),
+                ('expires', models.DateTimeField(blank=True, null=True, verbose_name='expires')),
+                ('last_used', models.DateTimeField(blank=True, null=True, verbose_name='last used')),
+                ('is_revoked', models.BooleanField(default=False, verbose_name='revoked')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='api_keys', to=settings.AUTH_USER_MODEL, verbose_name='user')),
+            ],
+            options={
+                'verbose_name': 'API key',
+                'verbose_name_plural': 'API keys',
+                'db_table': 'bp_user_apikey',
+            },
+        ),
+    ]
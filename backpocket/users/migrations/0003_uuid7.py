@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 14:32
+from __future__ import unicode_literals
+
+import backpocket.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bp_users', '0002_apikey'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='apikey',
+            name='id',
+            field=models.UUIDField(default=backpocket.utils.uuid7, editable=False, primary_key=True, serialize=False, verbose_name='key ID'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='id',
+            field=models.UUIDField(default=backpocket.utils.uuid7, editable=False, primary_key=True, serialize=False, verbose_name='user ID'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 14:32
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def populate_search_fields(apps, schema_editor):
+    # Lowercased in Python as User.save() does; SQLite's LOWER() only
+    # folds ASCII
+    User = apps.get_model('bp_users', 'User')
+    users = User.objects.using(schema_editor.connection.alias)
+    rows = users.values_list('pk', 'name', 'username', 'email')
+    for pk, name, username, email in rows.iterator():
+        users.filter(pk=pk).update(
+            search_name=(name or '').lower(),
+            search_username=(username or '').lower(),
+            search_email=(email or '').lower(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bp_users', '0003_uuid7'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='search_email',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=254),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='search_name',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=150),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='search_username',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=32),
+        ),
+        migrations.AlterIndexTogether(
+            name='user',
+            index_together=set([('name', 'username', 'email')]),
+        ),
+        migrations.RunPython(populate_search_fields, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 14:37
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bp_users', '0004_user_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserAncestry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField(verbose_name='depth')),
+            ],
+            options={
+                'verbose_name': 'user ancestry',
+                'verbose_name_plural': 'user ancestries',
+                'db_table': 'bp_user_ancestry',
+            },
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to=settings.AUTH_USER_MODEL, verbose_name='parent user'),
+        ),
+        migrations.AddField(
+            model_name='userancestry',
+            name='ancestor',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='ancestor'),
+        ),
+        migrations.AddField(
+            model_name='userancestry',
+            name='descendant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='descendant'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='userancestry',
+            unique_together=set([('ancestor', 'descendant')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='userancestry',
+            index_together=set([('descendant', 'ancestor')]),
+        ),
+    ]
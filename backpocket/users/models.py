@@ -1,18 +1,46 @@
-import datetime, uuid
+import datetime, hashlib
 from django.db import models, transaction
+from django.db.models import Exists, OuterRef
 from django.contrib.auth.models import (
-    AbstractBaseUser, BaseUserManager, PermissionsMixin, Group
+    AbstractBaseUser, BaseUserManager, PermissionsMixin, Group, Permission
 )
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.core.validators import validate_email
 from django.core.exceptions import (
     ObjectDoesNotExist, ValidationError, PermissionDenied
 )
-from django.core.mail import send_mail
-from backpocket.utils import validuuid, utcnow
+from django.utils.crypto import get_random_string
+from backpocket.mail.outbox import queue_mail
+from backpocket.sharing.access import has_access, accessible
+from backpocket.users.hierarchy import (
+    is_ancestor, subusers, check_reparent, move_subtrees
+)
+from backpocket.utils import validuuid, utcnow, uuid7
+
+
+# Stands in for a parent that wasn't loaded from the database
+_UNKNOWN = object()
 
 
-class UserManager(BaseUserManager):
+class UserQuerySet(models.QuerySet):
+
+    def with_staff_status(self):
+        '''Annotates whether each user holds the admin permission,
+        directly or through a group, so is_staff needs no per-user
+        permission queries.
+        '''
+        perms = Permission.objects.filter(
+            content_type__app_label='bp_users', codename='view_admin'
+        )
+        return self.annotate(
+            _admin_perm=Exists(perms.filter(user=OuterRef('pk'))),
+            _group_admin_perm=Exists(
+                perms.filter(group__user=OuterRef('pk'))
+            ),
+        )
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
 
     use_in_migrations = True
 
@@ -61,8 +89,10 @@ class UserObjectPermissions:
         return False
 
     def _is_admin_or_self(self, user, obj):
-        # TODO: add parent-user check for sub-users (eventually)
-        return user.is_staff or self._is_self(user, obj)
+        return (
+            user.is_staff or self._is_self(user, obj) or
+            (isinstance(obj, User) and is_ancestor(user.id, obj.id))
+        )
 
     def add_user(self, user, obj):
         return False
@@ -74,8 +104,7 @@ class UserObjectPermissions:
         return self._is_self(user, obj)
 
     def view_user(self, user, obj):
-        # TODO: add is_public and/or friends field checks (eventually)
-        return self._is_admin_or_self(user, obj)
+        return self._is_admin_or_self(user, obj) or has_access(user, obj)
 
     def view_admin(self, user, obj):
         return False
@@ -89,6 +118,10 @@ class UserObjectPermissions:
     def reset_user_password(self, user, obj):
         return self._is_admin_or_self(user, obj)
 
+    def view_user_permissions(self, user, obj):
+        # Not view_user, which also covers users shared with user
+        return self._is_admin_or_self(user, obj)
+
     def change_user_groups(self, user, obj):
         return False
 
@@ -97,25 +130,68 @@ class UserObjectPermissions:
 
 
 class UserObjectPermissionFilters:
-    # TODO: flesh out
+    # Mirrors UserObjectPermissions, for checking whole querysets
 
-    def _admin_all_user_own(self, user, queryset):
-        model = queryset.model
+    def _self(self, user, queryset):
+        if queryset.model == User:
+            return queryset.filter(pk=user.id)
+        return queryset.none()
 
+    def _admin_all_self_subusers(self, user, queryset):
         if user.is_staff:
             # TODO: disallow admins from viewing superusers?
             return queryset
 
-        if model == User:
-            # TODO: add parent-user check for sub-users (eventually)
-            # TODO: add is_public and/or friends field checks (eventually)
-            return queryset.filter(pk=user.id)
+        if queryset.model == User:
+            return (
+                queryset.filter(pk=user.id) |
+                queryset.filter(pk__in=subusers(user.id))
+            )
 
         return queryset.none()
 
+    def _admin_all_user_own(self, user, queryset):
+        if user.is_staff or queryset.model != User:
+            return self._admin_all_self_subusers(user, queryset)
+
+        return (
+            self._admin_all_self_subusers(user, queryset) |
+            queryset.filter(pk__in=accessible(user, User))
+        )
+
+    def change_user(self, user, queryset):
+        return self._self(user, queryset)
+
+    def delete_user(self, user, queryset):
+        return self._self(user, queryset)
+
     def view_user(self, user, queryset):
         return self._admin_all_user_own(user, queryset)
 
+    def set_user_active(self, user, queryset):
+        return self._admin_all_self_subusers(user, queryset)
+
+    def reset_user_password(self, user, queryset):
+        return self._admin_all_self_subusers(user, queryset)
+
+    def set_user_password(self, user, queryset):
+        return self._self(user, queryset)
+
+    def view_user_permissions(self, user, queryset):
+        return self._admin_all_self_subusers(user, queryset)
+
+    def add_user(self, user, queryset):
+        return queryset.none()
+
+    def view_admin(self, user, queryset):
+        return queryset.none()
+
+    def change_user_groups(self, user, queryset):
+        return queryset.none()
+
+    def change_user_permissions(self, user, queryset):
+        return queryset.none()
+
 
 class User(AbstractBaseUser, PermissionsMixin):
 
@@ -124,6 +200,8 @@ class User(AbstractBaseUser, PermissionsMixin):
         verbose_name_plural = 'users'
         default_related_name = 'users'
         db_table = 'bp_user'
+        # Matches UserAdmin's default ordering
+        index_together = (('name', 'username', 'email'),)
 
         # Quite nonstandard permissions
         permissions = (
@@ -132,6 +210,7 @@ class User(AbstractBaseUser, PermissionsMixin):
             ('set_user_active', 'Can activate/deactivate user'),
             ('set_user_password', 'Can set user password'),
             ('reset_user_password', 'Can reset user password'),
+            ('view_user_permissions', 'Can view user groups and permissions'),
             ('change_user_groups', 'Can change user groups'),
             ('change_user_permissions', 'Can change user permissions'),
         )
@@ -140,9 +219,9 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     ObjectPermissionFilters = UserObjectPermissionFilters()
 
-    # UUIDv4 for long-term sanity
+    # Time-ordered UUIDs for long-term sanity and index locality
     id = models.UUIDField(
-        'user ID', primary_key=True, default=uuid.uuid4, editable=False
+        'user ID', primary_key=True, default=uuid7, editable=False
     )
     username = models.CharField(
         'username',
@@ -165,6 +244,32 @@ class User(AbstractBaseUser, PermissionsMixin):
         default=True,
         help_text='Designates whether this user should be treated as active.',
     )
+    # Sub-users belong to their parent, and go with it
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='children',
+        verbose_name='parent user',
+    )
+
+    # Lowercased copies of searchable fields, indexed for prefix search
+    # (see backpocket.users.filters); kept current by save()
+    search_name = models.CharField(
+        max_length=150, default='', editable=False, db_index=True
+    )
+    search_username = models.CharField(
+        max_length=32, default='', editable=False, db_index=True
+    )
+    search_email = models.CharField(
+        max_length=254, default='', editable=False, db_index=True
+    )
+    SEARCH_FIELDS = {
+        'name': 'search_name',
+        'username': 'search_username',
+        'email': 'search_email',
+    }
 
     USERNAME_FIELD = 'username'
     EMAIL_FIELD = 'email'
@@ -180,9 +285,47 @@ class User(AbstractBaseUser, PermissionsMixin):
             return True
         # Check for admin permission, cache result
         if not hasattr(self, '_is_staff'):
-            self._is_staff = self.has_perm('bp_users.view_admin')
+            if hasattr(self, '_admin_perm'):
+                # Annotated by UserQuerySet.with_staff_status()
+                self._is_staff = self._admin_perm or self._group_admin_perm
+            else:
+                self._is_staff = self.has_perm('bp_users.view_admin')
         return self._is_staff
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        # Remember the stored parent, so save() can tell it moved
+        user._saved_parent_id = user.__dict__.get('parent_id', _UNKNOWN)
+        return user
+
+    def clean(self):
+        super().clean()
+        if not self._state.adding:
+            check_reparent([self.pk], self.parent_id)
+
+    def save(self, *args, update_fields=None, **kwargs):
+        for field, search_field in self.SEARCH_FIELDS.items():
+            setattr(self, search_field, (getattr(self, field) or '').lower())
+            if update_fields is not None and field in update_fields:
+                update_fields = set(update_fields) | {search_field}
+
+        adding = self._state.adding
+        moved = (
+            not adding and
+            'parent_id' in self.__dict__ and
+            (update_fields is None or 'parent' in update_fields) and
+            self.parent_id != getattr(self, '_saved_parent_id', _UNKNOWN)
+        )
+        if moved:
+            check_reparent([self.pk], self.parent_id)
+
+        with transaction.atomic():
+            super().save(*args, update_fields=update_fields, **kwargs)
+            if moved or (adding and self.parent_id is not None):
+                move_subtrees([self.pk], self.parent_id)
+        self._saved_parent_id = self.parent_id
+
     def get_short_name(self):
         return self.username
 
@@ -190,6 +333,101 @@ class User(AbstractBaseUser, PermissionsMixin):
         return self.name or self.username
 
     def email_user(self, subject, message, from_email=None, **kwargs):
-        # TODO: check settings for SMTP config
-        # send_mail(subject, message, from_email, [self.email], **kwargs)
-        raise NotImplementedError
+        # Queued, so it's only sent if the current transaction commits
+        queue_mail(subject, message, [self.email], from_email, **kwargs)
+
+
+class UserAncestry(models.Model):
+    """
+    Closure table of the sub-user hierarchy: one row for every
+    (ancestor, descendant) pair, at any depth, excluding users
+    themselves. Maintained by backpocket.users.hierarchy.
+    """
+
+    class Meta:
+        verbose_name = 'user ancestry'
+        verbose_name_plural = 'user ancestries'
+        db_table = 'bp_user_ancestry'
+        unique_together = (('ancestor', 'descendant'),)
+        index_together = (('descendant', 'ancestor'),)
+
+    ancestor = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='ancestor',
+    )
+    descendant = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='descendant',
+    )
+    depth = models.PositiveIntegerField('depth')
+
+
+class APIKeyManager(models.Manager):
+
+    def create_key(self, user, name='', scopes=('read',), expires=None):
+        """
+        Create and save a new API key. Returns (apikey, key) tuple;
+        the plaintext key is not stored and can't be retrieved later.
+        """
+        key = get_random_string(40)
+        apikey = self.create(
+            user=user,
+            name=name,
+            key_hash=APIKey.hash_key(key),
+            prefix=key[:8],
+            scopes=' '.join(sorted(set(scopes))),
+            expires=expires,
+        )
+        return apikey, key
+
+
+class APIKey(models.Model):
+    """
+    API key for token authentication. Only a hash of the key is stored.
+    """
+
+    class Meta:
+        verbose_name = 'API key'
+        verbose_name_plural = 'API keys'
+        db_table = 'bp_user_apikey'
+
+    SCOPES = ('read', 'write')
+
+    id = models.UUIDField(
+        'key ID', primary_key=True, default=uuid7, editable=False
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='api_keys',
+        verbose_name='user',
+    )
+    name = models.CharField('name', max_length=150, blank=True)
+    # First few characters, so users can tell keys apart
+    prefix = models.CharField('prefix', max_length=8, editable=False)
+    key_hash = models.CharField(
+        'key hash', max_length=64, unique=True, editable=False
+    )
+    scopes = models.CharField('scopes', max_length=150, default='read')
+    date_created = models.DateTimeField('date created', default=utcnow)
+    expires = models.DateTimeField('expires', null=True, blank=True)
+    last_used = models.DateTimeField('last used', null=True, blank=True)
+    is_revoked = models.BooleanField('revoked', default=False)
+
+    objects = APIKeyManager()
+
+    @staticmethod
+    def hash_key(key):
+        # Keys are long and random, so a fast hash is sufficient
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def get_scopes(self):
+        return frozenset(self.scopes.split())
+
+    def revoke(self):
+        self.is_revoked = True
+        self.save(update_fields=['is_revoked'])
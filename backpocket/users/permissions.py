@@ -14,6 +14,7 @@ class UserObjectPermissions(BaseActionObjectPermissions):
         'reset_password': (),
         'groups': (),
         'permissions': (),
+        'export': (),
     }
 
     obj_perms_map = {
@@ -21,8 +22,9 @@ class UserObjectPermissions(BaseActionObjectPermissions):
         'activate': ('{app_label}.set_user_active',),
         'password': ('{app_label}.set_user_password',),
         'reset_password': ('{app_label}.reset_user_password',),
-        'groups': ('{app_label}.change_user_groups',),
-        'permissions': ('{app_label}.change_user_permissions',),
+        'groups': ('{app_label}.view_user_permissions',),
+        'permissions': ('{app_label}.view_user_permissions',),
+        'export': ('{app_label}.view_user',),
     }
 
 
@@ -37,4 +39,5 @@ class UserObjectPermissionFilter(BaseActionObjectPermissionFilter):
         'reset_password': (),
         'groups': (),
         'permissions': (),
+        'export': (),
     }
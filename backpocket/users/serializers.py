@@ -1,4 +1,5 @@
 from django.contrib.auth import password_validation
+from django.contrib.auth.models import Group
 from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
 from rest_framework.fields import get_error_detail
@@ -14,10 +15,10 @@ class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = (
-            'id', 'username', 'name', 'email',
+            'id', 'username', 'name', 'email', 'parent',
             'is_active', 'is_staff', 'date_joined', 'url',
         )
-        read_only_fields = ('date_joined', 'is_active', 'url')
+        read_only_fields = ('date_joined', 'is_active', 'parent', 'url')
 
 class CreateUserSerializer(serializers.ModelSerializer):
     """
@@ -51,6 +52,27 @@ class CreateUserSerializer(serializers.ModelSerializer):
         # Now save and return
         user.save()
         return user
-    
 
-# TODO: Group serializer
+
+class GroupSerializer(serializers.ModelSerializer):
+    """
+    Group serializer, with permissions as 'app_label.codename' and
+    members as user IDs. Prefetch permissions, with their content
+    types, and 'user_set' when serializing many.
+    """
+    url = serializers.HyperlinkedIdentityField(view_name='group-detail')
+    permissions = serializers.SerializerMethodField()
+    members = serializers.PrimaryKeyRelatedField(
+        source='user_set', many=True, read_only=True
+    )
+
+    class Meta:
+        model = Group
+        fields = ('id', 'name', 'permissions', 'members', 'url')
+        read_only_fields = fields
+
+    def get_permissions(self, group):
+        return sorted(
+            '{0}.{1}'.format(perm.content_type.app_label, perm.codename)
+            for perm in group.permissions.all()
+        )
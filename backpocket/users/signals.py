@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+
+# Sent after users are changed in bulk by queryset update, which
+# sends no per-row model signals
+users_updated = Signal(providing_args=['user_ids'])
@@ -1,3 +1,449 @@
-from django.test import TestCase
+import importlib, re, unittest
+from django.apps import apps
+from django.contrib.admin.sites import AdminSite
+from django.contrib.auth.models import Group
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from backpocket.api.models import Change
+from backpocket.users import bulk
+from backpocket.sharing.access import grant
+from backpocket.users.admin import UserAdmin
+from backpocket.users.authentication import (
+    CACHE_PREFIX, last_used, local_cache, resolve_key, shared_cache,
+)
+from backpocket.users.effective import object_permissions
+from backpocket.users.filters import search_users
+from backpocket.users.hierarchy import is_ancestor, rebuild, reparent
+from backpocket.users.models import APIKey, User, UserAncestry
+from obj_perms.permissions import CheckerError, has_obj_perm
+from obj_perms.tracing import current_trace, trace_permissions
+from obj_perms.utils import available_permissions
 
-# Create your tests here.
+
+def query_plan(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+class UserSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(
+            'alice', 'pw', name='Alice Liddell', email='Alice@Example.com'
+        )
+        cls.bob = User.objects.create_user(
+            'Bobby', 'pw', name='Robert Tables', email='bob@example.org'
+        )
+        cls.admin = User.objects.create_superuser(
+            'root', 'pw', email='root@example.net'
+        )
+
+    def search(self, term):
+        return set(search_users(User.objects.all(), term))
+
+    def test_prefix_case_insensitive(self):
+        self.assertEqual(self.search('ALI'), {self.alice})
+        self.assertEqual(self.search('bob'), {self.bob})
+        self.assertEqual(self.search('rob'), {self.bob})
+        self.assertEqual(self.search('liddell'), set())
+
+    def test_all_words_must_match(self):
+        self.assertEqual(self.search('alice alice@'), {self.alice})
+        self.assertEqual(self.search('alice bob'), set())
+
+    def test_backfill_folds_non_ascii(self):
+        migration = importlib.import_module(
+            'backpocket.users.migrations.0004_user_search'
+        )
+        zoe = User.objects.create_user(
+            'Zoë', 'pw', name='Ödön Élan', email='Zoe@ÉLAN.example'
+        )
+        User.objects.update(
+            search_name='', search_username='', search_email=''
+        )
+        migration.populate_search_fields(apps, connection.schema_editor())
+        zoe.refresh_from_db()
+        self.assertEqual(
+            (zoe.search_name, zoe.search_username, zoe.search_email),
+            ('ödön élan', 'zoë', 'zoe@élan.example'),
+        )
+        self.assertEqual(self.search('ödö'), {zoe})
+        self.assertEqual(self.search('ALI'), {self.alice})
+
+    def test_update_fields_keeps_search_columns(self):
+        self.bob.name = 'Zed'
+        self.bob.save(update_fields=['name'])
+        self.bob.refresh_from_db()
+        self.assertEqual(self.bob.search_name, 'zed')
+        self.assertEqual(self.search('zed'), {self.bob})
+
+    def test_admin_search_results(self):
+        model_admin = UserAdmin(User, AdminSite())
+        queryset, use_distinct = model_admin.get_search_results(
+            None, User.objects.all(), 'example.org'
+        )
+        self.assertEqual(set(queryset), set())
+        queryset, use_distinct = model_admin.get_search_results(
+            None, User.objects.all(), 'BOB@'
+        )
+        self.assertEqual(set(queryset), {self.bob})
+        self.assertFalse(use_distinct)
+
+    def test_api_search_param(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.get('/api/users/', {'search': 'bob'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [user['username'] for user in response.data], ['Bobby']
+        )
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'SQLite query plans')
+class UserSearchQueryPlanTests(TestCase):
+
+    def assertNoTableScan(self, plan):
+        for detail in plan:
+            self.assertIsNone(
+                re.match(r'SCAN (TABLE )?bp_user$', detail),
+                'Full table scan in plan: {0}'.format(plan)
+            )
+
+    def test_search_uses_indexes(self):
+        plan = query_plan(search_users(User.objects.all(), 'ali'))
+        self.assertNoTableScan(plan)
+        self.assertTrue(
+            any('INDEX' in detail for detail in plan), plan
+        )
+
+    def test_multi_word_search_uses_indexes(self):
+        plan = query_plan(search_users(User.objects.all(), 'ali example'))
+        self.assertNoTableScan(plan)
+
+    def test_admin_ordering_uses_index(self):
+        ordering = UserAdmin.ordering
+        plan = query_plan(User.objects.order_by(*ordering))
+        self.assertFalse(
+            any('TEMP B-TREE' in detail for detail in plan), plan
+        )
+
+
+class HierarchyTests(TestCase):
+
+    def setUp(self):
+        # a > b > c > d, and e on its own
+        self.a = User.objects.create_user('a', 'pw')
+        self.b = User.objects.create_user('b', 'pw', parent=self.a)
+        self.c = User.objects.create_user('c', 'pw', parent=self.b)
+        self.d = User.objects.create_user('d', 'pw', parent=self.c)
+        self.e = User.objects.create_user('e', 'pw')
+
+    def closure(self):
+        return set(UserAncestry.objects.values_list(
+            'ancestor__username', 'descendant__username', 'depth'
+        ))
+
+    def test_created(self):
+        self.assertEqual(self.closure(), {
+            ('a', 'b', 1), ('a', 'c', 2), ('a', 'd', 3),
+            ('b', 'c', 1), ('b', 'd', 2), ('c', 'd', 1),
+        })
+        self.assertTrue(is_ancestor(self.a, self.d))
+        self.assertFalse(is_ancestor(self.d, self.a))
+
+    def test_move_subtree(self):
+        self.assertEqual(reparent([self.c], self.e), 1)
+        self.assertEqual(self.closure(), {
+            ('a', 'b', 1), ('e', 'c', 1), ('e', 'd', 2), ('c', 'd', 1),
+        })
+        self.c.refresh_from_db()
+        self.assertEqual(self.c.parent, self.e)
+
+        # Saving a changed parent moves the subtree too
+        self.c.parent = self.a
+        self.c.save()
+        self.assertEqual(self.closure(), {
+            ('a', 'b', 1), ('a', 'c', 1), ('a', 'd', 2), ('c', 'd', 1),
+        })
+
+        reparent([self.b, self.c], None)
+        self.assertEqual(self.closure(), {('c', 'd', 1)})
+
+    def test_cycles_rejected(self):
+        before = self.closure()
+        for users, parent in (([self.b], self.d), ([self.a], self.a),
+                              ([self.e, self.b], self.c)):
+            with self.assertRaises(ValidationError):
+                reparent(users, parent)
+        self.a.parent = self.d
+        with self.assertRaises(ValidationError):
+            self.a.save()
+        self.assertEqual(self.closure(), before)
+        self.assertIsNone(User.objects.get(pk=self.a.pk).parent_id)
+
+    def test_rebuild(self):
+        before = self.closure()
+        UserAncestry.objects.all().delete()
+        User.objects.filter(pk=self.e.pk).update(parent=self.d)
+        rebuild()
+        self.assertEqual(
+            self.closure(),
+            before | {
+                ('a', 'e', 4), ('b', 'e', 3), ('c', 'e', 2), ('d', 'e', 1),
+            },
+        )
+
+
+class BulkUserActionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'root', 'pw', email='root@example.net'
+        )
+        cls.parent = User.objects.create_user('parent', 'pw')
+        cls.children = [
+            User.objects.create_user('child{0}'.format(i), 'pw',
+                                     parent=cls.parent)
+            for i in range(3)
+        ]
+        cls.stranger = User.objects.create_user('stranger', 'pw')
+        cls.group = Group.objects.create(name='readers')
+
+    def test_refused_rows_reported(self):
+        queryset = User.objects.exclude(pk=self.admin.pk)
+        changes = Change.objects.count()
+        with self.assertNumQueries(8):
+            result = bulk.set_active(self.parent, queryset.exclude(
+                pk=self.parent.pk
+            ), False)
+        self.assertEqual(
+            set(result.changed), {user.pk for user in self.children}
+        )
+        self.assertEqual(result.refused, [self.stranger.pk])
+        self.assertTrue(User.objects.get(pk=self.stranger.pk).is_active)
+        self.assertEqual(Change.objects.count(), changes + 3)
+
+    def test_group_membership(self):
+        queryset = User.objects.exclude(pk=self.admin.pk)
+        result = bulk.add_to_group(self.parent, queryset, self.group)
+        self.assertEqual(result.changed, [])
+        result = bulk.add_to_group(self.admin, queryset, self.group)
+        self.assertEqual(len(result.changed), 5)
+        result = bulk.add_to_group(self.admin, queryset, self.group)
+        self.assertEqual(result.changed, [])
+        result = bulk.remove_from_group(
+            self.admin, User.objects.filter(parent=self.parent), self.group
+        )
+        self.assertEqual(len(result.changed), 3)
+        self.assertEqual(
+            set(self.group.user_set.all()), {self.parent, self.stranger}
+        )
+
+    def test_delete_only_permitted(self):
+        result = bulk.delete_users(self.parent, User.objects.all())
+        self.assertEqual(result.changed, [self.parent.pk])
+        self.assertFalse(User.objects.filter(pk=self.parent.pk).exists())
+        self.assertTrue(User.objects.filter(pk=self.stranger.pk).exists())
+
+
+class APIKeyAuthenticationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', 'pw')
+        cls.apikey, cls.key = APIKey.objects.create_key(
+            cls.user, scopes=('read',)
+        )
+
+    def setUp(self):
+        local_cache.clear()
+        shared_cache().clear()
+        # Write last-used times while the test database is still there
+        self.addCleanup(last_used.flush)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Key ' + self.key)
+        self.url = '/api/users/{0}/'.format(self.user.pk)
+
+    def test_cache_hits(self):
+        key_hash = APIKey.hash_key(self.key)
+        with self.assertNumQueries(1):
+            resolve_key(key_hash)
+        with self.assertNumQueries(0):
+            resolve_key(key_hash)
+        # Shared cache alone, as from another worker
+        local_cache.clear()
+        with self.assertNumQueries(0):
+            cached = resolve_key(key_hash)
+        self.assertEqual(cached.user_id, self.user.pk)
+        self.assertEqual(cached.scopes, {'read'})
+        # Nothing from the user row itself is cached
+        self.assertNotIsInstance(
+            shared_cache().get(CACHE_PREFIX + key_hash).user_id, User
+        )
+
+    def test_authenticates(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.delete(self.url)
+        self.assertEqual(response.status_code, 403)
+
+    def test_revoked(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.apikey.revoke()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_user_deactivated(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_user_deactivated_in_bulk(self):
+        admin = User.objects.create_superuser(
+            'root', 'pw', email='root@example.net'
+        )
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        bulk.set_active(admin, User.objects.filter(pk=self.user.pk), False)
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+
+class ObjectPermissionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'root', 'pw', email='root@example.net'
+        )
+        cls.alice = User.objects.create_user('alice', 'pw')
+        cls.sub = User.objects.create_user('sub', 'pw', parent=cls.alice)
+        cls.bob = User.objects.create_user('bob', 'pw')
+        grant(cls.alice, user=cls.bob)
+
+    def test_batch_matches_per_object(self):
+        perms = available_permissions(User, prepend_label=True)
+        users = list(User.objects.all())
+        for user in users:
+            batch = object_permissions(user, User.objects.all())
+            for obj in users:
+                with self.subTest(user=user.username, obj=obj.username):
+                    self.assertEqual(
+                        batch.get(obj.pk, set()),
+                        {p for p in perms if user.has_perm(p, obj)},
+                    )
+
+    def test_own_permissions_listed(self):
+        client = APIClient()
+        client.force_authenticate(self.alice)
+        response = client.get(
+            '/api/users/{0}/permissions/'.format(self.alice.pk)
+        )
+        self.assertIn(
+            'bp_users.set_user_password',
+            response.data['object_permissions'],
+        )
+
+    def test_groups_and_permissions_not_shared(self):
+        client = APIClient()
+        for user, status in ((self.bob, 403), (self.alice, 200),
+                             (self.admin, 200)):
+            client.force_authenticate(user)
+            for action in ('groups', 'permissions'):
+                with self.subTest(user=user.username, action=action):
+                    response = client.get('/api/users/{0}/{1}/'.format(
+                        self.alice.pk, action
+                    ))
+                    self.assertEqual(response.status_code, status)
+        # Ancestors may view their subusers'
+        client.force_authenticate(self.alice)
+        response = client.get('/api/users/{0}/groups/'.format(self.sub.pk))
+        self.assertEqual(response.status_code, 200)
+
+
+class PermissionTraceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user('alice', 'pw')
+        cls.bob = User.objects.create_user('bob', 'pw')
+
+    def test_decision_path(self):
+        with trace_permissions() as trace:
+            self.assertFalse(
+                self.bob.has_perm('bp_users.change_user', self.alice)
+            )
+            self.assertTrue(
+                self.bob.has_perm('bp_users.change_user', self.bob)
+            )
+        self.assertIsNone(current_trace())
+        denied, granted = trace.decisions
+        self.assertEqual(denied.source, 'ObjectPermissionsBackend')
+        self.assertEqual(denied.steps, [
+            ('checker', 'UserObjectPermissions.change_user', False),
+            ('general', 'bp_users.change_user', False),
+        ])
+        self.assertEqual(granted.steps, [
+            ('checker', 'UserObjectPermissions.change_user', True),
+        ])
+        self.assertEqual(trace.denials(), [denied])
+        self.assertIn('denied', denied.explain())
+
+    def test_missing_checker_uses_default(self):
+        with trace_permissions() as trace:
+            self.assertTrue(has_obj_perm(
+                self.bob, 'bp_users.frobnicate', self.alice, default=True
+            ))
+        decision, = trace.decisions
+        self.assertEqual(decision.source, 'has_obj_perm')
+        self.assertEqual(decision.steps, [(
+            'default', "UserObjectPermissions defines no 'frobnicate'", True
+        )])
+
+    def test_checker_attribute_error(self):
+        class Broken:
+            def view_user(self, user, obj):
+                return obj.no_such_field
+
+        def check():
+            has_obj_perm(
+                self.bob, 'view_user', self.alice,
+                default=True, perms_obj=Broken(),
+            )
+
+        # Not mistaken for a missing checker, traced or not
+        with self.assertRaises(CheckerError):
+            check()
+        with self.assertRaises(CheckerError), trace_permissions() as trace:
+            check()
+        self.assertFalse(trace.decisions[0].result)
+
+    def test_ring_buffer_bounded(self):
+        with trace_permissions(maxlen=5) as trace:
+            for _ in range(12):
+                self.bob.has_perm('bp_users.change_user', self.alice)
+        self.assertEqual(len(trace.decisions), 5)
+        self.assertEqual(trace.total, 12)
+        self.assertEqual(trace.dropped, 7)
+
+    @override_settings(PERMISSION_TRACE={
+        'ENABLED': True, 'SAMPLE_RATE': 1.0,
+    })
+    def test_denial_logged(self):
+        client = APIClient()
+        client.force_authenticate(self.bob)
+        url = '/api/users/{0}/activate/'.format(self.alice.pk)
+        with self.assertLogs('backpocket.permissions', 'WARNING') as logs:
+            response = client.post(url, {'is_active': False}, format='json')
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(any(
+            'UserObjectPermissions.set_user_active -> False' in line
+            for line in logs.output
+        ))
+        self.assertTrue(any(
+            'not found, may not view' in line for line in logs.output
+        ))
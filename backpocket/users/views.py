@@ -1,31 +1,176 @@
-from rest_framework import viewsets
+from django.contrib.auth.models import Group, Permission
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import HttpResponse, StreamingHttpResponse
+from rest_framework import serializers, status, viewsets
+from rest_framework.decorators import detail_route
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from obj_perms.filters import filter_queryset
+from backpocket.api.export import LibraryExport, parse_range
+from backpocket.audit.log import audit_log
+from backpocket.timing import RequestTimingMixin
+from backpocket.users.effective import general_permissions, object_permissions
+from backpocket.users.emails import send_password_reset, send_active_notice
+from backpocket.users.filters import UserSearchFilter
 from backpocket.users.models import User
 from backpocket.users.serializers import (
-    UserSerializer, CreateUserSerializer
+    UserSerializer, CreateUserSerializer, GroupSerializer
 )
 from backpocket.users.permissions import (
     UserObjectPermissions, UserObjectPermissionFilter
 )
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(RequestTimingMixin, viewsets.ModelViewSet):
     """
     Viewset for viewing, editing, and adding users.
     """
     permission_classes = [UserObjectPermissions]
-    filter_backends = [UserObjectPermissionFilter]
-    queryset = User.objects.all()
+    filter_backends = [UserObjectPermissionFilter, UserSearchFilter]
+    queryset = User.objects.with_staff_status()
 
     serializer_class = UserSerializer
     serializer_map = {
         'create': CreateUserSerializer,
     }
 
+    bulk_actions = ('export',)
+
     def get_serializer_class(self):
         return self.serializer_map.get(self.action, self.serializer_class)
 
-    # TODO: user groups detail view
-    # TODO: user permissions detail view
     # TODO: set password detail view
-    # TODO: reset password detail view
-    # TODO: activate detail view
+
+    @detail_route(methods=['get'])
+    def groups(self, request, pk=None):
+        user = self.get_object()
+        groups = group_queryset(request.user).filter(user=user)
+        serializer = GroupSerializer(
+            groups, many=True, context=self.get_serializer_context()
+        )
+        return Response(serializer.data)
+
+    @detail_route(methods=['get'])
+    def permissions(self, request, pk=None):
+        user = self.get_object()
+        general = general_permissions([user])[user.pk]
+        # What the user may do with their own account
+        own = object_permissions(user, User.objects.filter(pk=user.pk))
+        return Response({
+            'permissions': sorted(general),
+            'object_permissions': sorted(own.get(user.pk, ())),
+        })
+
+    @detail_route(methods=['get'])
+    def export(self, request, pk=None):
+        """
+        The user's library as a tar archive, streamed. Supports single
+        Range requests (with If-Range) to resume a dropped download.
+        """
+        archive = LibraryExport(request.user, self.get_object())
+        total = archive.size()
+        start, end = 0, total - 1
+        status_code = status.HTTP_200_OK
+
+        if request.META.get('HTTP_IF_RANGE', archive.etag) == archive.etag:
+            try:
+                byte_range = parse_range(request.META.get('HTTP_RANGE'), total)
+            except ValueError:
+                response = HttpResponse(
+                    status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+                )
+                response['Content-Range'] = 'bytes */{0}'.format(total)
+                return response
+            if byte_range is not None:
+                start, end = byte_range
+                status_code = status.HTTP_206_PARTIAL_CONTENT
+
+        response = StreamingHttpResponse(
+            archive.stream(start, end), status=status_code,
+            content_type='application/x-tar',
+        )
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Disposition'] = (
+            'attachment; filename="{0}"'.format(archive.filename)
+        )
+        response['Accept-Ranges'] = 'bytes'
+        response['ETag'] = archive.etag
+        if status_code == status.HTTP_206_PARTIAL_CONTENT:
+            response['Content-Range'] = 'bytes {0}-{1}/{2}'.format(
+                start, end, total
+            )
+        return response
+
+    @detail_route(methods=['post'])
+    def reset_password(self, request, pk=None):
+        user = self.get_object()
+        sent = bool(user.is_active and user.email)
+        if sent:
+            send_password_reset(user, request)
+        audit_log.record(
+            request.user, 'user.reset_password', [user.pk],
+            permission='bp_users.reset_user_password', sent=sent,
+        )
+        # Same response either way, mail goes out in the background
+        return Response(status=status.HTTP_202_ACCEPTED)
+
+    @detail_route(methods=['post'])
+    def activate(self, request, pk=None):
+        user = self.get_object()
+        field = serializers.BooleanField()
+        try:
+            is_active = field.run_validation(
+                request.data.get('is_active', True)
+            )
+        except serializers.ValidationError as e:
+            raise serializers.ValidationError({'is_active': e.detail})
+
+        if user.is_active != is_active:
+            with transaction.atomic():
+                user.is_active = is_active
+                user.save(update_fields=['is_active'])
+                if user.email:
+                    send_active_notice(user)
+                audit_log.record(
+                    request.user,
+                    'user.activate' if is_active else 'user.deactivate',
+                    [user.pk], permission='bp_users.set_user_active',
+                )
+
+        serializer = self.get_serializer(user)
+        return Response(serializer.data)
+
+
+def group_queryset(user):
+    '''Groups with permissions and the members user may view
+    prefetched, one query each regardless of group count.
+    '''
+    members = filter_queryset(
+        user, 'bp_users.view_user', User.objects.only('pk')
+    )
+    return Group.objects.order_by('name').prefetch_related(
+        Prefetch(
+            'permissions',
+            queryset=Permission.objects.select_related('content_type'),
+        ),
+        Prefetch('user_set', queryset=members),
+    )
+
+
+class GroupViewSet(RequestTimingMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Viewset for viewing groups. Admins see all groups, others only
+    the groups they belong to.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = GroupSerializer
+    queryset = Group.objects.all()
+
+    def get_queryset(self):
+        user = self.request.user
+        queryset = group_queryset(user)
+        if not user.is_staff:
+            queryset = queryset.filter(user=user)
+        return queryset
+
@@ -1,11 +1,12 @@
-import datetime, uuid
+import datetime, os, threading, time, uuid
 
 
-# UUID v4 validation
-def validuuid(uid, version=4):
-    '''Ensures given uid argument is a valid UUID (default version 4)
+# UUID validation
+def validuuid(uid, version=(4, 7)):
+    '''Ensures given uid argument is a valid UUID (default version 4 or 7)
     Returns UUID instance if valid, None if not.
     Can be a UUID instance, or any type which uuid.UUID() accepts as input.
+    Version may be a single version number or a collection of them.
     '''
 
     if isinstance(uid, uuid.UUID):
@@ -14,17 +15,66 @@ def validuuid(uid, version=4):
         # so we have to explicitly check)
         return uid
     else:
+        if isinstance(version, int):
+            version = (version,)
+
         # Attempt conversion, return if successful
         try:
-            # Insist on version
-            retuid = uuid.UUID(uid, version=version)
-        except ValueError as e:
+            # Don't pass version to UUID(), as it overwrites the
+            # version bits rather than checking them
+            retuid = uuid.UUID(uid)
+        except (TypeError, ValueError):
             # Invalid, return None instead of raising exception
-            retuid = None
+            return None
+
+        # Insist on version
+        if retuid.variant != uuid.RFC_4122 or retuid.version not in version:
+            return None
 
         return retuid
 
 
+# Time-ordered UUIDs
+_uuid7_lock = threading.Lock()
+_uuid7_last = (0, 0)
+
+
+def uuid7():
+    '''Returns a time-ordered (version 7) UUID.
+    The top 48 bits are the Unix time in milliseconds, so keys created
+    close together sort together and B-tree inserts stay at the right
+    edge of the index instead of scattering. The 12 bits after the
+    version are a per-process counter within each millisecond, so
+    UUIDs from one process are strictly increasing. Use as a model
+    field default in place of uuid.uuid4.
+    '''
+    global _uuid7_last
+
+    with _uuid7_lock:
+        millis = int(time.time() * 1000)
+        last_millis, counter = _uuid7_last
+        if millis <= last_millis:
+            # Same millisecond (or clock went back), bump the counter,
+            # borrowing from the next millisecond on overflow
+            millis, counter = last_millis, counter + 1
+            if counter > 0xfff:
+                millis, counter = millis + 1, 0
+        else:
+            # Random start, leaving headroom for the counter
+            counter = int.from_bytes(os.urandom(2), 'big') & 0x7ff
+        _uuid7_last = (millis, counter)
+
+    rand = int.from_bytes(os.urandom(8), 'big') & ((1 << 62) - 1)
+    value = (
+        (millis & ((1 << 48) - 1)) << 80 |
+        0x7 << 76 |
+        counter << 64 |
+        0b10 << 62 |
+        rand
+    )
+    return uuid.UUID(int=value)
+
+
 def utcnow():
     return datetime.datetime.now(datetime.timezone.utc)
 
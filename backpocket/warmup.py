@@ -0,0 +1,133 @@
+"""
+Worker warm-up.
+
+A new worker process otherwise pays on its first requests for
+importing views, admin and serializer modules, compiling URL patterns,
+building per-model permission tables and serializer fields, and
+connecting to the database. warm_up() does all of that up front, from
+backpocket.wsgi as the worker starts, so recycled workers don't make
+the next client wait.
+
+With a preloading server (e.g. gunicorn --preload) the application is
+loaded before forking, so set WARM_UP['CONNECT'] off there: database
+connections must not be shared between processes.
+"""
+import logging, os, time
+from importlib import import_module
+
+from django.apps import apps
+from django.conf import settings
+from django.utils.module_loading import module_has_submodule
+
+
+logger = logging.getLogger('backpocket.warmup')
+
+# Loaded lazily by URL resolution, the admin and DRF
+APP_SUBMODULES = (
+    'admin', 'views', 'serializers', 'permissions', 'filters', 'signals',
+)
+
+
+def _setting(name, default):
+    return getattr(settings, 'WARM_UP', {}).get(name, default)
+
+
+def import_app_modules():
+    count = 0
+    for app_config in apps.get_app_configs():
+        for name in APP_SUBMODULES:
+            if module_has_submodule(app_config.module, name):
+                import_module('{0}.{1}'.format(app_config.name, name))
+                count += 1
+    # DRF imports its configured classes on first access
+    from rest_framework.settings import api_settings
+    api_settings.DEFAULT_RENDERER_CLASSES
+    api_settings.DEFAULT_PARSER_CLASSES
+    api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    api_settings.DEFAULT_THROTTLE_CLASSES
+    return count
+
+
+def build_url_resolvers():
+    from django.urls import get_resolver
+    resolver = get_resolver()
+    # Populating compiles every pattern, including included ones
+    return len(resolver.reverse_dict)
+
+
+def build_permission_tables():
+    from obj_perms.utils import build_permission_tables
+    models = apps.get_models()
+    build_permission_tables(models)
+    return len(models)
+
+
+def build_serializer_fields():
+    from backpocket.api.changes import get_sync_kinds
+    from backpocket.api.urls import router
+    serializer_classes = set()
+    for _, viewset, _ in router.registry:
+        serializer_class = getattr(viewset, 'serializer_class', None)
+        if serializer_class is not None:
+            serializer_classes.add(serializer_class)
+        serializer_classes.update(
+            getattr(viewset, 'serializer_map', {}).values()
+        )
+    serializer_classes.update(
+        sync.serializer for sync in get_sync_kinds().values()
+    )
+    for serializer_class in serializer_classes:
+        serializer_class(context={'request': None}).fields
+    return len(serializer_classes)
+
+
+def connect_databases():
+    from django.contrib.contenttypes.models import ContentType
+    from django.db import connections
+    for conn in connections.all():
+        conn.ensure_connection()
+    # Content types are cached per process; permission and sharing
+    # lookups go through them
+    ContentType.objects.get_for_models(*apps.get_models())
+    return len(connections.all())
+
+
+def warm_up(connect=True):
+    '''Runs each warm-up step, returning list of (step, seconds).'''
+    steps = [
+        ('imports', import_app_modules),
+        ('urls', build_url_resolvers),
+        ('permissions', build_permission_tables),
+        ('serializers', build_serializer_fields),
+    ]
+    if connect:
+        steps.append(('database', connect_databases))
+
+    timings = []
+    for name, step in steps:
+        start = time.perf_counter()
+        step()
+        timings.append((name, time.perf_counter() - start))
+    return timings
+
+
+def warm_up_from_settings():
+    '''Warms up per WARM_UP settings; BACKPOCKET_WARM_UP=0 or 1 in
+    the environment overrides ENABLED. Returns timings, or None if
+    disabled.
+    '''
+    enabled = os.environ.get('BACKPOCKET_WARM_UP')
+    if enabled is None:
+        enabled = _setting('ENABLED', True)
+    else:
+        enabled = enabled not in ('', '0')
+    if not enabled:
+        return None
+
+    timings = warm_up(connect=_setting('CONNECT', True))
+    logger.info(
+        'Warmed up in %.1fms (%s)', sum(t for _, t in timings) * 1000,
+        ', '.join('{0} {1:.1f}ms'.format(name, t * 1000)
+                  for name, t in timings)
+    )
+    return timings
@@ -3,14 +3,29 @@ WSGI config for backpocket project.
 
 It exposes the WSGI callable as a module-level variable named ``application``.
 
+Set BACKPOCKET_PROFILE_IMPORTS=1 to log an import-time profile as the
+worker starts; warm-up is configured by the WARM_UP setting.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/1.11/howto/deployment/wsgi/
 """
 
-import os
+import logging, os
+
+# Installed first, so it sees Django's own imports
+from backpocket.importprofile import ImportProfiler
+import_profiler = ImportProfiler.from_environ()
 
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backpocket.settings")
 
 application = get_wsgi_application()
+
+# Pay start-up costs now rather than on the first requests
+from backpocket.warmup import warm_up_from_settings
+warm_up_from_settings()
+
+if import_profiler is not None:
+    import_profiler.uninstall()
+    logging.getLogger('backpocket.warmup').info(import_profiler.report())
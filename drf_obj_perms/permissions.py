@@ -7,6 +7,8 @@ from django.http import Http404
 from rest_framework import exceptions
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 
+from obj_perms.tracing import current_trace
+
 
 class ModelObjectPermissions(BasePermission):
     """
@@ -118,6 +120,28 @@ class ModelObjectPermissions(BasePermission):
         )
 
     def has_object_permission(self, request, view, obj):
+        trace = current_trace()
+        if trace is None:
+            return self._has_object_permission(request, view, obj)
+
+        # Record the outcome, after the checks it was decided by
+        decision = trace.begin(
+            type(self).__name__, request.user,
+            self.get_perm_lookup_key(request, view), obj
+        )
+        result = False
+        try:
+            result = self._has_object_permission(request, view, obj)
+            if not result:
+                trace.step('response', 'forbidden, may view')
+            return result
+        except Http404:
+            trace.step('response', 'not found, may not view')
+            raise
+        finally:
+            trace.end(decision, result)
+
+    def _has_object_permission(self, request, view, obj):
         lookup_key = self.get_perm_lookup_key(request, view)
         model_cls = self.get_view_queryset(request, view).model
         user = request.user
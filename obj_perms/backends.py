@@ -1,6 +1,8 @@
 # User model mixins
 
+from obj_perms.filters import filter_queryset, get_queryset_permissions
 from obj_perms.permissions import has_obj_perm, get_all_object_permissions
+from obj_perms.tracing import current_trace
 from obj_perms.utils import available_permissions
 
 class ObjectPermissionsBackend:
@@ -41,6 +43,10 @@ class ObjectPermissionsBackend:
         return None
     
     def has_perm(self, user_obj, perm, obj=None):
+        trace = current_trace()
+        if trace is not None and obj is not None:
+            return self._traced_has_perm(trace, user_obj, perm, obj)
+
         # Ensure valid user given
         if not self._check_user(user_obj):
             return False
@@ -61,6 +67,61 @@ class ObjectPermissionsBackend:
 
         return user_has_perm
 
+    def _traced_has_perm(self, trace, user_obj, perm, obj):
+        # As has_perm(), recording the decision path in trace
+        decision = trace.begin(type(self).__name__, user_obj, perm, obj)
+        result = False
+        try:
+            if not self._check_user(user_obj):
+                trace.step('user', 'inactive or not authenticated', False)
+                return result
+
+            kwargs = { 'default': self.DEFAULT_PERMISSION }
+            if self.DEFAULT_ATTR_NAME is not None:
+                kwargs['attr_name'] = self.DEFAULT_ATTR_NAME
+            result = has_obj_perm(user_obj, perm, obj, **kwargs)
+
+            if not result and self.INCLUDE_GENERAL_PERMISSIONS:
+                result = user_obj.has_perm(perm, obj=None)
+                trace.step('general', perm, result)
+            return result
+        finally:
+            trace.end(decision, result)
+
+    def filter_queryset(self, user_obj, perm, queryset):
+        # Queryset counterpart to has_perm(), using the model's
+        # permission filters instead of checking objects one by one
+        if not self._check_user(user_obj):
+            return queryset.none()
+
+        if self.INCLUDE_GENERAL_PERMISSIONS and user_obj.has_perm(perm):
+            return queryset
+
+        return filter_queryset(
+            user_obj, perm, queryset, default=self.DEFAULT_PERMISSION
+        )
+
+    def get_queryset_permissions(self, user_obj, queryset):
+        # Batch counterpart to get_all_permissions(), returning dict of
+        # object primary key to permissions from a single query
+        if not self._check_user(user_obj):
+            pks = queryset.values_list('pk', flat=True)
+            return {pk: set() for pk in pks}
+
+        perms = available_permissions(queryset.model, prepend_label=True)
+        general = set()
+        if self.INCLUDE_GENERAL_PERMISSIONS:
+            general = {perm for perm in perms if user_obj.has_perm(perm)}
+
+        user_perms = get_queryset_permissions(
+            user_obj, queryset, perms - general,
+            default=self.DEFAULT_PERMISSION
+        )
+        for obj_perms in user_perms.values():
+            obj_perms.update(general)
+
+        return user_perms
+
     def get_all_permissions(self, user_obj, obj=None):
         # Ensure valid user given, short-circuit obj=None case
         if not self._check_user(user_obj) or not obj:
@@ -3,7 +3,9 @@
 # with methods named by desired permission codename. Each method should
 # have the signature 'codename(user, queryset)'.
 
-from obj_perms.utils import split_perm
+from django.db.models import Exists, OuterRef
+from obj_perms.permissions import CheckerError
+from obj_perms.utils import split_perm, available_permissions
 
 
 DEFAULT_ATTR = 'ObjectPermissionFilters'
@@ -30,14 +32,74 @@ def filter_queryset(user, perms, queryset,
     for perm in perms:
         app_label, codename = split_perm(model, perm)
 
-        try:
-            # TODO: check queryset cache
-            queryset = getattr(filters_obj, codename)(user, queryset)
-        except AttributeError:
+        method = getattr(filters_obj, codename, None)
+        if method is None:
             # Return default if codename not defined
             if not default:
                 queryset = queryset.none()
                 # Short-circuit here, queryset already empty
                 break
+            continue
+
+        try:
+            # TODO: check queryset cache
+            queryset = method(user, queryset)
+        except AttributeError as e:
+            # Not to be mistaken for an undefined codename
+            raise CheckerError(
+                '{0} raised {1!r}'.format(method.__qualname__, e)
+            ) from e
 
     return queryset
+
+
+def get_queryset_permissions(user, queryset, perms=None, default=False,
+                             prepend_label=True, attr_name=DEFAULT_ATTR):
+    """
+    Get permissions user has on each object in queryset, as a dict of
+    primary key to set of permissions. Uses a single query, with each
+    permission's filter as an EXISTS subquery, rather than checking
+    each permission on each object. Permissions without a filter
+    method are granted if default is True. Only checks the given
+    perms, if any, otherwise all available for the model.
+    """
+    model = queryset.model
+    filters_obj = getattr(model, attr_name, None)
+    if perms is None:
+        perms = available_permissions(model)
+    base = model._default_manager.all()
+
+    constant = set()
+    annotations = {}
+    for perm in perms:
+        app_label, codename = split_perm(model, perm)
+        name = '{0}.{1}'.format(model._meta.app_label, codename)
+        if not prepend_label:
+            name = codename
+        method = getattr(filters_obj, codename, None)
+        if method is None:
+            if default:
+                constant.add(name)
+            continue
+        filtered = method(user, base)
+        if filtered.query.is_empty():
+            continue
+        annotations[name] = Exists(
+            filtered.order_by().filter(pk=OuterRef('pk')).values('pk')
+        )
+
+    # Annotation names must be valid identifiers
+    aliases = {
+        '_perm_{0}'.format(i): name
+        for i, name in enumerate(sorted(annotations))
+    }
+    queryset = queryset.order_by().annotate(**{
+        alias: annotations[name] for alias, name in aliases.items()
+    })
+
+    result = {}
+    for row in queryset.values('pk', *aliases):
+        result[row['pk']] = set(constant).union(
+            name for alias, name in aliases.items() if row[alias]
+        )
+    return result
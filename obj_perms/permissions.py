@@ -4,28 +4,112 @@
 # the signature 'codename(user, obj)'.
 
 from django.core.exceptions import PermissionDenied
+from obj_perms.tracing import current_trace
 from obj_perms.utils import split_perm, available_permissions
 
 
 DEFAULT_ATTR = 'ObjectPermissions'
 
 
-def has_obj_perm(user_obj, perm, obj, default=False,
-                 attr_name=DEFAULT_ATTR, perms_obj=None):
-    try:
+class MissingChecker(AttributeError):
+    """
+    Raised by get_checker() when an object has no permissions class,
+    or its permissions class defines no method for the permission.
+    """
+    pass
+
+
+class CheckerError(Exception):
+    """
+    Raised when a permission checker itself raises AttributeError,
+    which would otherwise pass for a missing checker and quietly give
+    the default. The original error is the cause.
+    """
+    pass
+
+
+def get_checker(obj, perm, attr_name=DEFAULT_ATTR, perms_obj=None):
+    '''Returns the bound method checking perm on obj, or raises
+    MissingChecker.
+    '''
+    if perms_obj is None:
+        perms_obj = getattr(obj, attr_name, None)
         if perms_obj is None:
-            perms_obj = getattr(obj, attr_name)
+            raise MissingChecker(
+                "'{0}' has no {1}".format(type(obj).__name__, attr_name)
+            )
+
+    app_label, codename = split_perm(obj, perm)
+
+    checker = getattr(perms_obj, codename, None)
+    if checker is None:
+        raise MissingChecker(
+            "{0} defines no '{1}'".format(
+                type(perms_obj).__name__, codename
+            )
+        )
+    return checker
 
-        app_label, codename = split_perm(obj, perm)
 
-        # TODO: check perm cache
-        return getattr(perms_obj, codename)(user_obj, obj)
+def _name(checker):
+    return getattr(checker, '__qualname__', None) or repr(checker)
 
-    except AttributeError:
+
+def _checker_error(checker, e):
+    return CheckerError('{0} raised {1!r}'.format(_name(checker), e))
+
+
+def has_obj_perm(user_obj, perm, obj, default=False,
+                 attr_name=DEFAULT_ATTR, perms_obj=None):
+    trace = current_trace()
+    if trace is not None and obj is not None:
+        return _traced_has_obj_perm(
+            trace, user_obj, perm, obj, default, attr_name, perms_obj
+        )
+
+    try:
+        checker = get_checker(obj, perm, attr_name, perms_obj)
+    except MissingChecker:
         # Return default if no object permissions defined
         # or object permissions does not define perm
         return default
 
+    # TODO: check perm cache
+    try:
+        return checker(user_obj, obj)
+    except AttributeError as e:
+        raise _checker_error(checker, e) from e
+
+
+def _traced_has_obj_perm(trace, user_obj, perm, obj, default, attr_name,
+                         perms_obj):
+    # As has_obj_perm(), recording its steps in the current decision,
+    # or one of its own if called directly rather than by a backend
+    decision = None
+    if trace.current is None:
+        decision = trace.begin('has_obj_perm', user_obj, perm, obj)
+    result = False
+    try:
+        try:
+            checker = get_checker(obj, perm, attr_name, perms_obj)
+        except MissingChecker as e:
+            result = default
+            trace.step('default', str(e), result)
+            return result
+        try:
+            try:
+                result = checker(user_obj, obj)
+            except AttributeError as e:
+                raise _checker_error(checker, e) from e
+        except Exception as e:
+            trace.step('checker', _name(checker), repr(e))
+            raise
+        trace.step('checker', _name(checker), result)
+        return result
+    finally:
+        if decision is not None:
+            trace.end(decision, result)
+
 
 def has_obj_perms(user_obj, perm_list, obj,
                   default=False, attr_name=DEFAULT_ATTR):
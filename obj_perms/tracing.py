@@ -0,0 +1,115 @@
+# Permission decision tracing
+#
+# While a trace is active in the current thread, ObjectPermissionsBackend
+# and has_obj_perm() record how each check was decided: the backend, the
+# checker called (or why the default was used instead), and any general
+# permission fallback. Decisions go in a ring buffer holding the latest
+# maxlen of them, so a trace's memory is bounded however many checks a
+# request makes. With no trace active, a check costs one thread-local
+# lookup.
+
+import collections, contextlib, threading
+
+
+class _Local(threading.local):
+    # A class default, as a failed lookup on a local is slow
+    trace = None
+
+
+_local = _Local()
+
+
+def _describe(obj):
+    if obj is None:
+        return 'None'
+    meta = getattr(obj, '_meta', None)
+    if meta is None:
+        return type(obj).__name__
+    return '{0}:{1}'.format(meta.label_lower, obj.pk)
+
+
+class Decision:
+    """
+    One permission check: what was asked, the steps taken to decide
+    it, as (kind, detail, result) tuples, and the outcome.
+    """
+    __slots__ = ('source', 'user', 'perm', 'obj', 'steps', 'result')
+
+    def __init__(self, source, user, perm, obj):
+        self.source = source
+        self.user = getattr(user, 'pk', None)
+        self.perm = perm
+        self.obj = _describe(obj)
+        self.steps = []
+        self.result = None
+
+    def explain(self):
+        '''Returns a one-line account of the decision.'''
+        steps = '; '.join(
+            '{0} {1}'.format(kind, detail) if result is None
+            else '{0} {1} -> {2}'.format(kind, detail, result)
+            for kind, detail, result in self.steps
+        )
+        return '{0} {1} on {2} for user {3}: {4} ({5})'.format(
+            self.source, self.perm, self.obj, self.user,
+            'granted' if self.result else 'denied', steps or 'no steps',
+        )
+
+    def __repr__(self):
+        return '<Decision {0}>'.format(self.explain())
+
+
+class PermissionTrace:
+    """
+    Ring buffer of the latest maxlen decisions, plus those still
+    being decided (checkers may check other permissions in turn).
+    """
+
+    def __init__(self, maxlen=100):
+        self.decisions = collections.deque(maxlen=maxlen)
+        self.total = 0
+        self._open = []
+
+    def begin(self, source, user, perm, obj):
+        decision = Decision(source, user, perm, obj)
+        self._open.append(decision)
+        return decision
+
+    @property
+    def current(self):
+        '''The innermost decision being made, if any.'''
+        return self._open[-1] if self._open else None
+
+    def step(self, kind, detail, result=None):
+        self._open[-1].steps.append((kind, detail, result))
+
+    def end(self, decision, result):
+        self._open.remove(decision)
+        decision.result = result
+        self.decisions.append(decision)
+        self.total += 1
+
+    @property
+    def dropped(self):
+        return self.total - len(self.decisions)
+
+    def denials(self):
+        return [d for d in self.decisions if not d.result]
+
+
+def current_trace():
+    '''Returns the current thread's active trace, or None.'''
+    return _local.trace
+
+
+@contextlib.contextmanager
+def trace_permissions(maxlen=100):
+    '''Traces permission checks made in this thread within the block,
+    yielding the PermissionTrace. Nests, inner traces taking over.
+    '''
+    outer = current_trace()
+    trace = _local.trace = PermissionTrace(maxlen)
+    try:
+        yield trace
+    finally:
+        _local.trace = outer
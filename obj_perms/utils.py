@@ -2,12 +2,25 @@
 
 from django.contrib.auth import get_permission_codename
 
+# Per-model permission tables, keyed by (model, prepend_label)
+_available_cache = {}
+
 # Easier to do what 'migrate' does than fetch from db
 def available_permissions(model, prepend_label=False):
     """
     Gets valid permissions for model. Prepends app label if
-    prepend_label is True.
+    prepend_label is True. Computed once per model, and returned
+    as a frozenset, so callers must copy before modifying.
     """
+    # Accept instances too
+    if not isinstance(model, type):
+        model = type(model)
+    key = (model, bool(prepend_label))
+    try:
+        return _available_cache[key]
+    except KeyError:
+        pass
+
     meta = model._meta
     perms = set(
         get_permission_codename(action, meta)
@@ -18,9 +31,18 @@ def available_permissions(model, prepend_label=False):
         app_label = meta.app_label
         perms = set('{0}.{1}'.format(app_label, perm) for perm in perms)
 
-    # TODO: cache available permissions per-model
+    perms = _available_cache[key] = frozenset(perms)
     return perms
 
+def build_permission_tables(models):
+    """
+    Fills the per-model permission tables ahead of time, e.g. when
+    warming up a worker process.
+    """
+    for model in models:
+        available_permissions(model)
+        available_permissions(model, prepend_label=True)
+
 def split_perm(model, perm, check_list=False):
     """
     Ensures perm is a valid permission for this model.
@@ -47,6 +69,5 @@ def split_perm(model, perm, check_list=False):
                 .format(perm, model_app)
             )
 
-    # TODO: check cached available permissions
     return app_label, codename
 